@@ -3,13 +3,15 @@
 # Author: Shibo Li
 # Date: 2025-05-13
 
+from typing import Optional
+
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
-from pathlib import Path
 
-from app.core.runner import ZeoRunner
+from app.core.adaptive import run_adaptive
+from app.core.runner import ZeoRunner, failure_response
 from app.models.accessible_volume import AccessibleVolumeResponse
-from app.utils.file import save_uploaded_file
+from app.utils.file import staged_upload
 from app.utils.parser import parse_vol_from_text
 
 router = APIRouter()
@@ -22,42 +24,50 @@ async def compute_accessible_volume(
     probe_radius: float = Form(...),
     samples: int = Form(...),
     output_filename: str = Form("result.vol"),
-    ha: bool = Form(True)
+    ha: bool = Form(True),
+    tolerance: Optional[float] = Form(None),
+    max_samples: Optional[int] = Form(None)
 ):
     """
     Compute accessible volume using Zeo++ -vol command
+
+    With `tolerance`, `samples` is only the first sample count: it doubles until the
+    estimated relative error of the result is at most `tolerance` (or max_samples is hit).
     """
-    input_path: Path = save_uploaded_file(structure_file, prefix="vol")
-
-    args = []
-    if ha:
-        args.append("-ha")
-    args += ["-vol", str(chan_radius), str(probe_radius), str(samples), output_filename, input_path.name]
-
-    result = runner.run_command(
-        structure_file=input_path,
-        zeo_args=args,
-        output_files=[output_filename],
-        extra_identifier="accessible_volume"
-    )
-
-    if not result["success"]:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": "Zeo++ failed",
-                "stderr": result["stderr"]
-            }
-        )
+    if tolerance is not None and tolerance <= 0:
+        return JSONResponse(status_code=400, content={"success": False, "message": "tolerance must be positive."})
+
+    async with staged_upload(structure_file, prefix="vol") as upload:
+        args = []
+        if ha:
+            args.append("-ha")
+        args += ["-vol", str(chan_radius), str(probe_radius), str(samples), output_filename, upload.name]
 
-    output_text = result["output_data"].get(output_filename)
-    if not output_text:
-        raise HTTPException(status_code=500, detail=f"Output file '{output_filename}' was not generated.")
+        adaptive = None
+        if tolerance is None:
+            result = await runner.run_command(
+                structure_file=upload,
+                zeo_args=args,
+                output_files=[output_filename],
+                extra_identifier="accessible_volume"
+            )
+        else:
+            result, adaptive = await run_adaptive(
+                runner, upload, "accessible_volume", {"chan_radius": chan_radius, "probe_radius": probe_radius},
+                samples, tolerance, max_samples, ha=ha, output_filename=output_filename
+            )
 
-    parsed = parse_vol_from_text(output_text)
+        if not result["success"]:
+            return failure_response(result)
 
-    return AccessibleVolumeResponse(
-        **parsed,
-        cached=result["cached"]
-    )
+        output_text = result["output_data"].get(output_filename)
+        if not output_text:
+            raise HTTPException(status_code=500, detail=f"Output file '{output_filename}' was not generated.")
+
+        parsed = parse_vol_from_text(output_text)
+
+        return AccessibleVolumeResponse(
+            **parsed,
+            cached=result["cached"],
+            adaptive=adaptive
+        )
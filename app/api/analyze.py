@@ -0,0 +1,43 @@
+# Combined Analysis API Endpoint
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from app.core.analysis import AnalysisError, parse_analyses, validate_analyses, run_analyses
+from app.core.runner import ZeoRunner, error_response
+from app.models.analyze import AnalyzeResponse
+from app.utils.file import staged_upload
+
+router = APIRouter()
+runner = ZeoRunner()
+
+
+@router.post("/api/analyze", response_model=AnalyzeResponse, response_model_exclude_none=True)
+async def analyze_structure(
+    structure_file: UploadFile = File(...),
+    analyses: str = Form("pore_diameter,surface_area,accessible_volume,probe_volume,channel_analysis"),
+    chan_radius: Optional[float] = Form(None),
+    probe_radius: Optional[float] = Form(None),
+    samples: Optional[int] = Form(None),
+    ha: bool = Form(True)
+):
+    """
+    Run several analyses (-res, -sa, -vol, -volpo, -chan) with a single Zeo++ invocation
+    """
+    names = parse_analyses(analyses)
+    params = {"chan_radius": chan_radius, "probe_radius": probe_radius, "samples": samples}
+    error = validate_analyses(names, params)
+    if error:
+        return JSONResponse(status_code=400, content={"success": False, "message": error})
+
+    async with staged_upload(structure_file, prefix="analyze") as upload:
+        try:
+            results = await run_analyses(runner, upload, names, params, ha=ha)
+        except AnalysisError as e:
+            return error_response(e.message, e.stderr, e.error, e.resources)
+
+        return AnalyzeResponse(**results)
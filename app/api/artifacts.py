@@ -0,0 +1,169 @@
+# Artifact Download API Endpoint
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import asyncio
+import mimetypes
+import re
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.core.cache import result_cache
+from app.core.cache_backends import COPY_CHUNK_SIZE, decode_stream
+
+router = APIRouter()
+
+_CACHE_KEY = re.compile(r"^[0-9a-f]{64}$")
+_STORED_NAME = re.compile(r"^output\d+$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _not_found() -> JSONResponse:
+    return JSONResponse(status_code=404, content={"success": False, "message": "Artifact not found"})
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=start-end` range into an inclusive (start, end) within `size`.
+    Returns None if it cannot be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def _iter_stream(stream: BinaryIO, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yield `length` bytes of `stream` from `start` (to the end if length is None), then close it.
+    """
+    with stream:
+        if start:
+            if stream.seekable():
+                stream.seek(start)
+            else:
+                while start:
+                    skipped = len(stream.read(min(COPY_CHUNK_SIZE, start)))
+                    if not skipped:
+                        return
+                    start -= skipped
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = stream.read(COPY_CHUNK_SIZE if remaining is None else min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def _verified(cache_key: str, name: str, info: dict, decoded: BinaryIO) -> Iterator[bytes]:
+    """
+    Stream a whole decoded file, checking it against its manifest at the end. A corrupt
+    file drops the entry and aborts the response, so the client sees a failed transfer
+    instead of a silently wrong file (ranges cannot be checked and are sent as stored).
+    """
+    return result_cache.verify_chunks(cache_key, name, info, _iter_stream(decoded))
+
+
+def _iter_gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+@router.get("/api/artifacts/{cache_key}/{name}")
+async def download_artifact(
+    request: Request,
+    cache_key: str,
+    name: str,
+    filename: Optional[str] = Query(None, description="File name suggested to the client (Content-Disposition)")
+):
+    """
+    Stream an output file of a cache entry (e.g. distance grids, Voronoi networks)
+
+    Supports single byte ranges (resumable downloads), gzip Content-Encoding when the
+    client accepts it, and conditional requests: the ETag is the cache key, which never
+    changes for a given file.
+    """
+    if not _CACHE_KEY.match(cache_key) or not _STORED_NAME.match(name):
+        return _not_found()
+
+    info = await asyncio.to_thread(result_cache.file_info, cache_key, name)
+    if info is None:
+        return _not_found()
+
+    size = info["size"]
+    accepts_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() != f'"{cache_key}"':
+        # The client's partial copy is of another representation: send everything
+        range_header = None
+
+    # Ranges always apply to the uncompressed representation
+    gzip_encoded = accepts_gzip and not range_header
+    etag = f'"{cache_key}-gzip"' if gzip_encoded else f'"{cache_key}"'
+    download_name = filename or name
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+        # Entries are content-addressed: a given URL always serves the same bytes
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(download_name)}",
+    }
+    media_type = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    try:
+        stored = await asyncio.to_thread(result_cache.open_stored, cache_key, name)
+    except FileNotFoundError:
+        return _not_found()
+
+    if gzip_encoded:
+        headers["Content-Encoding"] = "gzip"
+        if info["encoding"] == "gzip":
+            # Stored gzip-compressed already: send the bytes as they are (the client checks the gzip CRC)
+            headers["Content-Length"] = str(info["stored_size"])
+            body = _iter_stream(stored)
+        else:
+            body = _iter_gzip(_verified(cache_key, name, info, decode_stream(stored, info["encoding"])))
+        return StreamingResponse(body, media_type=media_type, headers=headers)
+
+    decoded = decode_stream(stored, info["encoding"])
+    if range_header:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            decoded.close()
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            _iter_stream(decoded, start, end - start + 1), status_code=206, media_type=media_type, headers=headers
+        )
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_verified(cache_key, name, info, decoded), media_type=media_type, headers=headers)
@@ -0,0 +1,122 @@
+# Batch Screening API Endpoint
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import asyncio
+import json
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
+
+from app.core.analysis import AnalysisError, parse_analyses, validate_analyses, run_analyses
+from app.core.runner import ZeoRunner
+from app.core.scheduler import scheduler
+from app.models.analyze import AnalyzeResponse
+from app.models.batch import BatchItemResult
+from app.utils.file import (
+    StagedUpload, save_uploaded_file, extract_structure_archive, cleanup_task_dir
+)
+from app.utils.logger import logger
+
+router = APIRouter()
+runner = ZeoRunner()
+
+
+async def _analyze_one(
+    index: int,
+    upload: StagedUpload,
+    names: List[str],
+    params: dict,
+    ha: bool,
+    limit: asyncio.Semaphore
+) -> BatchItemResult:
+    """
+    Analyze one structure of a batch. Errors are reported in the item, never raised.
+    """
+    async with limit:
+        try:
+            # Other clients may fill the queue; a batch waits instead of failing
+            results = await run_analyses(runner, upload, names, params, ha=ha, wait_if_busy=True)
+            return BatchItemResult(
+                index=index, filename=upload.filename, success=True, results=AnalyzeResponse(**results)
+            )
+        except AnalysisError as e:
+            return BatchItemResult(
+                index=index, filename=upload.filename, success=False, message=e.message, stderr=e.stderr,
+                error=e.error
+            )
+        except Exception as e:
+            logger.exception(f"[batch] Failed on {upload.filename}")
+            return BatchItemResult(index=index, filename=upload.filename, success=False, message=str(e))
+        finally:
+            upload.discard()
+
+
+@router.post("/api/batch")
+async def batch_screening(
+    structure_files: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    analyses: str = Form("pore_diameter,surface_area,accessible_volume,probe_volume,channel_analysis"),
+    chan_radius: Optional[float] = Form(None),
+    probe_radius: Optional[float] = Form(None),
+    samples: Optional[int] = Form(None),
+    ha: bool = Form(True)
+):
+    """
+    Screen many structures in one request (multipart files and/or a .zip/.tar.gz archive).
+    Results are streamed as NDJSON, one line per structure, in completion order.
+    """
+    names = parse_analyses(analyses)
+    params = {"chan_radius": chan_radius, "probe_radius": probe_radius, "samples": samples}
+    error = validate_analyses(names, params)
+    if error:
+        return JSONResponse(status_code=400, content={"success": False, "message": error})
+
+    # Uploads are closed once the endpoint returns, so save everything before streaming
+    # Each file is hashed and parsed while it is written, so the cache lookup reads nothing again
+    uploads: List[StagedUpload] = [
+        await asyncio.to_thread(save_uploaded_file, f, "batch") for f in structure_files or []
+    ]
+    if archive is not None:
+        archive_path = (await asyncio.to_thread(save_uploaded_file, archive, "batch_archive")).path
+        try:
+            uploads += await asyncio.to_thread(extract_structure_archive, archive_path, "batch")
+        except ValueError as e:
+            for upload in uploads:
+                cleanup_task_dir(upload.path)
+            return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+        finally:
+            cleanup_task_dir(archive_path)
+
+    if not uploads:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "No structure files provided."}
+        )
+
+    logger.info(f"[batch] Screening {len(uploads)} structures: {names}")
+
+    # At most one pool's worth of structures from this batch in flight at once
+    limit = asyncio.Semaphore(scheduler.max_concurrent)
+
+    async def stream():
+        tasks = [
+            asyncio.create_task(_analyze_one(i, upload, names, params, ha, limit))
+            for i, upload in enumerate(uploads)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield json.dumps(jsonable_encoder(item, exclude_none=True)) + "\n"
+        finally:
+            # Client went away: stop pending structures and drop their task directories. Runs
+            # already started are shielded and go on for requests sharing them; discard()
+            # leaves a directory to the last one using it.
+            for task in tasks:
+                task.cancel()
+            for upload in uploads:
+                upload.discard()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
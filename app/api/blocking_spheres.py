@@ -4,12 +4,10 @@
 # Date: 2025-05-22
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
-from pathlib import Path
 
-from app.core.runner import ZeoRunner
+from app.core.runner import ZeoRunner, failure_response
 from app.models.blocking_spheres import BlockingSpheresResponse
-from app.utils.file import save_uploaded_file
+from app.utils.file import staged_upload
 from app.utils.parser import parse_block_from_text
 
 router = APIRouter()
@@ -27,40 +25,32 @@ async def compute_blocking_spheres(
     """
     Identify blocking spheres for adsorption using Zeo++ -block
     """
-    input_path: Path = save_uploaded_file(structure_file, prefix="block")
+    async with staged_upload(structure_file, prefix="block") as upload:
+        args = []
+        if ha:
+            args.append("-ha")
+        args += ["-block", str(probe_radius), str(samples), upload.name]
+
+        result = await runner.run_command(
+            structure_file=upload,
+            zeo_args=args,
+            output_files=[output_filename],
+            extra_identifier="blocking_spheres"
+        )
 
-    args = []
-    if ha:
-        args.append("-ha")
-    args += ["-block", str(probe_radius), str(samples), input_path.name]
+        if not result["success"]:
+            return failure_response(result)
 
-    result = runner.run_command(
-        structure_file=input_path,
-        zeo_args=args,
-        output_files=[output_filename],
-        extra_identifier="blocking_spheres"
-    )
+        output_text = result["output_data"].get(output_filename)
+        if not output_text:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Output file '{output_filename}' was not generated by Zeo++"
+            )
 
-    if not result["success"]:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": "Zeo++ failed",
-                "stderr": result["stderr"]
-            }
-        )
+        parsed = parse_block_from_text(output_text)
 
-    output_text = result["output_data"].get(output_filename)
-    if not output_text:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Output file '{output_filename}' was not generated by Zeo++"
+        return BlockingSpheresResponse(
+            **parsed,
+            cached=result["cached"]
         )
-
-    parsed = parse_block_from_text(output_text)
-
-    return BlockingSpheresResponse(
-        **parsed,
-        cached=result["cached"]
-    )
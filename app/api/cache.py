@@ -0,0 +1,50 @@
+# Cache Management API Endpoints
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import asyncio
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from app.core.cache import result_cache
+from app.models.cache import CacheStatsResponse, CachePurgeResponse
+
+router = APIRouter()
+
+
+@router.get("/api/cache/stats", response_model=CacheStatsResponse)
+async def get_cache_stats():
+    """
+    Show cache entries, size and hit ratio
+    """
+    return CacheStatsResponse(**await asyncio.to_thread(result_cache.stats))
+
+
+@router.delete("/api/cache", response_model=CachePurgeResponse)
+async def purge_cache(
+    extra_identifier: Optional[str] = Query(None, description="Only purge entries of this endpoint, e.g. surface_area"),
+    older_than: Optional[float] = Query(None, description="Only purge entries older than this many seconds"),
+    all: bool = Query(False, description="Purge every entry (required when no filter is given)")
+):
+    """
+    Purge cache entries by endpoint and/or age
+    """
+    if extra_identifier is None and older_than is None and not all:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "Give extra_identifier, older_than, or all=true."}
+        )
+
+    removed = await asyncio.to_thread(result_cache.purge, extra_identifier, older_than)
+    return CachePurgeResponse(removed=removed)
+
+
+@router.post("/api/cache/evict", response_model=CachePurgeResponse)
+async def evict_cache():
+    """
+    Apply TTL and size limits now instead of waiting for the background sweeper
+    """
+    removed = await asyncio.to_thread(result_cache.evict)
+    return CachePurgeResponse(removed=removed)
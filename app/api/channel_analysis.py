@@ -4,12 +4,10 @@
 # Date: 2025-05-13
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
-from pathlib import Path
 
-from app.core.runner import ZeoRunner
+from app.core.runner import ZeoRunner, failure_response
 from app.models.channel_analysis import ChannelAnalysisResponse
-from app.utils.file import save_uploaded_file
+from app.utils.file import staged_upload
 from app.utils.parser import parse_chan_from_text
 
 router = APIRouter()
@@ -25,41 +23,33 @@ async def compute_channel_analysis(
     """
     Analyze channel dimensionality using Zeo++ -chan
     """
-    input_path: Path = save_uploaded_file(structure_file, prefix="chan")
+    async with staged_upload(structure_file, prefix="chan") as upload:
+        args = []
+        if ha:
+            args.append("-ha")
+        args += ["-chan", str(probe_radius), output_filename, upload.name]
+
+        result = await runner.run_command(
+            structure_file=upload,
+            zeo_args=args,
+            output_files=[output_filename],
+            extra_identifier="channel_analysis"
+        )
 
-    args = []
-    if ha:
-        args.append("-ha")
-    args += ["-chan", str(probe_radius), output_filename, input_path.name]
+        if not result["success"]:
+            return failure_response(result)
 
-    result = runner.run_command(
-        structure_file=input_path,
-        zeo_args=args,
-        output_files=[output_filename],
-        extra_identifier="channel_analysis"
-    )
+        output_text = result["output_data"].get(output_filename)
+        if not output_text:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Output file '{output_filename}' was not generated by Zeo++"
+            )
 
-    if not result["success"]:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": "Zeo++ failed",
-                "stderr": result["stderr"]
-            }
-        )
+        parsed = parse_chan_from_text(output_text)
 
-    output_text = result["output_data"].get(output_filename)
-    if not output_text:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Output file '{output_filename}' was not generated by Zeo++"
+        return ChannelAnalysisResponse(
+            **parsed,
+            raw_text=output_text,
+            cached=result["cached"]
         )
-
-    parsed = parse_chan_from_text(output_text)
-
-    return ChannelAnalysisResponse(
-        **parsed,
-        raw_text=output_text,
-        cached=result["cached"]
-    )
@@ -5,11 +5,10 @@
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
-from pathlib import Path
 
-from app.core.runner import ZeoRunner
+from app.core.runner import ZeoRunner, artifact_urls, failure_response
 from app.models.distance_grid import DistanceGridResponse
-from app.utils.file import save_uploaded_file
+from app.utils.file import staged_upload
 
 router = APIRouter()
 runner = ZeoRunner()
@@ -30,40 +29,38 @@ async def generate_distance_grid(
             content={"success": False, "message": "Invalid mode. Use gridG, gridGBohr, or gridBOV."}
         )
 
-    input_path: Path = save_uploaded_file(structure_file, prefix="grid")
+    async with staged_upload(structure_file, prefix="grid") as upload:
+        args = []
+        if ha:
+            args.append("-ha")
+        args += [f"-{mode}", upload.name]
 
-    args = []
-    if ha:
-        args.append("-ha")
-    args += [f"-{mode}", input_path.name]
+        if mode.startswith("gridG"):
+            output_files = [f"{output_basename}.cube"]
+        elif mode == "gridBOV":
+            output_files = [f"{output_basename}.bov", f"{output_basename}.dat"]
+        else:
+            output_files = []
 
-    if mode.startswith("gridG"):
-        output_files = [f"{output_basename}.cube"]
-    elif mode == "gridBOV":
-        output_files = [f"{output_basename}.bov", f"{output_basename}.dat"]
-    else:
-        output_files = []
-
-    result = runner.run_command(
-        structure_file=input_path,
-        zeo_args=args,
-        output_files=output_files,
-        extra_identifier="distance_grid"
-    )
-
-    if not result["success"]:
-        return JSONResponse(
-            status_code=500,
-            content={"success": False, "message": "Zeo++ failed", "stderr": result["stderr"]}
+        result = await runner.run_command(
+            structure_file=upload,
+            zeo_args=args,
+            output_files=output_files,
+            extra_identifier="distance_grid"
         )
 
-    # 检查每个输出文件是否在 output_data 中（非 None 表示确实生成了）
-    missing_files = [f for f in output_files if f not in result["output_data"]]
-    if missing_files:
-        raise HTTPException(status_code=500, detail=f"Missing output files: {', '.join(missing_files)}")
+        if not result["success"]:
+            return failure_response(result)
 
-    return DistanceGridResponse(
-        message="Grid file(s) generated successfully",
-        output_files=output_files,
-        cached=result["cached"]
-    )
+        # 检查每个输出文件是否在 output_data 中（非 None 表示确实生成了）
+        missing_files = [f for f in output_files if f not in result["output_data"]]
+        if missing_files:
+            raise HTTPException(status_code=500, detail=f"Missing output files: {', '.join(missing_files)}")
+
+        return DistanceGridResponse(
+            message="Grid file(s) generated successfully",
+            output_files=output_files,
+            cached=result["cached"],
+            cache_key=next((key for key, _ in result["artifacts"].values()), None),
+            download_urls=artifact_urls(result)
+        )
@@ -0,0 +1,85 @@
+# Asynchronous Job API Endpoints
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from app.core.analysis import estimate_seconds, parse_analyses, validate_analyses
+from app.core.cost import StructureSize
+from app.core.jobs import job_manager
+from app.core.runner import error_response
+from app.models.jobs import JobSubmitRequest, JobStatusResponse, JobResultResponse
+from app.utils.file import staged_upload
+
+router = APIRouter()
+
+
+@router.post("/api/jobs", response_model=JobStatusResponse, status_code=202)
+async def submit_job(
+    structure_file: UploadFile = File(...),
+    analyses: str = Form(...),
+    chan_radius: Optional[float] = Form(None),
+    probe_radius: Optional[float] = Form(None),
+    samples: Optional[int] = Form(None),
+    mode: Optional[str] = Form(None),
+    ha: bool = Form(True)
+):
+    """
+    Submit a long-running analysis (-psd, -ray_atom, -block, -grid*, or a combined -res/-sa/-vol/-volpo/-chan)
+    and return immediately with a job id
+    """
+    request = JobSubmitRequest(
+        analyses=parse_analyses(analyses),
+        chan_radius=chan_radius,
+        probe_radius=probe_radius,
+        samples=samples,
+        mode=mode,
+        ha=ha
+    )
+    params = request.model_dump(exclude={"analyses", "ha"})
+    error = validate_analyses(request.analyses, params, combinable_only=False)
+    if error:
+        return JSONResponse(status_code=400, content={"success": False, "message": error})
+
+    async with staged_upload(structure_file, prefix="job") as upload:
+        input_path = await asyncio.to_thread(upload.materialize)
+        estimate = estimate_seconds(request.analyses, params, StructureSize.of(upload.structure), ha=request.ha)
+        job = await job_manager.submit(
+            input_path, request.analyses, params, ha=request.ha, estimated_seconds=round(estimate, 3)
+        )
+    return JobStatusResponse(**job)
+
+
+@router.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """
+    Report job status and timing
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Job not found"})
+    return JobStatusResponse(**job)
+
+
+@router.get("/api/jobs/{job_id}/result", response_model=JobResultResponse)
+async def get_job_result(job_id: str):
+    """
+    Fetch the result of a finished job
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Job not found"})
+
+    if job["status"] == "failed":
+        return error_response(job["error"], job["stderr"] or "", job.get("error_code"))
+    if job["status"] != "done":
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "message": f"Job is {job['status']}", "status": job["status"]}
+        )
+
+    return JobResultResponse(job_id=job["job_id"], status=job["status"], results=job["results"])
@@ -0,0 +1,20 @@
+# Metrics API Endpoint
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint: per-phase timings, failures and in-flight Zeo++ processes
+    of this worker process
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -4,12 +4,10 @@
 # Date: 2025-05-13
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
-from pathlib import Path
 
 from app.models.pore_diameter import PoreDiameterResponse
-from app.core.runner import ZeoRunner
-from app.utils.file import save_uploaded_file
+from app.core.runner import ZeoRunner, failure_response
+from app.utils.file import staged_upload
 from app.utils.parser import parse_res_from_text
 
 router = APIRouter()
@@ -24,37 +22,29 @@ async def compute_pore_diameter(
     """
     Compute largest included / free / along-free sphere diameters using Zeo++ -res
     """
-    input_path: Path = save_uploaded_file(structure_file, prefix="pore")
-
-    args = []
-    if ha:
-        args.append("-ha")
-    args += ["-res", output_filename, input_path.name]
-
-    result = runner.run_command(
-        structure_file=input_path,
-        zeo_args=args,
-        output_files=[output_filename],
-        extra_identifier="pore_diameter"
-    )
-
-    if not result["success"]:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": "Zeo++ failed",
-                "stderr": result["stderr"]
-            }
+    async with staged_upload(structure_file, prefix="pore") as upload:
+        args = []
+        if ha:
+            args.append("-ha")
+        args += ["-res", output_filename, upload.name]
+
+        result = await runner.run_command(
+            structure_file=upload,
+            zeo_args=args,
+            output_files=[output_filename],
+            extra_identifier="pore_diameter"
         )
 
-    content = result["output_data"].get(output_filename)
-    if not content:
-        raise HTTPException(status_code=500, detail=f"Output file '{output_filename}' was not generated.")
+        if not result["success"]:
+            return failure_response(result)
 
-    parsed = parse_res_from_text(content)
+        content = result["output_data"].get(output_filename)
+        if not content:
+            raise HTTPException(status_code=500, detail=f"Output file '{output_filename}' was not generated.")
 
-    return PoreDiameterResponse(
-        **parsed,
-        cached=result["cached"]
-    )
+        parsed = parse_res_from_text(content)
+
+        return PoreDiameterResponse(
+            **parsed,
+            cached=result["cached"]
+        )
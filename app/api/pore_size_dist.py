@@ -3,13 +3,17 @@
 # Author: Shibo Li
 # Date: 2025-05-13
 
+from typing import Optional
+
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
-from pathlib import Path
 
-from app.core.runner import ZeoRunner
+from app.core.adaptive import run_adaptive
+from app.core.runner import ZeoRunner, failure_response
 from app.models.pore_size_dist import PoreSizeDistResponse
-from app.utils.file import save_uploaded_file
+from app.utils.file import staged_upload
+from app.utils.histogram import histogram_payload, validate_histogram_options
+from app.utils.parser import parse_psd_from_text
 
 router = APIRouter()
 runner = ZeoRunner()
@@ -21,40 +25,59 @@ async def compute_pore_size_distribution(
     probe_radius: float = Form(...),
     samples: int = Form(...),
     output_filename: str = Form("result.psd_histo"),
-    ha: bool = Form(True)
+    ha: bool = Form(True),
+    tolerance: Optional[float] = Form(None),
+    max_samples: Optional[int] = Form(None),
+    histogram_format: str = Form("json"),
+    rebin: int = Form(1),
+    max_bins: Optional[int] = Form(None),
+    include_raw: bool = Form(True)
 ):
     """
-    Compute pore size distribution using Zeo++ -psd command (text-only return)
+    Compute pore size distribution using Zeo++ -psd command
+
+    The histogram is returned as columns (bin_center, count, cumulative, derivative)
+    in `histogram_format`, optionally rebinned; `content` keeps the raw file text.
+
+    With `tolerance`, `samples` is only the first sample count: it doubles until the
+    mean of the distribution is within `tolerance` (relative, estimated) or max_samples is hit.
     """
-    input_path: Path = save_uploaded_file(structure_file, prefix="psd")
-
-    args = []
-    if ha:
-        args.append("-ha")
-    args += ["-psd", str(chan_radius), str(probe_radius), str(samples), output_filename, input_path.name]
-
-    result = runner.run_command(
-        structure_file=input_path,
-        zeo_args=args,
-        output_files=[output_filename],
-        extra_identifier="pore_size_dist"
-    )
-
-    if not result["success"]:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": "Zeo++ failed",
-                "stderr": result["stderr"]
-            }
-        )
+    error = validate_histogram_options(histogram_format, rebin, max_bins)
+    if tolerance is not None and tolerance <= 0:
+        error = "tolerance must be positive."
+    if error:
+        return JSONResponse(status_code=400, content={"success": False, "message": error})
 
-    content = result["output_data"].get(output_filename)
-    if not content:
-        raise HTTPException(status_code=500, detail=f"Output file '{output_filename}' was not generated.")
+    async with staged_upload(structure_file, prefix="psd") as upload:
+        args = []
+        if ha:
+            args.append("-ha")
+        args += ["-psd", str(chan_radius), str(probe_radius), str(samples), output_filename, upload.name]
 
-    return PoreSizeDistResponse(
-        content=content,
-        cached=result["cached"]
-    )
+        adaptive = None
+        if tolerance is None:
+            result = await runner.run_command(
+                structure_file=upload,
+                zeo_args=args,
+                output_files=[output_filename],
+                extra_identifier="pore_size_dist"
+            )
+        else:
+            result, adaptive = await run_adaptive(
+                runner, upload, "pore_size_dist", {"chan_radius": chan_radius, "probe_radius": probe_radius},
+                samples, tolerance, max_samples, ha=ha, output_filename=output_filename
+            )
+
+        if not result["success"]:
+            return failure_response(result)
+
+        content = result["output_data"].get(output_filename)
+        if not content:
+            raise HTTPException(status_code=500, detail=f"Output file '{output_filename}' was not generated.")
+
+        return PoreSizeDistResponse(
+            content=content if include_raw else None,
+            histogram=histogram_payload(parse_psd_from_text, content, histogram_format, rebin, max_bins),
+            cached=result["cached"],
+            adaptive=adaptive
+        )
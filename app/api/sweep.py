@@ -0,0 +1,68 @@
+# Probe-Radius Sweep API Endpoint
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from app.core.analysis import SWEEP_ANALYSES, AnalysisError, parse_analyses, run_sweep, sweep_radii
+from app.core.runner import ZeoRunner, error_response
+from app.models.sweep import SweepPoint, SweepResponse
+from app.utils.file import staged_upload
+
+router = APIRouter()
+runner = ZeoRunner()
+
+
+@router.post("/api/sweep", response_model=SweepResponse, response_model_exclude_none=True)
+async def sweep_probe_radius(
+    structure_file: UploadFile = File(...),
+    analyses: str = Form("surface_area,accessible_volume,channel_analysis"),
+    probe_radii: Optional[str] = Form(None),
+    radius_start: Optional[float] = Form(None),
+    radius_stop: Optional[float] = Form(None),
+    radius_step: Optional[float] = Form(None),
+    samples: int = Form(...),
+    chan_radius: Optional[float] = Form(None),
+    ha: bool = Form(True)
+):
+    """
+    Run -sa / -vol / -volpo / -chan for a ladder of probe radii, reusing one Voronoi
+    decomposition per Zeo++ call (e.g. radius_start=1.2, radius_stop=2.0, radius_step=0.1)
+    """
+    names = parse_analyses(analyses)
+    unknown = [name for name in names if name not in SWEEP_ANALYSES]
+    if not names or unknown:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "message": f"Invalid analyses: {', '.join(unknown) or '(none)'}. Use {', '.join(SWEEP_ANALYSES)}."
+            }
+        )
+    try:
+        radii = sweep_radii(probe_radii, radius_start, radius_stop, radius_step)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    async with staged_upload(structure_file, prefix="sweep") as upload:
+        try:
+            table = await run_sweep(runner, upload, names, radii, samples, chan_radius=chan_radius, ha=ha)
+        except AnalysisError as e:
+            return error_response(e.message, e.stderr, e.error, e.resources)
+
+        points = [
+            SweepPoint(
+                probe_radius=radius,
+                chan_radius=radius if chan_radius is None else chan_radius,
+                **row
+            )
+            for radius, row in zip(radii, table)
+        ]
+        return SweepResponse(
+            analyses=names,
+            points=points,
+            cached_points=sum(all(response.cached for response in row.values()) for row in table)
+        )
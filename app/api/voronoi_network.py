@@ -3,14 +3,15 @@
 # Author: Shibo Li
 # Date: 2025-05-22
 
+import asyncio
+from typing import Optional
+
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
-from pathlib import Path
 
-from app.core.runner import ZeoRunner
+from app.core.runner import ZeoRunner, artifact_urls, failure_response
 from app.models.voronoi_network import VoronoiNetworkResponse
-from app.utils.file import save_uploaded_file
-from app.utils.parser import parse_nt2_from_text
+from app.utils.file import staged_upload
+from app.utils.parser import parse_nt2_network
 
 router = APIRouter()
 runner = ZeoRunner()
@@ -19,40 +20,61 @@ runner = ZeoRunner()
 async def export_voronoi_network(
     structure_file: UploadFile = File(...),
     use_radii: bool = Form(True),
-    output_filename: str = Form("result.nt2")
+    output_filename: str = Form("result.nt2"),
+    include_raw: bool = Form(True),
+    probe_radius: Optional[float] = Form(None)
 ):
     """
     Export Voronoi network from structure using Zeo++ -nt2
+
+    The network is analysed server-side: largest included sphere, bottleneck radius
+    per axis and, given probe_radius, the components accessible to that probe.
+    Set include_raw to false for large networks and fetch the file from download_url instead.
     """
-    input_path: Path = save_uploaded_file(structure_file, prefix="nt2")
-
-    args = []
-    args.append("-r" if use_radii else "-nor")
-    args += ["-nt2", input_path.name]
-
-    result = runner.run_command(
-        structure_file=input_path,
-        zeo_args=args,
-        output_files=[output_filename],
-        extra_identifier="voronoi_network"
-    )
-
-    if not result["success"]:
-        return JSONResponse(
-            status_code=500,
-            content={"success": False, "message": "Zeo++ failed", "stderr": result["stderr"]}
-        )
+    async with staged_upload(structure_file, prefix="nt2") as upload:
+        args = []
+        args.append("-r" if use_radii else "-nor")
+        args += ["-nt2", output_filename, upload.name]
 
-    output_text = result["output_data"].get(output_filename)
-    if not output_text:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Output file '{output_filename}' was not generated by Zeo++"
+        result = await runner.run_command(
+            structure_file=upload,
+            zeo_args=args,
+            output_files=[output_filename],
+            extra_identifier="voronoi_network"
         )
 
-    parsed = parse_nt2_from_text(output_text)
+        if not result["success"]:
+            return failure_response(result)
 
-    return VoronoiNetworkResponse(
-        **parsed,
-        cached=result["cached"]
-    )
+        def analyse():
+            # Large networks: reading (and verifying) the output is as slow as parsing it
+            output_text = result["output_data"].get(output_filename)
+            if not output_text:
+                return None, None, None, None
+            network = parse_nt2_network(output_text)
+            components = network.components(probe_radius) if probe_radius is not None else None
+            return output_text, network, network.bottleneck_radius(), components
+
+        try:
+            output_text, network, bottleneck, components = await asyncio.to_thread(analyse)
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=f"Could not parse '{output_filename}': {e}")
+        if not output_text:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Output file '{output_filename}' was not generated by Zeo++"
+            )
+        artifact = result["artifacts"].get(output_filename)
+
+        return VoronoiNetworkResponse(
+            node_count=network.node_count,
+            edge_count=network.edge_count,
+            largest_included_sphere=network.largest_included_sphere(),
+            bottleneck_radius=bottleneck,
+            probe_radius=probe_radius,
+            components=components,
+            raw=output_text.strip() if include_raw else None,
+            cached=result["cached"],
+            cache_key=artifact[0] if artifact else None,
+            download_url=artifact_urls(result).get(output_filename)
+        )
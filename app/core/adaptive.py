@@ -0,0 +1,133 @@
+# Adaptive Monte Carlo sampling with convergence-based early stopping
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/adaptive.py
+
+import math
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from app.core.analysis import ANALYSES
+from app.core.config import ADAPTIVE_MAX_SAMPLES
+from app.core.runner import ZeoRunner
+from app.utils.file import StagedUpload
+from app.utils.logger import logger
+from app.utils.parser import (
+    parse_psd_from_text,
+    parse_ray_from_text,
+    parse_sa_from_text,
+    parse_vol_from_text,
+    parse_volpo_from_text,
+)
+
+# Quantity whose convergence decides when to stop, per analysis
+METRICS: Dict[str, Callable[[str], float]] = {
+    "surface_area": lambda text: parse_sa_from_text(text)["asa_unitcell"],
+    "accessible_volume": lambda text: parse_vol_from_text(text)["av"]["fraction"],
+    "probe_volume": lambda text: parse_volpo_from_text(text)["poav_fraction"],
+    "pore_size_dist": lambda text: parse_psd_from_text(text).mean,
+    "ray_tracing": lambda text: parse_ray_from_text(text).mean,
+}
+
+
+def _error_factor(previous: int, samples: int) -> float:
+    """
+    Monte Carlo error falls as 1/sqrt(samples): going from `previous` to `samples`, the
+    error of the larger run is about |change| / (sqrt(samples / previous) - 1).
+    """
+    return 1 / (math.sqrt(samples / previous) - 1)
+
+
+def sample_ladder(start: int, max_samples: int) -> list:
+    """
+    Sample counts tried in order: `start`, doubled while below `max_samples`, the last step
+    clamped to `max_samples`. The first step is the plain request for `start` samples, so
+    it shares its cache entry with the single endpoint.
+    """
+    samples = max(1, start)
+    ladder = [samples]
+    while samples < max_samples:
+        samples = min(samples * 2, max_samples)
+        ladder.append(samples)
+    return ladder
+
+
+async def run_adaptive(
+    runner: ZeoRunner,
+    structure_file: Union[Path, StagedUpload],
+    name: str,
+    params: Dict,
+    samples: int,
+    tolerance: float,
+    max_samples: Optional[int] = None,
+    ha: bool = True,
+    output_filename: Optional[str] = None
+) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Run a Monte Carlo analysis with increasing sample counts until the metric converges.
+
+    Each step is cached under the key of the single endpoint with that sample count, so
+    lower steps computed earlier (by any request) are reused.
+
+    Args:
+        runner (ZeoRunner): runner used to execute Zeo++
+        structure_file (Path | StagedUpload): uploaded input file
+        name (str): key of METRICS / ANALYSES
+        params (Dict): chan_radius / probe_radius
+        samples (int): first sample count
+        tolerance (float): stop once the estimated relative error is at most this
+        max_samples (int): optional, upper bound (default and at most ADAPTIVE_MAX_SAMPLES)
+        ha (bool): whether to use high accuracy mode (-ha)
+        output_filename (str): optional, output file name (default of the single endpoint)
+
+    Returns:
+        Tuple[result, info]: run_command-style result of the last step, and
+        {samples, tolerance, estimated_error, converged, history}; info is None if Zeo++ failed
+
+    Raises:
+        SchedulerBusyError: if the scheduler queue is full
+    """
+    spec = ANALYSES[name]
+    metric = METRICS[name]
+    history = []
+    estimated_error = None
+    converged = False
+    result: Dict = {}
+
+    # Clients may lower the bound, not raise it; the first step is a plain request for `samples`
+    limit = min(max_samples or ADAPTIVE_MAX_SAMPLES, ADAPTIVE_MAX_SAMPLES)
+    for step in sample_ladder(samples, max(samples, limit)):
+        command = spec.command({**params, "samples": step}, output_filename=output_filename)
+        results = await runner.run_combined(
+            structure_file=structure_file, commands=[command], flags=["-ha"] if ha else []
+        )
+        result = results[command.key]
+        if not result["success"]:
+            return result, None
+
+        output_text = result["output_data"].get(command.output_files[0])
+        if not output_text:
+            return result, None
+        value = metric(output_text)
+
+        if history:
+            change = abs(value - history[-1]["value"]) * _error_factor(history[-1]["samples"], step)
+            estimated_error = change / abs(value) if value else (0.0 if change == 0 else math.inf)
+            converged = estimated_error <= tolerance
+        history.append({"samples": step, "value": value, "cached": result["cached"]})
+        if converged:
+            break
+
+    logger.info(
+        f"[adaptive] {name}: {history[-1]['samples']} samples, "
+        f"estimated error {estimated_error}, converged={converged}"
+    )
+    return result, {
+        "samples": history[-1]["samples"],
+        "tolerance": tolerance,
+        "estimated_error": estimated_error if estimated_error is None or math.isfinite(estimated_error) else None,
+        "converged": converged,
+        "history": history,
+    }
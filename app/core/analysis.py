@@ -0,0 +1,391 @@
+# Combined analyses on one Zeo++ invocation
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/analysis.py
+
+import asyncio
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel
+
+from app.core.config import SWEEP_MAX_INVOCATIONS, SWEEP_MAX_POINTS
+from app.core.cost import StructureSize, cost_model
+from app.core.runner import ZeoRunner, ZeoCommand, artifact_urls
+from app.core.scheduler import SchedulerBusyError
+from app.utils.file import StagedUpload
+from app.models.accessible_volume import AccessibleVolumeResponse
+from app.models.blocking_spheres import BlockingSpheresResponse
+from app.models.channel_analysis import ChannelAnalysisResponse
+from app.models.distance_grid import DistanceGridResponse
+from app.models.pore_diameter import PoreDiameterResponse
+from app.models.pore_size_dist import PoreSizeDistResponse
+from app.models.probe_volume import ProbeVolumeResponse
+from app.models.ray_tracing import RayTracingResponse
+from app.models.surface_area import SurfaceAreaResponse
+from app.utils.histogram import histogram_payload
+from app.utils.parser import (
+    parse_block_from_text,
+    parse_chan_from_text,
+    parse_psd_from_text,
+    parse_ray_from_text,
+    parse_res_from_text,
+    parse_sa_from_text,
+    parse_vol_from_text,
+    parse_volpo_from_text,
+)
+
+GRID_MODES = {"gridG", "gridGBohr", "gridBOV"}
+
+
+class AnalysisError(Exception):
+    """
+    Raised when Zeo++ fails or does not produce an expected output file.
+    `error` is set when a resource limit stopped it (see runner.error_response).
+    """
+
+    def __init__(
+        self,
+        message: str,
+        stderr: str = "",
+        error: Optional[str] = None,
+        resources: Optional[Dict] = None
+    ):
+        super().__init__(message)
+        self.message = message
+        self.stderr = stderr
+        self.error = error
+        self.resources = resources
+
+    @classmethod
+    def from_result(cls, result: Dict) -> "AnalysisError":
+        return cls(result.get("message", "Zeo++ failed"), result["stderr"], result.get("error"), result.get("resources"))
+
+
+@dataclass(frozen=True)
+class AnalysisSpec:
+    """
+    How one analysis maps onto a Zeo++ command.
+
+    The arguments are built exactly like the matching single endpoint builds them,
+    so both share cache entries.
+    """
+    name: str                              # single endpoint name, also its extra_identifier
+    flag: str                              # Zeo++ command flag
+    params: Tuple[str, ...]                # request parameters passed after the flag, in order
+    output_filename: str                   # default output filename of the single endpoint
+    parser: Optional[Callable[[str], dict]]
+    response_model: Type[BaseModel]
+    raw_field: Optional[str] = None        # response field that receives the raw output text
+    output_arg: bool = True                # whether the output filename is passed to Zeo++
+    combinable: bool = True                # whether it may share a `network` call with others
+
+    def validate(self, params: Dict) -> Optional[str]:
+        return None
+
+    def command(self, params: Dict, output_filename: Optional[str] = None, label: Optional[str] = None) -> ZeoCommand:
+        """
+        output_filename and label tell apart repeated commands in one invocation (see run_sweep);
+        the output name does not enter the cache key.
+        """
+        output_filename = output_filename or self.output_filename
+        args = [self.flag] + [str(params[p]) for p in self.params]
+        if self.output_arg:
+            args.append(output_filename)
+        return ZeoCommand(args=args, output_files=[output_filename], extra_identifier=self.name, label=label)
+
+    def respond(self, command: ZeoCommand, result: Dict) -> BaseModel:
+        output_filename = command.output_files[0]
+        output_text = result["output_data"].get(output_filename)
+        if not output_text:
+            raise AnalysisError(f"Output file '{output_filename}' was not generated.")
+
+        extra = {self.raw_field: output_text} if self.raw_field else {}
+        return self.response_model(**self.parser(output_text), **extra, cached=result["cached"])
+
+
+@dataclass(frozen=True)
+class DistanceGridSpec(AnalysisSpec):
+    """
+    -gridG / -gridGBohr / -gridBOV: the flag depends on `mode` and there is nothing to parse.
+    """
+
+    def validate(self, params: Dict) -> Optional[str]:
+        if params.get("mode") not in GRID_MODES:
+            return "Invalid mode. Use gridG, gridGBohr, or gridBOV."
+        return None
+
+    def command(self, params: Dict, output_filename: Optional[str] = None, label: Optional[str] = None) -> ZeoCommand:
+        mode = params["mode"]
+        basename = Path(self.output_filename).stem
+        if mode.startswith("gridG"):
+            output_files = [f"{basename}.cube"]
+        else:
+            output_files = [f"{basename}.bov", f"{basename}.dat"]
+        return ZeoCommand(args=[f"-{mode}"], output_files=output_files, extra_identifier=self.name, label=label)
+
+    def respond(self, command: ZeoCommand, result: Dict) -> BaseModel:
+        missing_files = [f for f in command.output_files if f not in result["output_data"]]
+        if missing_files:
+            raise AnalysisError(f"Missing output files: {', '.join(missing_files)}")
+        download_urls = artifact_urls(result)
+        return self.response_model(
+            message="Grid file(s) generated successfully",
+            output_files=command.output_files,
+            cached=result["cached"],
+            cache_key=next((key for key, _ in result.get("artifacts", {}).values()), None),
+            download_urls=download_urls
+        )
+
+
+def _psd(text: str) -> dict:
+    return {"content": text, "histogram": histogram_payload(parse_psd_from_text, text)}
+
+
+def _ray(text: str) -> dict:
+    return {"content": text, "histogram": histogram_payload(parse_ray_from_text, text)}
+
+
+ANALYSES: Dict[str, AnalysisSpec] = {
+    spec.name: spec for spec in [
+        AnalysisSpec("pore_diameter", "-res", (), "result.res",
+                     parse_res_from_text, PoreDiameterResponse),
+        AnalysisSpec("surface_area", "-sa", ("chan_radius", "probe_radius", "samples"), "result.sa",
+                     parse_sa_from_text, SurfaceAreaResponse),
+        AnalysisSpec("accessible_volume", "-vol", ("chan_radius", "probe_radius", "samples"), "result.vol",
+                     parse_vol_from_text, AccessibleVolumeResponse),
+        AnalysisSpec("probe_volume", "-volpo", ("chan_radius", "probe_radius", "samples"), "result.volpo",
+                     parse_volpo_from_text, ProbeVolumeResponse),
+        # /api/channel_analysis calls its -chan radius `probe_radius`; it is the accessibility radius
+        AnalysisSpec("channel_analysis", "-chan", ("chan_radius",), "result.chan",
+                     parse_chan_from_text, ChannelAnalysisResponse, raw_field="raw_text"),
+        # Long-running commands: only through /api/jobs, one per Zeo++ call
+        AnalysisSpec("pore_size_dist", "-psd", ("chan_radius", "probe_radius", "samples"), "result.psd_histo",
+                     _psd, PoreSizeDistResponse, combinable=False),
+        AnalysisSpec("ray_tracing", "-ray_atom", ("chan_radius", "probe_radius", "samples"), "result.ray",
+                     _ray, RayTracingResponse, combinable=False),
+        AnalysisSpec("blocking_spheres", "-block", ("probe_radius", "samples"), "result.block",
+                     parse_block_from_text, BlockingSpheresResponse, output_arg=False, combinable=False),
+        DistanceGridSpec("distance_grid", "-grid", ("mode",), "result",
+                         None, DistanceGridResponse, output_arg=False, combinable=False),
+    ]
+}
+
+COMBINABLE_ANALYSES = [name for name, spec in ANALYSES.items() if spec.combinable]
+
+# Analyses that depend on the probe radius and can be swept over a list of radii
+SWEEP_ANALYSES = ["surface_area", "accessible_volume", "probe_volume", "channel_analysis"]
+
+
+def parse_analyses(analyses: str) -> List[str]:
+    """
+    Split a comma-separated `analyses` form field into analysis names.
+    """
+    return [name.strip() for name in analyses.split(",") if name.strip()]
+
+
+def validate_analyses(names: List[str], params: Dict, combinable_only: bool = True) -> Optional[str]:
+    """
+    Check analysis names and the parameters they need.
+
+    Args:
+        names (List[str]): requested analyses
+        params (Dict): request parameters
+        combinable_only (bool): reject analyses that cannot share a Zeo++ call
+
+    Returns:
+        Optional[str]: error message for a 400 response, or None if the request is valid
+    """
+    allowed = COMBINABLE_ANALYSES if combinable_only else list(ANALYSES)
+    unknown = [name for name in names if name not in allowed]
+    if not names or unknown:
+        return f"Invalid analyses: {', '.join(unknown) or '(none)'}. Use {', '.join(allowed)}."
+
+    if len(names) > 1 and not all(ANALYSES[name].combinable for name in names):
+        return f"Only {', '.join(COMBINABLE_ANALYSES)} can be combined in one request."
+
+    required = {p for name in names for p in ANALYSES[name].params}
+    missing = sorted(p for p in required if params.get(p) is None)
+    if missing:
+        return f"Missing parameters: {', '.join(missing)}"
+
+    for name in names:
+        error = ANALYSES[name].validate(params)
+        if error:
+            return error
+    return None
+
+
+async def run_analyses(
+    runner: ZeoRunner,
+    structure_file: Union[Path, StagedUpload],
+    names: List[str],
+    params: Dict,
+    ha: bool = True,
+    wait_if_busy: bool = False,
+    on_start: Optional[Callable[[], None]] = None
+) -> Dict[str, BaseModel]:
+    """
+    Run the requested analyses with one Zeo++ invocation and parse each output.
+
+    Args:
+        runner (ZeoRunner): runner used to execute Zeo++
+        structure_file (Path | StagedUpload): uploaded input file
+        names (List[str]): keys of ANALYSES
+        params (Dict): chan_radius / probe_radius / samples / mode
+        ha (bool): whether to use high accuracy mode (-ha)
+        wait_if_busy (bool): retry after Retry-After instead of raising SchedulerBusyError
+        on_start (Callable): optional, called when Zeo++ gets its scheduler slot (not on a cache hit)
+
+    Returns:
+        Dict[name, response model]: same objects the single endpoints return
+
+    Raises:
+        AnalysisError: if Zeo++ fails or an output file is missing
+        SchedulerBusyError: if the scheduler queue is full and wait_if_busy is False
+    """
+    specs = [ANALYSES[name] for name in names]
+    commands = [spec.command(params) for spec in specs]
+    while True:
+        try:
+            results = await runner.run_combined(
+                structure_file=structure_file,
+                commands=commands,
+                flags=["-ha"] if ha else [],
+                on_start=on_start
+            )
+            break
+        except SchedulerBusyError as e:
+            if not wait_if_busy:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+    parsed: Dict[str, BaseModel] = {}
+    for spec, command in zip(specs, commands):
+        result = results[spec.name]
+        if not result["success"]:
+            raise AnalysisError.from_result(result)
+        parsed[spec.name] = spec.respond(command, result)
+    return parsed
+
+
+def estimate_seconds(names: List[str], params: Dict, size: Optional[StructureSize], ha: bool = True) -> float:
+    """
+    Expected runtime of run_analyses, ignoring results that may already be cached.
+    """
+    commands = [ANALYSES[name].command(params) for name in names]
+    zeo_args = (["-ha"] if ha else []) + [a for command in commands for a in command.args]
+    return cost_model.estimate(zeo_args, size)
+
+
+def sweep_radii(
+    probe_radii: Optional[str] = None,
+    start: Optional[float] = None,
+    stop: Optional[float] = None,
+    step: Optional[float] = None
+) -> List[float]:
+    """
+    Probe radii of a sweep: an explicit comma-separated list, or start..stop (inclusive) by step.
+
+    Raises:
+        ValueError: if neither form is complete, a value is invalid, or there are
+            more than SWEEP_MAX_POINTS radii
+    """
+    if probe_radii:
+        radii = [float(r) for r in probe_radii.split(",") if r.strip()]
+    elif None not in (start, stop, step):
+        if step <= 0 or stop < start:
+            raise ValueError("radius_step must be positive and radius_stop >= radius_start.")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        if count > SWEEP_MAX_POINTS:
+            raise ValueError(f"At most {SWEEP_MAX_POINTS} radii per sweep.")
+        radii = [round(start + i * step, 6) for i in range(count)]
+    else:
+        raise ValueError("Give probe_radii, or radius_start, radius_stop and radius_step.")
+
+    radii = list(dict.fromkeys(radii))
+    if not radii or any(not math.isfinite(r) or r < 0 for r in radii):
+        raise ValueError("Probe radii must be non-negative numbers.")
+    if len(radii) > SWEEP_MAX_POINTS:
+        raise ValueError(f"At most {SWEEP_MAX_POINTS} radii per sweep.")
+    return radii
+
+
+async def run_sweep(
+    runner: ZeoRunner,
+    structure_file: Union[Path, StagedUpload],
+    names: List[str],
+    radii: List[float],
+    samples: int,
+    chan_radius: Optional[float] = None,
+    ha: bool = True,
+    invocations: int = SWEEP_MAX_INVOCATIONS
+) -> List[Dict[str, BaseModel]]:
+    """
+    Run probe-radius dependent analyses for each radius of a ladder.
+
+    All points are chained into as few `network` calls as `invocations` allows (one call
+    computes the Voronoi decomposition once for every point it holds); the calls run
+    concurrently. Each point is cached under the key of its single endpoint, so cached
+    points are not re-run and later single requests hit them.
+
+    Args:
+        runner (ZeoRunner): runner used to execute Zeo++
+        structure_file (Path | StagedUpload): uploaded input file
+        names (List[str]): keys of SWEEP_ANALYSES
+        radii (List[float]): probe radii; also the accessibility radius unless chan_radius is set
+        samples (int): Monte Carlo samples for -sa / -vol / -volpo
+        chan_radius (float): optional, fixed accessibility radius
+        ha (bool): whether to use high accuracy mode (-ha)
+        invocations (int): maximum number of concurrent `network` calls
+
+    Returns:
+        List[Dict[name, response model]]: one dict per radius, in order
+
+    Raises:
+        AnalysisError: if Zeo++ fails or an output file is missing
+        SchedulerBusyError: if the scheduler queue is full
+    """
+    points = []
+    for i, radius in enumerate(radii):
+        params = {
+            "chan_radius": radius if chan_radius is None else chan_radius,
+            "probe_radius": radius,
+            "samples": samples,
+        }
+        point = []
+        for name in names:
+            spec = ANALYSES[name]
+            # -chan has a single radius: the probe whose channels are analysed
+            spec_params = {"chan_radius": radius} if name == "channel_analysis" else params
+            point.append((spec, spec.command(
+                spec_params, output_filename=f"p{i}_{spec.output_filename}", label=f"{name}@{i}"
+            )))
+        points.append(point)
+
+    chunk_count = max(1, min(invocations, len(points)))
+    chunks = [points[i::chunk_count] for i in range(chunk_count)]
+    chunk_results = await asyncio.gather(*[
+        runner.run_combined(
+            structure_file=structure_file,
+            commands=[command for point in chunk for _, command in point],
+            flags=["-ha"] if ha else []
+        )
+        for chunk in chunks
+    ])
+    results = {key: result for chunk in chunk_results for key, result in chunk.items()}
+
+    table = []
+    for point in points:
+        row = {}
+        for spec, command in point:
+            result = results[command.key]
+            if not result["success"]:
+                raise AnalysisError.from_result(result)
+            row[spec.name] = spec.respond(command, result)
+        table.append(row)
+    return table
@@ -0,0 +1,368 @@
+# Result cache with size/TTL bounded LRU eviction
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/cache.py
+
+import asyncio
+import functools
+import hashlib
+import time
+from collections import Counter
+from collections.abc import Mapping
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional
+
+from app.utils.logger import logger
+from app.utils.file import compute_file_digest
+from app.core.cache_backends import (
+    COPY_CHUNK_SIZE,
+    CacheBackend,
+    LocalDirBackend,
+    LocalObjectStore,
+    ObjectStoreBackend,
+    S3ObjectStore,
+    SQLiteBackend,
+    decode_stream,
+    resolve_encoding,
+)
+from app.core import metrics
+from app.core.config import (
+    CACHE_DIR,
+    CACHE_BACKEND,
+    CACHE_SQLITE_PATH,
+    CACHE_SHARED_DIR,
+    CACHE_S3_BUCKET,
+    CACHE_S3_PREFIX,
+    CACHE_S3_ENDPOINT,
+    CACHE_COMPRESSION,
+    CACHE_MAX_BYTES,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL_SECONDS,
+    CACHE_SWEEP_INTERVAL,
+)
+
+MANIFEST_VERSION = 1
+
+
+class CacheIntegrityError(Exception):
+    """
+    Raised when a cached file no longer matches its manifest.
+    """
+
+
+class LazyOutputs(Mapping):
+    """
+    Output files by name; a file is only read when its content is accessed.
+    Membership tests and iteration never touch file contents.
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[[], str]], cache_key: Optional[str] = None):
+        self._loaders = loaders
+        # Set when the files live in a cache entry (and can be downloaded from it)
+        self.cache_key = cache_key
+
+    @classmethod
+    def from_texts(cls, texts: Dict[str, str]) -> "LazyOutputs":
+        return cls({name: (lambda text=text: text) for name, text in texts.items()})
+
+    def loader(self, name: str) -> Callable[[], str]:
+        return self._loaders[name]
+
+    def __getitem__(self, name: str) -> str:
+        return self._loaders[name]()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._loaders)
+
+    def __len__(self) -> int:
+        return len(self._loaders)
+
+
+def create_backend(kind: str = CACHE_BACKEND) -> CacheBackend:
+    """
+    Build the cache backend selected by CACHE_BACKEND
+
+    Args:
+        kind (str): local | sqlite | shared | s3
+
+    Returns:
+        CacheBackend: storage for cache entries
+    """
+    if kind == "local":
+        return LocalDirBackend(CACHE_DIR)
+    if kind == "sqlite":
+        return SQLiteBackend(CACHE_SQLITE_PATH)
+    if kind == "shared":
+        if not CACHE_SHARED_DIR:
+            raise ValueError("CACHE_BACKEND=shared requires CACHE_SHARED_DIR")
+        return ObjectStoreBackend(LocalObjectStore(Path(CACHE_SHARED_DIR)))
+    if kind == "s3":
+        if not CACHE_S3_BUCKET:
+            raise ValueError("CACHE_BACKEND=s3 requires CACHE_S3_BUCKET")
+        return ObjectStoreBackend(S3ObjectStore(CACHE_S3_BUCKET, CACHE_S3_PREFIX, CACHE_S3_ENDPOINT))
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}. Use local, sqlite, shared or s3.")
+
+
+class ResultCache:
+    """
+    Zeo++ output cache on top of a CacheBackend (see create_backend).
+
+    Every entry carries a manifest (extra_identifier, creation time, per-file size,
+    sha256 and storage encoding, Zeo++ version, runtime). Backends publish entries
+    atomically. Lookups check that the listed files exist with their recorded sizes;
+    contents are only read when a caller accesses them (a parser, a download), and their
+    checksums are verified then: a mismatch drops the entry and raises
+    CacheIntegrityError, which the API answers with 503 so a retry recomputes it.
+    Files are stored as bytes, optionally gzip/zstd compressed (CACHE_COMPRESSION).
+
+    Eviction drops expired entries (CACHE_TTL_SECONDS since creation), then least
+    recently hit ones until CACHE_MAX_ENTRIES and CACHE_MAX_BYTES hold.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        compression: str = CACHE_COMPRESSION,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+    ):
+        self.backend = backend or create_backend()
+        self.compression = resolve_encoding(compression)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, cache_key: str) -> bool:
+        return self.backend.contains(cache_key)
+
+    def outputs(self, cache_key: str) -> Optional[LazyOutputs]:
+        """
+        Outputs of an entry, read (and checksum-verified) only when accessed.
+        Returns None if the entry is gone or invalid (invalid entries are removed).
+        """
+        meta = self.backend.read_manifest(cache_key)
+        if meta is None:
+            return None
+
+        if not self._complete(cache_key, meta):
+            logger.warning(f"[cache] Dropping invalid entry: {cache_key}")
+            self.backend.remove(cache_key)
+            return None
+
+        files = meta["files"]
+
+        return LazyOutputs({
+            name: functools.partial(self.read_text, cache_key, name, info) for name, info in files.items()
+        }, cache_key=cache_key)
+
+    def _complete(self, cache_key: str, meta: Dict) -> bool:
+        """
+        Cheap check that every file of the manifest is stored with its recorded size.
+        """
+        files = meta.get("files")
+        if not isinstance(files, dict):
+            return False
+        sizes = self.backend.stored_sizes(cache_key)
+        return all(
+            name in sizes and sizes[name] == info.get("stored_size", info.get("size"))
+            for name, info in files.items()
+        )
+
+    def load(self, cache_key: str) -> Optional[LazyOutputs]:
+        """
+        Same as outputs(), recording the hit.
+        """
+        outputs = self.outputs(cache_key)
+        if outputs is None:
+            return None
+        self.backend.touch(cache_key)
+        self.hits += 1
+        return outputs
+
+    def file_info(self, cache_key: str, name: str) -> Optional[Dict]:
+        """
+        Manifest record (size, sha256, encoding, stored_size) of one file of an entry,
+        or None if the entry or file does not exist.
+        """
+        meta = self.backend.read_manifest(cache_key)
+        info = (meta or {}).get("files", {}).get(name)
+        if info is None:
+            return None
+        return {"encoding": self.backend.default_encoding, "stored_size": info.get("size"), **info}
+
+    def open_stored(self, cache_key: str, name: str) -> BinaryIO:
+        """
+        Open one file of an entry as stored (see file_info for its encoding).
+        Raises FileNotFoundError if it is gone.
+        """
+        self.backend.touch(cache_key)
+        return self.backend.open(cache_key, name)
+
+    def _corrupt(self, cache_key: str, message: str) -> CacheIntegrityError:
+        self.backend.remove(cache_key)
+        metrics.failure("cache_integrity")
+        return CacheIntegrityError(f"Cache entry {cache_key} {message}")
+
+    def verify_chunks(self, cache_key: str, name: str, info: Dict, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """
+        Pass the decoded chunks of a whole file through, checking them against its
+        manifest entry once the last one was read.
+
+        Raises:
+            CacheIntegrityError: after the last chunk, if the content does not match (the entry is removed)
+        """
+        m = hashlib.sha256()
+        size = 0
+        for chunk in chunks:
+            m.update(chunk)
+            size += len(chunk)
+            yield chunk
+        if size != info.get("size") or m.hexdigest() != info.get("sha256"):
+            raise self._corrupt(cache_key, f"has a corrupt {name}")
+
+    def read_bytes(self, cache_key: str, name: str, info: Dict) -> bytes:
+        """
+        Read and decode one stored file, checking it against its manifest entry.
+
+        Raises:
+            CacheIntegrityError: if the content does not match (the entry is removed)
+        """
+        try:
+            with self.backend.open(cache_key, name) as raw:
+                stream = decode_stream(raw, info.get("encoding", self.backend.default_encoding))
+                chunks = iter(functools.partial(stream.read, COPY_CHUNK_SIZE), b"")
+                return b"".join(self.verify_chunks(cache_key, name, info, chunks))
+        except (FileNotFoundError, OSError, EOFError) as e:
+            raise self._corrupt(cache_key, f"lost {name}: {e}") from e
+
+    def read_text(self, cache_key: str, name: str, info: Dict) -> str:
+        # Binary outputs (e.g. -gridBOV .dat) are kept byte-exact in the backend
+        return self.read_bytes(cache_key, name, info).decode(errors="replace")
+
+    def record_miss(self) -> None:
+        self.misses += 1
+
+    def store(
+        self,
+        cache_key: str,
+        outputs: Dict[str, Path],
+        extra_identifier: Optional[str],
+        provenance: Optional[Dict] = None
+    ) -> bool:
+        """
+        Publish produced output files as the entry of `cache_key`, with their manifest.
+        Nothing is cached if an expected output is missing.
+
+        Args:
+            cache_key (str): entry key
+            outputs (Dict[str, Path]): name inside the entry -> produced file
+            extra_identifier (str): endpoint the entry belongs to
+            provenance (Dict): optional, extra manifest fields (zeo_version, runtime_seconds)
+
+        Returns:
+            bool: whether the entry was stored (False if incomplete or already present)
+        """
+        missing = [path.name for path in outputs.values() if not path.exists()]
+        if missing:
+            logger.warning(f"[cache] Not caching {cache_key}: missing outputs {', '.join(missing)}")
+            return False
+
+        files = {
+            name: {"size": path.stat().st_size, "sha256": compute_file_digest(path)}
+            for name, path in outputs.items()
+        }
+        meta = {
+            "version": MANIFEST_VERSION,
+            "extra_identifier": extra_identifier,
+            "created_at": time.time(),
+            "size_bytes": sum(f["size"] for f in files.values()),
+            "files": files,
+            **(provenance or {}),
+        }
+        return self.backend.write(cache_key, outputs, meta, self.compression)
+
+    def stats(self) -> Dict:
+        entries = self.backend.entries()
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "entries": len(entries),
+            "bytes": sum(e["size_bytes"] for e in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "by_identifier": dict(Counter(e["extra_identifier"] or "unknown" for e in entries)),
+            "limits": {
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            },
+        }
+
+    def purge(self, extra_identifier: Optional[str] = None, older_than: Optional[float] = None) -> int:
+        """
+        Remove entries matching the given endpoint identifier and/or older than `older_than` seconds.
+        With no filter every entry is removed. Returns the number of removed entries.
+        """
+        now = time.time()
+        removed = 0
+        for entry in self.backend.entries():
+            if extra_identifier is not None and entry["extra_identifier"] != extra_identifier:
+                continue
+            if older_than is not None and now - entry["created_at"] < older_than:
+                continue
+            self.backend.remove(entry["key"])
+            removed += 1
+        logger.info(f"[cache] Purged {removed} entries")
+        return removed
+
+    def evict(self) -> int:
+        """
+        Enforce TTL, max entries and max bytes. Returns the number of removed entries.
+        """
+        now = time.time()
+        self.backend.cleanup()
+        entries = self.backend.entries()
+        removed = 0
+
+        if self.ttl_seconds:
+            expired = [e for e in entries if now - e["created_at"] > self.ttl_seconds]
+            for entry in expired:
+                self.backend.remove(entry["key"])
+            removed += len(expired)
+            entries = [e for e in entries if now - e["created_at"] <= self.ttl_seconds]
+
+        # Least recently hit first
+        entries.sort(key=lambda e: e["last_hit_at"])
+        total_bytes = sum(e["size_bytes"] for e in entries)
+        while entries and (
+            (self.max_entries and len(entries) > self.max_entries)
+            or (self.max_bytes and total_bytes > self.max_bytes)
+        ):
+            entry = entries.pop(0)
+            self.backend.remove(entry["key"])
+            total_bytes -= entry["size_bytes"]
+            removed += 1
+
+        if removed:
+            logger.info(f"[cache] Evicted {removed} entries")
+        return removed
+
+    async def sweep_forever(self, interval: int = CACHE_SWEEP_INTERVAL) -> None:
+        """
+        Background sweeper: run evict() every `interval` seconds.
+        """
+        while True:
+            try:
+                await asyncio.to_thread(self.evict)
+            except Exception:
+                logger.exception("[cache] Sweep failed")
+            await asyncio.sleep(interval)
+
+
+result_cache = ResultCache()
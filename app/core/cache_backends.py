@@ -0,0 +1,711 @@
+# Storage backends for the result cache
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/cache_backends.py
+
+import fcntl
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from app.utils.logger import logger
+
+try:
+    import zstandard
+except ImportError:  # optional, CACHE_COMPRESSION=zstd falls back to gzip
+    zstandard = None
+
+# Per-entry manifest (metadata + file list)
+META_NAME = ".meta.json"
+
+# Staging / trash leftovers of crashed writers older than this are removed by cleanup()
+STALE_WORK_AGE = 3600
+
+# Stored file encodings
+ENCODINGS = ("none", "gzip", "zstd")
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Linux ioctl that clones a file's extents (reflink) on btrfs / xfs
+_FICLONE = 0x40049409
+
+
+def resolve_encoding(encoding: str) -> str:
+    """
+    Validate a CACHE_COMPRESSION value, falling back to gzip when zstd is not installed.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown CACHE_COMPRESSION: {encoding}. Use {', '.join(ENCODINGS)}.")
+    if encoding == "zstd" and zstandard is None:
+        logger.warning("[cache] zstandard is not installed, using gzip compression")
+        return "gzip"
+    return encoding
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """
+    Hardlink `src` to `dst`, else reflink it, else copy it (e.g. across filesystems).
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return
+    except OSError:
+        pass
+    shutil.copyfile(src, dst)
+
+
+def encode_file(src: Path, dst: Path, encoding: str) -> int:
+    """
+    Write `src` to `dst` in the given encoding, streaming. Returns the stored size.
+    """
+    if encoding == "none":
+        link_or_copy(src, dst)
+    elif encoding == "gzip":
+        with open(src, "rb") as s, gzip.open(dst, "wb", compresslevel=6) as d:
+            shutil.copyfileobj(s, d, COPY_CHUNK_SIZE)
+    elif encoding == "zstd":
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            zstandard.ZstdCompressor().copy_stream(s, d)
+    else:
+        raise ValueError(f"Cannot encode {encoding}")
+    return dst.stat().st_size
+
+
+def decode_stream(stream: BinaryIO, encoding: str) -> BinaryIO:
+    """
+    Wrap a stored stream so that reading it yields the original bytes.
+    """
+    if encoding == "none":
+        return stream
+    if encoding == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd-compressed cache entries requires the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    raise ValueError(f"Unknown encoding: {encoding}")
+
+
+def _record_stored(meta: Dict, name: str, encoding: str, stored_size: int) -> None:
+    meta["files"][name].update({"encoding": encoding, "stored_size": stored_size})
+
+
+class CacheBackend(ABC):
+    """
+    Where cache entries live. Backends only move bytes around; manifests are built and
+    checked by ResultCache.
+
+    An entry is a manifest plus named output files, each stored in an encoding recorded
+    in the manifest. write() must publish an entry atomically: readers see all of it or
+    nothing. File contents are streamed, never read into memory as a whole by write().
+    """
+    name = "abstract"
+    # Encoding assumed for files whose manifest predates per-file encodings
+    default_encoding = "none"
+
+    @abstractmethod
+    def contains(self, cache_key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def read_manifest(self, cache_key: str) -> Optional[Dict]:
+        """
+        Return the manifest, None if the entry does not exist, or {} if it is unreadable.
+        """
+
+    @abstractmethod
+    def stored_sizes(self, cache_key: str) -> Dict[str, int]:
+        """
+        Stored (encoded) size of every file of an entry, without reading the files.
+        """
+
+    @abstractmethod
+    def open(self, cache_key: str, name: str) -> BinaryIO:
+        """
+        Open a stored file (still encoded). Raises FileNotFoundError if it is gone.
+        """
+
+    @abstractmethod
+    def write(self, cache_key: str, outputs: Dict[str, Path], meta: Dict, encoding: str = "none") -> bool:
+        """
+        Publish files and manifest as the entry of `cache_key`, recording each file's
+        encoding and stored size in the manifest. Returns False if the entry already exists.
+        """
+
+    @abstractmethod
+    def touch(self, cache_key: str) -> None:
+        """
+        Record a hit (the LRU clock).
+        """
+
+    @abstractmethod
+    def entries(self) -> List[Dict]:
+        """
+        Describe every entry: key, extra_identifier, created_at, last_hit_at, size_bytes.
+        """
+
+    @abstractmethod
+    def remove(self, cache_key: str) -> None:
+        ...
+
+    def cleanup(self) -> None:
+        """
+        Remove leftovers of interrupted writes.
+        """
+
+
+def _entry_summary(key: str, meta: Dict, last_hit: float) -> Dict:
+    return {
+        "key": key,
+        "last_hit_at": last_hit,
+        "extra_identifier": meta.get("extra_identifier"),
+        "created_at": meta.get("created_at", last_hit),
+        "size_bytes": meta.get("size_bytes", 0),
+    }
+
+
+class LocalDirBackend(CacheBackend):
+    """
+    One <root>/<key>/ directory per entry with a .meta.json manifest, whose mtime is the
+    LRU clock. Entries are assembled in a .staging-* directory and renamed into place;
+    removal renames them away first so readers never see half-deleted entries.
+    """
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, cache_key: str) -> Path:
+        return self.root / cache_key
+
+    def contains(self, cache_key: str) -> bool:
+        return self._path(cache_key).exists()
+
+    def read_manifest(self, cache_key: str) -> Optional[Dict]:
+        cache_dir = self._path(cache_key)
+        try:
+            return json.loads((cache_dir / META_NAME).read_text())
+        except FileNotFoundError:
+            # Entry gone, or (dir without manifest) written before manifests existed
+            return {} if cache_dir.exists() else None
+        except json.JSONDecodeError:
+            return {}
+
+    def stored_sizes(self, cache_key: str) -> Dict[str, int]:
+        sizes = {}
+        try:
+            for path in self._path(cache_key).iterdir():
+                if path.name != META_NAME:
+                    sizes[path.name] = path.stat().st_size
+        except FileNotFoundError:
+            pass
+        return sizes
+
+    def open(self, cache_key: str, name: str) -> BinaryIO:
+        return open(self._path(cache_key) / name, "rb")
+
+    def write(self, cache_key: str, outputs: Dict[str, Path], meta: Dict, encoding: str = "none") -> bool:
+        """
+        Uncompressed files are hardlinked (or reflinked) from the task directory when it
+        is on the same filesystem, so publishing costs no copy.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".staging-{cache_key}-{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            for name, out_path in outputs.items():
+                _record_stored(meta, name, encoding, encode_file(out_path, staging / name, encoding))
+            meta["size_bytes"] = sum(f["stored_size"] for f in meta["files"].values())
+            (staging / META_NAME).write_text(json.dumps(meta))
+            try:
+                os.rename(staging, self._path(cache_key))
+            except OSError:
+                # Another worker published the entry first
+                return False
+            return True
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def touch(self, cache_key: str) -> None:
+        try:
+            os.utime(self._path(cache_key) / META_NAME)
+        except FileNotFoundError:
+            pass
+
+    def entries(self) -> List[Dict]:
+        entries = []
+        if not self.root.exists():
+            return entries
+
+        for cache_dir in self.root.iterdir():
+            if cache_dir.name.startswith(".") or not cache_dir.is_dir():
+                continue
+            meta_path = cache_dir / META_NAME
+            try:
+                if meta_path.exists():
+                    meta = json.loads(meta_path.read_text())
+                    last_hit = meta_path.stat().st_mtime
+                else:
+                    # Entry written before manifests existed
+                    stat = cache_dir.stat()
+                    meta = {
+                        "created_at": stat.st_mtime,
+                        "size_bytes": sum(f.stat().st_size for f in cache_dir.iterdir()),
+                    }
+                    last_hit = stat.st_mtime
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            entries.append(_entry_summary(cache_dir.name, meta, last_hit))
+        return entries
+
+    def remove(self, cache_key: str) -> None:
+        trash = self.root / f".trash-{cache_key}-{uuid.uuid4().hex}"
+        try:
+            os.rename(self._path(cache_key), trash)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def cleanup(self) -> None:
+        if not self.root.exists():
+            return
+        cutoff = time.time() - STALE_WORK_AGE
+        for pattern in (".staging-*", ".trash-*"):
+            for work_dir in self.root.glob(pattern):
+                try:
+                    if work_dir.stat().st_mtime < cutoff:
+                        shutil.rmtree(work_dir, ignore_errors=True)
+                except FileNotFoundError:
+                    continue
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Single-file store: an `entries` table indexed by key (manifest, LRU clock) and a
+    `files` table with compressed blobs (gzip unless zstd is configured). Each write is
+    one transaction. Blobs are streamed in and out with incremental blob I/O, never held
+    in memory as a whole.
+    """
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            extra_identifier TEXT,
+            created_at REAL NOT NULL,
+            last_hit_at REAL NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            meta TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_last_hit ON entries (last_hit_at);
+        CREATE TABLE IF NOT EXISTS files (
+            key TEXT NOT NULL REFERENCES entries (key) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (key, name)
+        );
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        One short-lived connection per call (callers run in arbitrary worker threads);
+        commits on success, rolls back on error.
+        """
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def contains(self, cache_key: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM entries WHERE key = ?", (cache_key,)).fetchone() is not None
+
+    def read_manifest(self, cache_key: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT meta FROM entries WHERE key = ?", (cache_key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return {}
+
+    def stored_sizes(self, cache_key: str) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, length(data) FROM files WHERE key = ?", (cache_key,)).fetchall()
+        return dict(rows)
+
+    def open(self, cache_key: str, name: str) -> BinaryIO:
+        # The stream may be read from other threads (e.g. a download response), one at a time
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        try:
+            row = conn.execute("SELECT rowid FROM files WHERE key = ? AND name = ?", (cache_key, name)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"{cache_key}/{name}")
+            blob = conn.blobopen("files", "data", row[0], readonly=True)
+        except BaseException:
+            conn.close()
+            raise
+        return io.BufferedReader(_BlobReader(conn, blob), COPY_CHUNK_SIZE)
+
+    def write(self, cache_key: str, outputs: Dict[str, Path], meta: Dict, encoding: str = "none") -> bool:
+        # Blobs are always compressed
+        encoding = "gzip" if encoding == "none" else encoding
+        with tempfile.TemporaryDirectory(dir=self.path.parent) as tmp:
+            encoded = {}
+            for name, path in outputs.items():
+                encoded[name] = Path(tmp) / name
+                _record_stored(meta, name, encoding, encode_file(path, encoded[name], encoding))
+            meta["size_bytes"] = sum(f["stored_size"] for f in meta["files"].values())
+
+            with self._connect() as conn:
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO entries (key, extra_identifier, created_at, last_hit_at, size_bytes, meta) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (cache_key, meta.get("extra_identifier"), meta["created_at"], meta["created_at"],
+                     meta["size_bytes"], json.dumps(meta))
+                ).rowcount
+                if not inserted:
+                    return False
+                for name, path in encoded.items():
+                    rowid = conn.execute(
+                        "INSERT INTO files (key, name, data) VALUES (?, ?, zeroblob(?))",
+                        (cache_key, name, meta["files"][name]["stored_size"])
+                    ).lastrowid
+                    with conn.blobopen("files", "data", rowid) as blob, path.open("rb") as src:
+                        while chunk := src.read(COPY_CHUNK_SIZE):
+                            blob.write(chunk)
+        return True
+
+    def touch(self, cache_key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE entries SET last_hit_at = ? WHERE key = ?", (time.time(), cache_key))
+
+    def entries(self) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, extra_identifier, created_at, last_hit_at, size_bytes FROM entries"
+            ).fetchall()
+        return [
+            {"key": key, "extra_identifier": ident, "created_at": created, "last_hit_at": hit, "size_bytes": size}
+            for key, ident, created, hit, size in rows
+        ]
+
+    def remove(self, cache_key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (cache_key,))
+
+
+class _BlobReader(io.RawIOBase):
+    """
+    Readable stream over an SQLite blob; closing it closes the blob and its connection.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, blob: "sqlite3.Blob"):
+        self._conn = conn
+        self._blob = blob
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        try:
+            data = self._blob.read(len(buffer))
+        except sqlite3.Error as e:
+            # The row was deleted or rewritten while being read
+            raise OSError(str(e)) from e
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._blob.close()
+            self._conn.close()
+        super().close()
+
+
+@dataclass
+class ObjectInfo:
+    name: str
+    size: int
+    modified: float
+
+
+class ObjectStore(ABC):
+    """
+    Minimal flat key/value object interface (S3-like): whole-object put/get, listing by prefix.
+    """
+    # CACHE_BACKEND value selecting the store
+    name = "abstract"
+
+    @abstractmethod
+    def put(self, name: str, source: Path) -> None:
+        ...
+
+    @abstractmethod
+    def put_bytes(self, name: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[bytes]:
+        """
+        Object content, or None if it does not exist.
+        """
+
+    def open(self, name: str) -> BinaryIO:
+        """
+        Readable stream of an object. Raises FileNotFoundError if it does not exist.
+        """
+        data = self.get(name)
+        if data is None:
+            raise FileNotFoundError(name)
+        return io.BytesIO(data)
+
+    @abstractmethod
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        ...
+
+    @abstractmethod
+    def delete(self, name: str) -> None:
+        ...
+
+    def touch(self, name: str) -> None:
+        """
+        Refresh an object's modification time, where the store supports it cheaply.
+        """
+
+
+class LocalObjectStore(ObjectStore):
+    """
+    Object store emulated on a directory, e.g. an NFS/SMB mount shared by all replicas.
+    Objects are written to a temporary name and renamed, so they appear complete.
+    """
+    name = "shared"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, name: str) -> Path:
+        return self.root / name
+
+    def _publish(self, name: str, write) -> None:
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / f".tmp-{path.name}-{uuid.uuid4().hex}"
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def put(self, name: str, source: Path) -> None:
+        self._publish(name, lambda tmp: shutil.copyfile(source, tmp))
+
+    def put_bytes(self, name: str, data: bytes) -> None:
+        self._publish(name, lambda tmp: tmp.write_bytes(data))
+
+    def get(self, name: str) -> Optional[bytes]:
+        try:
+            return self._path(name).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def open(self, name: str) -> BinaryIO:
+        return open(self._path(name), "rb")
+
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        # Only walk the directory the prefix points into: listing one entry must not
+        # cost a walk of the whole shared store
+        directory, _, _ = prefix.rpartition("/")
+        for dirpath, _, filenames in os.walk(self.root / directory):
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                name = path.relative_to(self.root).as_posix()
+                if filename.startswith(".tmp-") or not name.startswith(prefix):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                yield ObjectInfo(name, stat.st_size, stat.st_mtime)
+
+    def delete(self, name: str) -> None:
+        path = self._path(name)
+        path.unlink(missing_ok=True)
+        if path.parent != self.root:
+            try:
+                path.parent.rmdir()
+            except OSError:
+                pass
+
+    def touch(self, name: str) -> None:
+        try:
+            os.utime(self._path(name))
+        except FileNotFoundError:
+            pass
+
+
+class S3ObjectStore(ObjectStore):
+    """
+    S3 / S3-compatible bucket. Needs the optional `boto3` package.
+    """
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=s3 requires the boto3 package") from e
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def put(self, name: str, source: Path) -> None:
+        self.client.upload_file(str(source), self.bucket, self.prefix + name)
+
+    def put_bytes(self, name: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=data)
+
+    def get(self, name: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + name)["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def open(self, name: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + name)["Body"]
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(name)
+
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for obj in page.get("Contents", []):
+                yield ObjectInfo(obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp())
+
+    def delete(self, name: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + name)
+
+
+class ObjectStoreBackend(CacheBackend):
+    """
+    Entries as objects <key>/<name>, with <key>/.meta.json uploaded last as the commit
+    marker: an entry exists once its manifest exists. Shared by every replica pointing
+    at the same store; the manifest's modification time is the LRU clock where the
+    store can refresh it.
+    """
+    def __init__(self, store: ObjectStore):
+        self.store = store
+        self.name = store.name
+
+    @staticmethod
+    def _meta_name(cache_key: str) -> str:
+        return f"{cache_key}/{META_NAME}"
+
+    def contains(self, cache_key: str) -> bool:
+        return self.store.get(self._meta_name(cache_key)) is not None
+
+    def read_manifest(self, cache_key: str) -> Optional[Dict]:
+        raw = self.store.get(self._meta_name(cache_key))
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return {}
+
+    def stored_sizes(self, cache_key: str) -> Dict[str, int]:
+        return {
+            info.name.split("/", 1)[1]: info.size
+            for info in self.store.list(f"{cache_key}/")
+            if not info.name.endswith(f"/{META_NAME}")
+        }
+
+    def open(self, cache_key: str, name: str) -> BinaryIO:
+        return self.store.open(f"{cache_key}/{name}")
+
+    def write(self, cache_key: str, outputs: Dict[str, Path], meta: Dict, encoding: str = "none") -> bool:
+        if self.contains(cache_key):
+            return False
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, path in outputs.items():
+                if encoding == "none":
+                    source, stored_size = path, path.stat().st_size
+                else:
+                    source = Path(tmp) / name
+                    stored_size = encode_file(path, source, encoding)
+                _record_stored(meta, name, encoding, stored_size)
+                self.store.put(f"{cache_key}/{name}", source)
+        meta["size_bytes"] = sum(f["stored_size"] for f in meta["files"].values())
+        self.store.put_bytes(self._meta_name(cache_key), json.dumps(meta).encode())
+        return True
+
+    def touch(self, cache_key: str) -> None:
+        self.store.touch(self._meta_name(cache_key))
+
+    def entries(self) -> List[Dict]:
+        entries = []
+        for info in self.store.list():
+            if not info.name.endswith(f"/{META_NAME}"):
+                continue
+            raw = self.store.get(info.name)
+            if raw is None:
+                continue
+            try:
+                meta = json.loads(raw)
+            except json.JSONDecodeError:
+                meta = {}
+            entries.append(_entry_summary(info.name.split("/", 1)[0], meta, info.modified))
+        return entries
+
+    def remove(self, cache_key: str) -> None:
+        # Drop the commit marker first so readers stop seeing the entry
+        self.store.delete(self._meta_name(cache_key))
+        for info in list(self.store.list(f"{cache_key}/")):
+            self.store.delete(info.name)
+
+    def cleanup(self) -> None:
+        # Files of writes that never reached their manifest
+        cutoff = time.time() - STALE_WORK_AGE
+        by_key: Dict[str, List[ObjectInfo]] = {}
+        for info in self.store.list():
+            by_key.setdefault(info.name.split("/", 1)[0], []).append(info)
+        for key, objects in by_key.items():
+            if any(o.name.endswith(f"/{META_NAME}") for o in objects):
+                continue
+            if all(o.modified < cutoff for o in objects):
+                logger.info(f"[cache] Removing orphaned objects of {key}")
+                for o in objects:
+                    self.store.delete(o.name)
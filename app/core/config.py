@@ -5,6 +5,7 @@
 
 import os
 from pathlib import Path
+from typing import Dict
 from dotenv import load_dotenv
 
 # Load .env file if present
@@ -12,12 +13,98 @@ load_dotenv()
 
 # Workspace base directory
 WORKSPACE_ROOT = Path(os.getenv("ZEO_WORKSPACE", "workspace"))
-TMP_DIR = WORKSPACE_ROOT / "tmp"
+# Per-request task directories; point ZEO_TMP_DIR at a tmpfs (e.g. /dev/shm/zeopp) to keep them off disk
+TMP_DIR = Path(os.getenv("ZEO_TMP_DIR", str(WORKSPACE_ROOT / "tmp")))
 CACHE_DIR = WORKSPACE_ROOT / "cache"
+JOBS_DIR = WORKSPACE_ROOT / "jobs"
 
 # Zeo++ executable path
 ZEO_EXECUTABLE = os.getenv("ZEO_EXEC_PATH", "./network")
+# Recorded in cache manifests; defaults to a digest of the executable
+ZEO_VERSION = os.getenv("ZEO_VERSION", "")
 
 # Runtime settings
+ZEO_MAX_WORKERS = int(os.getenv("ZEO_MAX_WORKERS", str(os.cpu_count() or 4)))
 ENABLE_CACHE = os.getenv("ENABLE_CACHE", "true").lower() == "true"
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per-phase timings and counters served at /metrics (Prometheus text format, per worker process)
+ENABLE_METRICS = os.getenv("ENABLE_METRICS", "true").lower() == "true"
+# Key the cache on the parsed structure (cell, symmetry, sorted atoms) instead of the raw
+# file bytes, so re-exports of the same framework share entries
+CANONICAL_STRUCTURE_KEYS = os.getenv("CANONICAL_STRUCTURE_KEYS", "true").lower() == "true"
+
+# Task directory lifecycle
+RETAIN_TASK_DIRS = os.getenv("RETAIN_TASK_DIRS", "false").lower() == "true"
+TMP_MAX_AGE = int(os.getenv("TMP_MAX_AGE", "21600"))
+TMP_SWEEP_INTERVAL = int(os.getenv("TMP_SWEEP_INTERVAL", "600"))
+# Finished jobs are removed from JOBS_DIR this long after they finish (0 = keep forever)
+JOBS_TTL_SECONDS = int(os.getenv("JOBS_TTL_SECONDS", "604800"))
+
+# Cache storage: local (one directory per entry under CACHE_DIR), sqlite (single file),
+# shared (directory shared by all replicas, e.g. an NFS mount) or s3 (needs boto3)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+CACHE_SQLITE_PATH = Path(os.getenv("CACHE_SQLITE_PATH", str(CACHE_DIR / "cache.sqlite3")))
+CACHE_SHARED_DIR = os.getenv("CACHE_SHARED_DIR", "")
+CACHE_S3_BUCKET = os.getenv("CACHE_S3_BUCKET", "")
+CACHE_S3_PREFIX = os.getenv("CACHE_S3_PREFIX", "zeopp-cache")
+CACHE_S3_ENDPOINT = os.getenv("CACHE_S3_ENDPOINT", "")
+# Stored output encoding: none (hardlinked from the task directory when possible), gzip or zstd (needs zstandard)
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "none").lower()
+
+# Cache eviction (0 disables a limit)
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", "0"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "0"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "0"))
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", "300"))
+
+# Scheduler settings
+# ZEO_MAX_WORKERS is the global cap on concurrent Zeo++ processes; heavy commands
+# get a smaller share so they cannot take every slot from cheap ones.
+ZEO_HEAVY_COMMANDS = [
+    c.strip() for c in os.getenv("ZEO_HEAVY_COMMANDS", "-psd,-ray_atom,-block,-gridG,-gridGBohr,-gridBOV").split(",")
+    if c.strip()
+]
+ZEO_HEAVY_MAX_CONCURRENT = int(os.getenv("ZEO_HEAVY_MAX_CONCURRENT", str(max(1, ZEO_MAX_WORKERS // 2))))
+# Per-command overrides, e.g. "-psd=2,-ray_atom=1,-sa=4"
+ZEO_COMMAND_LIMITS = {
+    k.strip(): int(v)
+    for k, v in (item.split("=", 1) for item in os.getenv("ZEO_COMMAND_LIMITS", "").split(",") if "=" in item)
+}
+ZEO_MAX_QUEUE = int(os.getenv("ZEO_MAX_QUEUE", "64"))
+ZEO_RETRY_AFTER = int(os.getenv("ZEO_RETRY_AFTER", "10"))
+# Order of queued runs: shortest (by estimated runtime, aged by waiting time) or fifo
+ZEO_QUEUE_POLICY = os.getenv("ZEO_QUEUE_POLICY", "shortest").lower()
+# Past runs per command the runtime estimator learns from
+COST_HISTORY_SIZE = int(os.getenv("COST_HISTORY_SIZE", "200"))
+
+
+# Per-process resource limits (0 = unlimited), with per-command overrides in the format of
+# ZEO_COMMAND_LIMITS, e.g. ZEO_COMMAND_TIMEOUTS="-psd=7200,-res=60"
+def _command_values(name: str) -> Dict[str, float]:
+    return {
+        k.strip(): float(v)
+        for k, v in (item.split("=", 1) for item in os.getenv(name, "").split(",") if "=" in item)
+    }
+
+
+ZEO_TIMEOUT = float(os.getenv("ZEO_TIMEOUT", "0"))                # wall clock seconds, then the process group is killed
+ZEO_CPU_LIMIT = float(os.getenv("ZEO_CPU_LIMIT", "0"))            # CPU seconds (RLIMIT_CPU)
+ZEO_MEMORY_LIMIT_MB = float(os.getenv("ZEO_MEMORY_LIMIT_MB", "0"))  # address space (RLIMIT_AS)
+ZEO_COMMAND_TIMEOUTS = _command_values("ZEO_COMMAND_TIMEOUTS")
+ZEO_COMMAND_CPU_LIMITS = _command_values("ZEO_COMMAND_CPU_LIMITS")
+ZEO_COMMAND_MEMORY_LIMITS_MB = _command_values("ZEO_COMMAND_MEMORY_LIMITS_MB")
+# stdout and stderr kept per process, each (first and last half when longer)
+ZEO_OUTPUT_LIMIT_KB = int(os.getenv("ZEO_OUTPUT_LIMIT_KB", "1024"))
+
+# Warm engine: serve -res / -sa / -vol from a long-lived helper with the pyzeo binding loaded
+# (needs pyzeo; cli = always run `network`), keeping this many structures loaded
+ZEO_ENGINE = os.getenv("ZEO_ENGINE", "cli").lower()
+ZEO_ENGINE_CACHE_SIZE = int(os.getenv("ZEO_ENGINE_CACHE_SIZE", "32"))
+
+# Probe-radius sweeps: points per request, and how many `network` calls one sweep is split into
+# (1 = a single call and a single Voronoi decomposition; more trades repeated decompositions for parallelism)
+SWEEP_MAX_POINTS = int(os.getenv("SWEEP_MAX_POINTS", "50"))
+SWEEP_MAX_INVOCATIONS = int(os.getenv("SWEEP_MAX_INVOCATIONS", "1"))
+
+# Adaptive Monte Carlo sampling (tolerance given): upper bound on the sample count
+ADAPTIVE_MAX_SAMPLES = int(os.getenv("ADAPTIVE_MAX_SAMPLES", "100000"))
@@ -0,0 +1,130 @@
+# The Code is to estimate Zeo++ runtimes from structure size and past runs
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/cost.py
+
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import COST_HISTORY_SIZE
+from app.core.scheduler import command_arguments
+from app.utils.structure import CanonicalStructure
+
+# Monte Carlo sample counts: per atom for -sa, per unit cell for the others
+PER_ATOM_SAMPLES = {"-sa"}
+PER_CELL_SAMPLES = {"-vol", "-volpo", "-psd", "-ray_atom", "-block"}
+# Grid commands evaluate points at a fixed spacing, so their work grows with the cell volume
+GRID_COMMANDS = {"-gridG", "-gridGBohr", "-gridBOV"}
+GRID_POINTS_PER_A3 = 1000
+
+# Seconds per work unit until enough runs of a command have been seen (rough, for ordering only)
+PRIOR_SECONDS_PER_UNIT = {"-psd": 2e-5, "-ray_atom": 2e-5, "-block": 2e-5}
+DEFAULT_SECONDS_PER_UNIT = 1e-6
+MIN_HISTORY = 3
+
+# Used when the structure could not be parsed (unsupported format)
+FALLBACK_ATOMS = 200
+FALLBACK_VOLUME = 3000.0
+
+
+@dataclass(frozen=True)
+class StructureSize:
+    """
+    atoms: atoms in the unit cell (asymmetric unit x symmetry operations, an upper bound
+        when atoms sit on special positions)
+    volume: unit cell volume, Å^3
+    """
+    atoms: int
+    volume: float
+
+    @classmethod
+    def of(cls, structure: Optional[CanonicalStructure]) -> Optional["StructureSize"]:
+        if structure is None:
+            return None
+        return cls(atoms=structure.atom_count * max(1, len(structure.symmetry)), volume=structure.volume)
+
+
+def command_work(zeo_args: List[str], size: Optional[StructureSize]) -> Dict[str, float]:
+    """
+    Work units of each command in a `network` argument list.
+
+    Every command pays for the Voronoi decomposition (~ atoms); sampled commands add
+    their sample count, grid commands their grid points.
+    """
+    size = size or StructureSize(FALLBACK_ATOMS, FALLBACK_VOLUME)
+    work: Dict[str, float] = {}
+    for command, numbers in command_arguments(zeo_args):
+        work[command] = work.get(command, 0.0) + _units(command, numbers, size)
+    return work
+
+
+def _units(command: str, numbers: List[float], size: StructureSize) -> float:
+    units = float(size.atoms)
+    # The sample count is the last number of a sampled command
+    samples = numbers[-1] if numbers else 0.0
+    if command in PER_ATOM_SAMPLES:
+        units += size.atoms * samples
+    elif command in PER_CELL_SAMPLES:
+        units += samples
+    elif command in GRID_COMMANDS:
+        units += size.volume * GRID_POINTS_PER_A3
+    return units
+
+
+class CostModel:
+    """
+    Runtime estimates per command: seconds per work unit, learnt from the last
+    COST_HISTORY_SIZE runs of each command in this worker (ratio of summed runtimes to
+    summed work, so long runs weigh most).
+
+    A run of several commands is split between them in proportion to their estimates.
+    """
+
+    def __init__(self, history_size: int = COST_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._history: Dict[str, Deque[Tuple[float, float]]] = defaultdict(lambda: deque(maxlen=history_size))
+
+    def _rate(self, command: str) -> float:
+        history = self._history.get(command)
+        if history is None or len(history) < MIN_HISTORY:
+            return PRIOR_SECONDS_PER_UNIT.get(command, DEFAULT_SECONDS_PER_UNIT)
+        units = sum(u for u, _ in history)
+        return sum(s for _, s in history) / units if units else DEFAULT_SECONDS_PER_UNIT
+
+    def _estimates(self, work: Dict[str, float]) -> Dict[str, float]:
+        with self._lock:
+            return {command: units * self._rate(command) for command, units in work.items()}
+
+    def estimate(self, zeo_args: List[str], size: Optional[StructureSize]) -> float:
+        """
+        Expected wall seconds of one `network` call.
+        """
+        return sum(self._estimates(command_work(zeo_args, size)).values())
+
+    def record(self, zeo_args: List[str], size: Optional[StructureSize], seconds: float) -> None:
+        """
+        Learn from a finished run of `zeo_args`.
+        """
+        work = command_work(zeo_args, size)
+        estimates = self._estimates(work)
+        total = sum(estimates.values())
+        if not total:
+            return
+        with self._lock:
+            for command, units in work.items():
+                if units:
+                    self._history[command].append((units, seconds * estimates[command] / total))
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                command: {"runs": len(history), "seconds_per_unit": self._rate(command)}
+                for command, history in self._history.items()
+            }
+
+
+cost_model = CostModel()
@@ -0,0 +1,190 @@
+# The Code is to serve fast Zeo++ queries from a warm, long-lived helper process
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/engine.py
+
+import asyncio
+import json
+import resource
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.utils.logger import logger
+from app.core import metrics
+from app.core.config import ZEO_ENGINE, ZEO_ENGINE_CACHE_SIZE, ZEO_MEMORY_LIMIT_MB
+from app.core.process import TIMEOUT, ProcessLimits, ProcessResult
+
+WORKER = Path(__file__).with_name("engine_worker.py")
+# Importing pyzeo and answering the handshake
+STARTUP_TIMEOUT = 60
+
+# Parameters of each command the engine may serve, the output file last
+_ARITY = {"-res": 1, "-sa": 4, "-vol": 4}
+
+ENGINE_RUNS = metrics.registry.register(metrics.Counter(
+    "zeopp_engine_runs_total", "Zeo++ runs offered to the warm engine, by outcome (served, busy, fallback)",
+    ("outcome",)
+))
+
+
+def plan_request(zeo_args: List[str], cwd: str) -> Optional[Dict]:
+    """
+    Translate a `network` argument list into an engine request, or None if it contains
+    anything but -res / -sa / -vol and the -ha / -nor modifiers.
+    """
+    if not zeo_args:
+        return None
+    *tokens, input_name = zeo_args
+    request = {"input": str(Path(cwd) / input_name), "rad_flag": True, "ha": False, "commands": []}
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == "-ha":
+            request["ha"] = True
+            i += 1
+        elif token == "-nor":
+            request["rad_flag"] = False
+            i += 1
+        elif token in _ARITY:
+            params = tokens[i + 1:i + 1 + _ARITY[token]]
+            if len(params) != _ARITY[token]:
+                return None
+            request["commands"].append([token, params[:-1], str(Path(cwd) / params[-1])])
+            i += 1 + _ARITY[token]
+        else:
+            return None
+    return request if request["commands"] else None
+
+
+class WarmEngine:
+    """
+    Optional backend for sub-second commands (ZEO_ENGINE=pyzeo).
+
+    Starting `network` for a -res query costs more than the query: exec, reading the
+    structure and setting up its atom network (with -ha, also its high accuracy network).
+    The engine keeps one helper process (engine_worker.py) with the pyzeo binding loaded,
+    which holds both networks of the last ZEO_ENGINE_CACHE_SIZE structures and answers
+    -res / -sa / -vol against them, writing the same output files the CLI would. The
+    binding runs the Voronoi decomposition inside each call and takes no precomputed
+    one, so that step is repeated per command.
+
+    Everything else goes to the CLI: other commands, other formats, runs with a CPU limit
+    (the helper's CPU time is shared), runs arriving while the helper is busy (they start
+    a `network` process instead of waiting) and any run the helper fails. If pyzeo cannot
+    be imported the engine disables itself.
+    """
+
+    def __init__(self, enabled: bool = ZEO_ENGINE == "pyzeo", cache_size: int = ZEO_ENGINE_CACHE_SIZE):
+        self.enabled = enabled
+        self.cache_size = cache_size
+        self.capabilities: Optional[Dict] = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._lock = asyncio.Lock()
+
+    def _supports(self, request: Dict) -> bool:
+        commands = self.capabilities["commands"]
+        return Path(request["input"]).suffix.lower() in self.capabilities["formats"] and all(
+            flag in commands and (commands[flag]["ha"] or not request["ha"])
+            for flag, _, _ in request["commands"]
+        )
+
+    async def _start(self) -> bool:
+        if self._process is not None and self._process.returncode is None:
+            return True
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable, str(WORKER), str(self.cache_size),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+        if ZEO_MEMORY_LIMIT_MB:
+            limit = int(ZEO_MEMORY_LIMIT_MB * 1024 * 1024)
+            resource.prlimit(self._process.pid, resource.RLIMIT_AS, (limit, limit))
+        try:
+            hello = json.loads(await asyncio.wait_for(self._process.stdout.readline(), STARTUP_TIMEOUT) or "{}")
+        except (asyncio.TimeoutError, ValueError):
+            hello = {"error": "no handshake"}
+        if not hello.get("ready"):
+            logger.warning(f"[engine] pyzeo engine unavailable ({hello.get('error')}), using the Zeo++ CLI")
+            self.enabled = False
+            await self.close()
+            return False
+        self.capabilities = hello
+        logger.info(
+            f"[engine] pyzeo {hello['version']} engine ready: {', '.join(hello['commands'])} "
+            f"on {', '.join(hello['formats'])}"
+        )
+        return True
+
+    async def run(self, zeo_args: List[str], cwd: str, limits: ProcessLimits) -> Optional[ProcessResult]:
+        """
+        Serve a `network` invocation from the helper.
+
+        Args:
+            zeo_args (List[str]): command args passed to `network`
+            cwd (str): task directory; input and output names are relative to it
+            limits (ProcessLimits): the run's limits; its timeout applies to the helper
+
+        Returns:
+            ProcessResult: the run, or None if the CLI has to run it
+        """
+        if not self.enabled or limits.cpu_seconds:
+            return None
+        request = plan_request(zeo_args, cwd)
+        if request is None or (self.capabilities is not None and not self._supports(request)):
+            return None
+        if self._lock.locked():
+            ENGINE_RUNS.inc(outcome="busy")
+            return None
+
+        async with self._lock:
+            if not await self._start() or not self._supports(request):
+                return None
+            started = time.monotonic()
+            try:
+                self._process.stdin.write((json.dumps(request) + "\n").encode())
+                await self._process.stdin.drain()
+                line = await asyncio.wait_for(self._process.stdout.readline(), limits.timeout or None)
+                reply = json.loads(line) if line else {"ok": False, "error": "engine exited"}
+            except asyncio.TimeoutError:
+                logger.error(f"[engine] Stopped: {limits.describe(TIMEOUT)}")
+                await self.close()
+                return ProcessResult(
+                    exit_code=-signal.SIGKILL, stdout="", stderr="", wall_seconds=time.monotonic() - started,
+                    cpu_seconds=0.0, peak_rss_bytes=None, error=TIMEOUT
+                )
+            except asyncio.CancelledError:
+                # A reply left in the pipe would be read by the next request
+                await self.close()
+                raise
+            except (ConnectionError, ValueError) as e:
+                reply = {"ok": False, "error": f"engine exited ({e})"}
+            wall_seconds = time.monotonic() - started
+
+            if not reply["ok"]:
+                logger.warning(f"[engine] {reply['error']}, falling back to the Zeo++ CLI")
+                ENGINE_RUNS.inc(outcome="fallback")
+                if reply["error"].startswith("engine exited"):
+                    await self.close()
+                return None
+
+        ENGINE_RUNS.inc(outcome="served")
+        return ProcessResult(
+            exit_code=0, stdout="", stderr="", wall_seconds=wall_seconds, cpu_seconds=reply["cpu_seconds"],
+            peak_rss_bytes=None, zeo_version=f"pyzeo {self.capabilities['version']}"
+        )
+
+    async def close(self) -> None:
+        """
+        Stop the helper; the next run starts a new one.
+        """
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+
+
+warm_engine = WarmEngine()
@@ -0,0 +1,135 @@
+# The Code is a long-lived Zeo++ helper serving queries through the pyzeo binding
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/engine_worker.py
+#
+# Started by app.core.engine as `python engine_worker.py <cache size>`. Reads one JSON request per
+# line on stdin and answers one JSON line on stdout. It only needs the standard library and pyzeo,
+# so it does not import the app (nor its configuration side effects).
+#
+# Request: {"input": path, "rad_flag": bool, "ha": bool, "commands": [[flag, [params], output path]]}
+# Reply:   {"ok": true, "cpu_seconds": float, "loaded": bool} or {"ok": false, "error": str}
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# AtomNetwork readers by file extension
+READERS = {".cif": "read_from_CIF", ".cssr": "read_from_CSSR", ".v1": "read_from_V1"}
+# Accuracy setting of a bare `-ha` on the CLI; the binding's own default is "LOW"
+HIGH_ACCURACY = "DEF"
+
+
+def _import_binding():
+    try:
+        import pyzeo
+        from pyzeo.netstorage import AtomNetwork
+        from pyzeo.area_volume import surface_area, volume
+        from pyzeo.high_accuracy import high_accuracy_atomnet
+    except ImportError:
+        # Releases before the package was renamed
+        import zeo as pyzeo
+        from zeo.netstorage import AtomNetwork
+        from zeo.area_volume import surface_area, volume
+        from zeo.high_accuracy import high_accuracy_atomnet
+    return getattr(pyzeo, "__version__", "unknown"), AtomNetwork, surface_area, volume, high_accuracy_atomnet
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class Structure:
+    """
+    A loaded structure: its atom network and, once a -ha run asked for it, the high
+    accuracy network (large atoms replaced by clusters of small spheres) Voronoi runs on.
+    """
+
+    def __init__(self, network, high_accuracy_atomnet):
+        self.network = network
+        self._high_accuracy_atomnet = high_accuracy_atomnet
+        self._high_accuracy = None
+
+    def high_accuracy(self):
+        if self._high_accuracy is None:
+            network = self.network.copy()
+            self._high_accuracy_atomnet(network, HIGH_ACCURACY)
+            self._high_accuracy = network
+        return self._high_accuracy
+
+
+class Engine:
+    def __init__(self, cache_size: int):
+        self.version, self.AtomNetwork, self.surface_area, self.volume, self.high_accuracy_atomnet = _import_binding()
+        self.cache_size = cache_size
+        # (content digest, rad_flag) -> Structure, least recently used first
+        self.structures: "OrderedDict[tuple, Structure]" = OrderedDict()
+
+    def capabilities(self) -> dict:
+        return {
+            "version": self.version,
+            "formats": [suffix for suffix, reader in READERS.items() if hasattr(self.AtomNetwork, reader)],
+            "commands": {"-res": {"ha": True}, "-sa": {"ha": True}, "-vol": {"ha": True}},
+        }
+
+    def structure(self, path: str, rad_flag: bool):
+        key = (hashlib.sha256(Path(path).read_bytes()).hexdigest(), rad_flag)
+        if key in self.structures:
+            self.structures.move_to_end(key)
+            return self.structures[key], False
+        reader = getattr(self.AtomNetwork, READERS[Path(path).suffix.lower()])
+        structure = Structure(reader(path, rad_flag=rad_flag), self.high_accuracy_atomnet)
+        self.structures[key] = structure
+        while len(self.structures) > self.cache_size:
+            self.structures.popitem(last=False)
+        return structure, True
+
+    def serve(self, request: dict) -> dict:
+        started = time.process_time()
+        structure, loaded = self.structure(request["input"], request["rad_flag"])
+        high_accuracy = structure.high_accuracy() if request["ha"] else None
+        for flag, params, output in request["commands"]:
+            if flag == "-res":
+                # The file starts with the output name as given, which for the CLI is relative
+                os.chdir(Path(output).parent)
+                (high_accuracy or structure.network).calculate_free_sphere_parameters(Path(output).name)
+                continue
+            channel_radius, probe_radius, samples = float(params[0]), float(params[1]), int(float(params[2]))
+            compute = self.surface_area if flag == "-sa" else self.volume
+            text = compute(
+                structure.network, channel_radius, probe_radius, samples,
+                high_accuracy=request["ha"], high_accuracy_atmnet=high_accuracy
+            )
+            Path(output).write_text(_text(text))
+        return {"ok": True, "cpu_seconds": time.process_time() - started, "loaded": loaded}
+
+
+def main() -> None:
+    # Zeo++ prints progress to stdout: keep the real stdout for replies and send the rest to stderr
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    try:
+        engine = Engine(int(sys.argv[1]) if len(sys.argv) > 1 else 32)
+    except Exception as e:
+        replies.write(json.dumps({"ready": False, "error": f"{type(e).__name__}: {e}"}) + "\n")
+        return
+    replies.write(json.dumps({"ready": True, **engine.capabilities()}) + "\n")
+
+    for line in sys.stdin:
+        try:
+            reply = engine.serve(json.loads(line))
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        sys.stdout.flush()
+        replies.write(json.dumps(reply) + "\n")
+
+
+if __name__ == "__main__":
+    main()
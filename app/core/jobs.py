@@ -0,0 +1,257 @@
+# Asynchronous job subsystem for long-running Zeo++ commands
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/jobs.py
+
+import asyncio
+import fcntl
+import json
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app.utils.logger import logger
+from app.core.analysis import AnalysisError, run_analyses
+from app.core.config import JOBS_DIR, RETAIN_TASK_DIRS
+from app.core.runner import ZeoRunner
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobManager:
+    """
+    Submit / poll / fetch for Zeo++ analyses that outlive an HTTP request.
+
+    Each job lives in JOBS_DIR/<id>/: job.json holds its state (queued, running,
+    done, failed; running from the moment Zeo++ gets a scheduler slot) and work/
+    holds the structure file and Zeo++ outputs until the job finishes (kept with
+    RETAIN_TASK_DIRS). The worker running a job holds an flock on job.lock, so
+    after a restart any worker can pick up unfinished jobs without two of them
+    running the same one. Finished jobs are removed by sweep_expired().
+    """
+
+    def __init__(self, jobs_dir: Path = JOBS_DIR, runner: Optional[ZeoRunner] = None):
+        self.jobs_dir = jobs_dir
+        self.runner = runner or ZeoRunner()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Return the persisted state of a job, or None if it does not exist.
+        """
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        job_file = self._job_dir(job_id) / "job.json"
+        if not job_file.exists():
+            return None
+        return json.loads(job_file.read_text())
+
+    def _write(self, job: Dict) -> None:
+        job_file = self._job_dir(job["job_id"]) / "job.json"
+        tmp_file = job_file.with_suffix(".tmp")
+        tmp_file.write_text(json.dumps(job))
+        os.replace(tmp_file, job_file)
+
+    async def submit(
+        self,
+        input_path: Path,
+        analyses: List[str],
+        params: Dict,
+        ha: bool = True,
+        estimated_seconds: Optional[float] = None
+    ) -> Dict:
+        """
+        Persist a new job and start it in the background.
+
+        Args:
+            input_path (Path): uploaded structure; it is moved into the job directory
+            analyses (List[str]): keys of ANALYSES
+            params (Dict): analysis parameters
+            ha (bool): whether to use high accuracy mode (-ha)
+            estimated_seconds (float): optional, expected runtime reported in the job status
+
+        Returns:
+            Dict: the initial job state
+        """
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "analyses": analyses,
+            "params": params,
+            "ha": ha,
+            "filename": input_path.name,
+            "submitted_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "runtime_seconds": None,
+            "estimated_seconds": estimated_seconds,
+            "error": None,
+            "error_code": None,
+            "stderr": None,
+            "results": None,
+        }
+        await asyncio.to_thread(self._create, job, input_path)
+        logger.info(f"[jobs] Submitted job {job['job_id']}: {analyses}")
+        lock_fd = await asyncio.to_thread(self._claim, job["job_id"])
+        if lock_fd is not None:
+            self._launch(job["job_id"], lock_fd)
+        return job
+
+    def _create(self, job: Dict, input_path: Path) -> None:
+        work_dir = self._job_dir(job["job_id"]) / "work"
+        work_dir.mkdir(parents=True)
+        shutil.move(str(input_path), work_dir / input_path.name)
+        self._write(job)
+
+    def _claim(self, job_id: str) -> Optional[int]:
+        """
+        Take the job lock. Returns the locked fd, or None if another worker holds it.
+        """
+        fd = os.open(self._job_dir(job_id) / "job.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _launch(self, job_id: str, lock_fd: int) -> None:
+        task = asyncio.create_task(self._run(job_id, lock_fd))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    def _finish(self, job: Dict) -> None:
+        self._write(job)
+        if not RETAIN_TASK_DIRS:
+            shutil.rmtree(self._job_dir(job["job_id"]) / "work", ignore_errors=True)
+
+    async def _run(self, job_id: str, lock_fd: int) -> None:
+        job = self.get(job_id)
+
+        def started():
+            job["status"] = "running"
+            job["started_at"] = job["started_at"] or _now()
+            self._write(job)
+
+        try:
+            if job["status"] != "queued":
+                # Resumed after a restart: it waits for a slot again
+                job["status"] = "queued"
+                self._write(job)
+
+            structure_file = self._job_dir(job_id) / "work" / job["filename"]
+            results = await run_analyses(
+                self.runner, structure_file, job["analyses"], job["params"], ha=job["ha"], wait_if_busy=True,
+                on_start=started
+            )
+            job["status"] = "done"
+            job["results"] = jsonable_encoder(results)
+        except asyncio.CancelledError:
+            # Shutdown: leave the job as running so it is resumed on the next start
+            raise
+        except AnalysisError as e:
+            job["status"] = "failed"
+            job["error"] = e.message
+            job["error_code"] = e.error
+            job["stderr"] = e.stderr
+        except Exception as e:
+            logger.exception(f"[jobs] Job {job_id} crashed")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            try:
+                if job["status"] in ("done", "failed"):
+                    finished = datetime.now(timezone.utc)
+                    job["finished_at"] = finished.isoformat()
+                    # Served from the cache without ever running
+                    job["started_at"] = job["started_at"] or job["finished_at"]
+                    job["runtime_seconds"] = (
+                        finished - datetime.fromisoformat(job["started_at"])
+                    ).total_seconds()
+                    await asyncio.to_thread(self._finish, job)
+                    logger.info(f"[jobs] Job {job_id} {job['status']} in {job['runtime_seconds']:.2f}s")
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+                os.close(lock_fd)
+
+    def resume(self) -> int:
+        """
+        Restart queued/running jobs left by a previous process. Returns how many were resumed.
+        """
+        if not self.jobs_dir.exists():
+            return 0
+
+        resumed = 0
+        for job_dir in self.jobs_dir.iterdir():
+            job = self.get(job_dir.name)
+            if not job or job["status"] not in ("queued", "running"):
+                continue
+            lock_fd = self._claim(job["job_id"])
+            if lock_fd is not None:
+                self._launch(job["job_id"], lock_fd)
+                resumed += 1
+        if resumed:
+            logger.info(f"[jobs] Resumed {resumed} unfinished job(s)")
+        return resumed
+
+    def sweep_expired(self, max_age: int) -> int:
+        """
+        Remove jobs that finished more than max_age seconds ago, and job directories
+        left without a job.json (a submission interrupted by a crash) that are as old.
+
+        Args:
+            max_age (int): seconds a finished job is kept
+
+        Returns:
+            int: number of job directories removed
+        """
+        if not self.jobs_dir.exists():
+            return 0
+
+        now = datetime.now(timezone.utc)
+        removed = 0
+        for job_dir in self.jobs_dir.iterdir():
+            if not _JOB_ID.fullmatch(job_dir.name) or job_dir.name in self._tasks:
+                continue
+            try:
+                job = self.get(job_dir.name)
+                if job is None:
+                    age = now.timestamp() - job_dir.stat().st_mtime
+                elif job["status"] in ("done", "failed") and job["finished_at"]:
+                    age = (now - datetime.fromisoformat(job["finished_at"])).total_seconds()
+                else:
+                    continue
+            except (OSError, ValueError):
+                continue
+            if age > max_age:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info(f"[jobs] Removed {removed} expired job(s)")
+        return removed
+
+    async def shutdown(self) -> None:
+        """
+        Cancel running jobs; their state stays `running` so the next start resumes them.
+        """
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+job_manager = JobManager()
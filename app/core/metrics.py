@@ -0,0 +1,343 @@
+# Prometheus-style metrics and per-phase request timing
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/metrics.py
+
+import bisect
+import functools
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import ENABLE_METRICS
+
+# Seconds; wide enough for both sub-millisecond cache lookups and hour-long -psd runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+# Bytes, 16 MB to 64 GB
+RSS_BUCKETS = tuple(2 ** power for power in range(24, 37))
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """
+        Sample lines of the metric in the text exposition format.
+        """
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labels:
+            values = [((), 0)]
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """
+    A value that goes up and down; `callback` (if given) is read at render time instead.
+    """
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterator[str]:
+        if self.callback is not None:
+            yield f"{self.name} {_format_value(self.callback())}"
+            return
+        yield from super().samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (count per bucket, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((key, (list(c), s, n)) for key, (c, s, n) in self._values.items())
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+
+PHASE_SECONDS = registry.register(Histogram(
+    "zeopp_phase_seconds",
+    "Time spent per request phase: upload, hash, cache_lookup, queue_wait, zeo_wall, zeo_cpu, parse",
+    labels=("phase", "endpoint", "cache")
+))
+REQUESTS = registry.register(Counter(
+    "zeopp_requests_total", "API requests by endpoint and cache outcome (hit, miss, coalesced, none)",
+    labels=("endpoint", "cache")
+))
+FAILURES = registry.register(Counter(
+    "zeopp_failures_total", "Failures by endpoint and reason (zeo_error, timeout, cpu_limit, memory_limit, busy, cache_integrity)",
+    labels=("endpoint", "reason")
+))
+PEAK_RSS = registry.register(Histogram(
+    "zeopp_peak_rss_bytes", "Peak resident set size of Zeo++ runs whose usage could be measured",
+    labels=("endpoint",), buckets=RSS_BUCKETS
+))
+INFLIGHT_PROCESSES = registry.register(Gauge(
+    "zeopp_inflight_processes", "Zeo++ processes currently running in this worker"
+))
+
+
+@dataclass
+class RequestTimings:
+    """
+    Phase durations of one API request, observed together once it finishes so
+    every phase carries the final endpoint and cache labels.
+
+    endpoint: the analysis set with label(), otherwise the router the request matched
+    (/api/jobs/{job_id}/result -> jobs), or "other" for paths no route matched, so
+    arbitrary URLs cannot create label series.
+    cache: hit, miss (Zeo++ ran), coalesced (joined an identical in-flight run) or none
+    """
+    scope: Dict = field(default_factory=dict, repr=False)
+    label: Optional[str] = None
+    cache: str = "none"
+    phases: Dict[str, float] = field(default_factory=dict)
+    done: bool = False
+
+    @property
+    def endpoint(self) -> str:
+        if self.label is not None:
+            return self.label
+        # Set by the router once it matched the request
+        path = getattr(self.scope.get("route"), "path", "")
+        if not path.startswith("/api/"):
+            return "other"
+        return path[len("/api/"):].split("/", 1)[0] or "other"
+
+    def add(self, phase: str, seconds: float) -> None:
+        if self.done:
+            # Work the request left running, e.g. a job it queued
+            PHASE_SECONDS.observe(seconds, phase=phase, endpoint=self.endpoint, cache=self.cache)
+        else:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def observe(self) -> None:
+        self.done = True
+        endpoint = self.endpoint
+        for phase, seconds in self.phases.items():
+            PHASE_SECONDS.observe(seconds, phase=phase, endpoint=endpoint, cache=self.cache)
+        REQUESTS.inc(endpoint=endpoint, cache=self.cache)
+
+
+# Set for the duration of an API request by MetricsMiddleware. The object itself is shared
+# (and mutated), so updates from worker threads and child tasks reach the request.
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("zeopp_request_timings", default=None)
+
+
+def label(endpoint: Optional[str] = None, cache: Optional[str] = None) -> None:
+    """
+    Set the labels of the current request's phases (no-op outside a request).
+    A request that ran Zeo++ for any of its commands stays labelled a miss.
+    """
+    timings = _current.get()
+    if timings is None or timings.done:
+        return
+    if endpoint:
+        timings.label = endpoint
+    if cache and timings.cache != "miss":
+        timings.cache = cache
+
+
+def record(phase: str, seconds: float, endpoint: str = "background", cache: str = "none") -> None:
+    """
+    Add a phase duration to the current request, or observe it directly (with the given
+    labels) when running outside one, e.g. in a background job.
+    """
+    if not ENABLE_METRICS:
+        return
+    timings = _current.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+    else:
+        PHASE_SECONDS.observe(seconds, phase=phase, endpoint=endpoint, cache=cache)
+
+
+def current_endpoint(default: str = "background") -> str:
+    timings = _current.get()
+    return timings.endpoint if timings is not None else default
+
+
+def failure(reason: str, endpoint: Optional[str] = None) -> None:
+    """
+    Count a failure, labelled with the current request's endpoint unless one is given.
+    """
+    if ENABLE_METRICS:
+        FAILURES.inc(endpoint=endpoint or current_endpoint(), reason=reason)
+
+
+def peak_rss(peak_rss_bytes: Optional[int], endpoint: str) -> None:
+    """
+    Observe the peak RSS of a Zeo++ run; runs whose usage is unknown (served by the warm
+    engine, or overlapping another process) are left out rather than counted as 0.
+    """
+    if ENABLE_METRICS and peak_rss_bytes is not None:
+        PEAK_RSS.observe(peak_rss_bytes, endpoint=endpoint)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
+
+
+def timed_parser(func: Callable) -> Callable:
+    """
+    Decorator recording the duration of an output parser as the `parse` phase.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed("parse"):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each /api/ request: the request body upload, and every phase
+    recorded while it is handled, labelled with the endpoint and cache outcome.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if not ENABLE_METRICS or not path.startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope=scope)
+        upload = {"started": None}
+
+        async def timed_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                if upload["started"] is None:
+                    upload["started"] = time.perf_counter()
+                if not message.get("more_body", False):
+                    timings.add("upload", time.perf_counter() - upload["started"])
+            return message
+
+        token = _current.set(timings)
+        try:
+            await self.app(scope, timed_receive, send)
+        finally:
+            _current.reset(token)
+            timings.observe()
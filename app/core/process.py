@@ -0,0 +1,311 @@
+# The Code is to run Zeo++ processes under resource limits and account for their usage
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/process.py
+
+import asyncio
+import os
+import resource
+import signal
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import (
+    ZEO_TIMEOUT,
+    ZEO_CPU_LIMIT,
+    ZEO_MEMORY_LIMIT_MB,
+    ZEO_COMMAND_TIMEOUTS,
+    ZEO_COMMAND_CPU_LIMITS,
+    ZEO_COMMAND_MEMORY_LIMITS_MB,
+    ZEO_OUTPUT_LIMIT_KB,
+)
+
+# Error codes of runs stopped by a limit
+TIMEOUT = "timeout"
+CPU_LIMIT = "cpu_limit"
+MEMORY_LIMIT = "memory_limit"
+
+# Extra CPU seconds between SIGXCPU (soft limit) and SIGKILL (hard limit)
+_CPU_GRACE_SECONDS = 5
+
+# What a C++ program prints when an allocation fails under RLIMIT_AS
+_ALLOCATION_FAILURES = ("bad_alloc", "Cannot allocate memory", "Out of memory")
+# Without such a message, a crash only counts as hitting the memory limit when the peak RSS
+# came this close to it (RSS stays below the address space RLIMIT_AS counts)
+_MEMORY_LIMIT_RSS_FRACTION = 0.8
+
+
+@dataclass(frozen=True)
+class ProcessLimits:
+    """
+    Limits of one Zeo++ process; 0 means unlimited.
+
+    timeout: wall clock seconds, after which the whole process group is killed
+    cpu_seconds: RLIMIT_CPU
+    memory_bytes: RLIMIT_AS
+    """
+    timeout: float = 0
+    cpu_seconds: float = 0
+    memory_bytes: int = 0
+
+    @classmethod
+    def for_commands(cls, commands: Tuple[str, ...]) -> "ProcessLimits":
+        """
+        Limits of a run of `commands` (e.g. ('-sa', '-vol')): the time limits of the
+        commands add up, the memory limit is the largest one.
+
+        Repeated flags count once per occurrence on purpose: each point of a chained sweep
+        (-sa ... -sa ...) runs its own sampling pass, so its time budget scales with the
+        number of points, while the scheduler counts the process once per command.
+        """
+        def combined(overrides: Dict[str, float], default: float, combine) -> float:
+            values = [overrides.get(command, default) for command in commands] or [default]
+            # One unlimited command makes the whole run unlimited
+            return 0 if not all(values) else combine(values)
+
+        return cls(
+            timeout=combined(ZEO_COMMAND_TIMEOUTS, ZEO_TIMEOUT, sum),
+            cpu_seconds=combined(ZEO_COMMAND_CPU_LIMITS, ZEO_CPU_LIMIT, sum),
+            memory_bytes=int(combined(ZEO_COMMAND_MEMORY_LIMITS_MB, ZEO_MEMORY_LIMIT_MB, max) * 1024 * 1024)
+        )
+
+    def describe(self, error: str) -> str:
+        if error == TIMEOUT:
+            return f"Zeo++ exceeded its time limit ({self.timeout:g} s)"
+        if error == CPU_LIMIT:
+            return f"Zeo++ exceeded its CPU time limit ({self.cpu_seconds:g} s)"
+        return f"Zeo++ exceeded its memory limit ({self.memory_bytes // (1024 * 1024)} MB)"
+
+
+@dataclass(frozen=True)
+class ProcessResult:
+    """
+    exit_code: exit status, or -N if the process was killed by signal N
+    stdout / stderr: captured separately, each cut to ZEO_OUTPUT_LIMIT_KB (head and tail kept)
+    peak_rss_bytes: None when below this worker's own peak RSS: exec counts the address
+        space the child was forked from, so ru_maxrss never reports less than that
+    error: TIMEOUT, CPU_LIMIT or MEMORY_LIMIT if a limit stopped the process
+    zeo_version: set when the run was served by something else than the `network` executable
+    """
+    exit_code: int
+    stdout: str
+    stderr: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_bytes: Optional[int]
+    error: Optional[str] = None
+    zeo_version: Optional[str] = None
+
+    @property
+    def resources(self) -> Dict:
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+
+def _apply_limits(pid: int, limits: ProcessLimits) -> None:
+    """
+    Set the rlimits of a freshly started process. Doing this from the parent instead of
+    a preexec_fn lets subprocess spawn with vfork rather than fork + run Python code in
+    the child; the process only runs unlimited for the few instructions after exec.
+    """
+    try:
+        if limits.cpu_seconds:
+            soft = max(1, int(limits.cpu_seconds))
+            resource.prlimit(pid, resource.RLIMIT_CPU, (soft, soft + _CPU_GRACE_SECONDS))
+        if limits.memory_bytes:
+            resource.prlimit(pid, resource.RLIMIT_AS, (limits.memory_bytes, limits.memory_bytes))
+    except ProcessLookupError:
+        # Already gone: the exit status tells what happened
+        pass
+
+
+def _classify(
+    limits: ProcessLimits,
+    exit_code: int,
+    cpu_seconds: float,
+    peak_rss: Optional[int],
+    output: str
+) -> Optional[str]:
+    """
+    The limit that stopped a failed process, or None for an ordinary Zeo++ failure.
+    """
+    if exit_code == 0:
+        return None
+    if limits.cpu_seconds and (exit_code == -signal.SIGXCPU or cpu_seconds >= limits.cpu_seconds):
+        return CPU_LIMIT
+    if not limits.memory_bytes:
+        return None
+    if any(message in output for message in _ALLOCATION_FAILURES):
+        return MEMORY_LIMIT
+    # A crash far below the limit is a Zeo++ bug, not the structure being too large
+    if exit_code in (-signal.SIGABRT, -signal.SIGSEGV, -signal.SIGBUS) and peak_rss is not None \
+            and peak_rss >= limits.memory_bytes * _MEMORY_LIMIT_RSS_FRACTION:
+        return MEMORY_LIMIT
+    return None
+
+
+class _BoundedCapture(asyncio.Protocol):
+    """
+    Collects one pipe of a process, keeping at most `limit` bytes: the first and the
+    last half. Zeo++ prints its errors last, so a runaway stream keeps what matters.
+    """
+
+    def __init__(self, limit: int):
+        self.half = max(1, limit // 2)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def data_received(self, data: bytes) -> None:
+        room = self.half - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        self.tail += data
+        excess = len(self.tail) - self.half
+        if excess > 0:
+            del self.tail[:excess]
+            self.dropped += excess
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+    def text(self) -> str:
+        if not self.dropped:
+            return (self.head + self.tail).decode(errors="replace")
+        return (
+            self.head.decode(errors="replace")
+            + f"\n[... {self.dropped} bytes truncated ...]\n"
+            + self.tail.decode(errors="replace")
+        )
+
+
+async def _wait_exited(pid: int) -> None:
+    """
+    Wait until `pid` has exited, without reaping it.
+    """
+    if not hasattr(os, "pidfd_open"):
+        await asyncio.to_thread(os.waitid, os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+        return
+
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+    pidfd = os.pidfd_open(pid)
+    # A pidfd becomes readable when the process exits
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+
+
+async def run_process(
+    args: List[str],
+    cwd: str,
+    limits: ProcessLimits = ProcessLimits(),
+    output_limit: int = ZEO_OUTPUT_LIMIT_KB * 1024
+) -> ProcessResult:
+    """
+    Run a command in its own process group under `limits` and wait for it, on the event loop.
+
+    The process is spawned with vfork (no preexec_fn), both pipes are read by the loop and
+    its exit is awaited through a pidfd, so a run costs no thread. On timeout the whole
+    group is killed, so helpers the process started go too; a cancelled run is killed the
+    same way. CPU time and peak RSS come from wait4, i.e. they are this process's own,
+    not shared with runs executing at the same time.
+
+    Args:
+        args (List[str]): executable and arguments
+        cwd (str): working directory
+        limits (ProcessLimits): timeout and rlimits
+        output_limit (int): bytes kept of stdout and of stderr each
+
+    Returns:
+        ProcessResult: exit code, output, resource usage and the limit that stopped it, if any
+    """
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    # ru_maxrss is in KiB on Linux
+    parent_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    process = subprocess.Popen(
+        args,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True
+    )
+    _apply_limits(process.pid, limits)
+
+    # The group id (= pid) stays valid until the process is reaped; both happen on the
+    # loop, so a late timer never signals a recycled pid
+    state = {"reaped": False, "timed_out": False}
+
+    def kill():
+        if not state["reaped"]:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def expire():
+        state["timed_out"] = True
+        kill()
+
+    timer = loop.call_later(limits.timeout, expire) if limits.timeout else None
+    transports = []
+    try:
+        captures = []
+        for pipe in (process.stdout, process.stderr):
+            capture = _BoundedCapture(output_limit)
+            transport, _ = await loop.connect_read_pipe(lambda: capture, pipe)
+            transports.append(transport)
+            captures.append(capture)
+        # EOF once every process holding the pipes has exited (or been killed)
+        await asyncio.gather(*(capture.closed for capture in captures))
+        await _wait_exited(process.pid)
+        _, status, usage = os.wait4(process.pid, 0)
+        state["reaped"] = True
+    finally:
+        if timer is not None:
+            timer.cancel()
+        for transport in transports:
+            transport.close()
+        process.stdout.close()
+        process.stderr.close()
+        if not state["reaped"]:
+            # Cancelled: take the group down rather than leave it running unaccounted
+            kill()
+            _, status, _ = os.wait4(process.pid, 0)
+            state["reaped"] = True
+            process.returncode = os.waitstatus_to_exitcode(status)
+    wall_seconds = time.monotonic() - started
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    # Popen must not try to reap it again
+    process.returncode = exit_code
+    stdout, stderr = (capture.text() for capture in captures)
+    cpu_seconds = usage.ru_utime + usage.ru_stime
+    peak_rss = usage.ru_maxrss * 1024
+    if peak_rss <= parent_rss:
+        peak_rss = None
+    error = TIMEOUT if state["timed_out"] else _classify(limits, exit_code, cpu_seconds, peak_rss, stderr + stdout)
+    return ProcessResult(
+        exit_code=exit_code,
+        stdout=stdout,
+        stderr=stderr,
+        wall_seconds=wall_seconds,
+        cpu_seconds=cpu_seconds,
+        peak_rss_bytes=peak_rss,
+        error=error
+    )
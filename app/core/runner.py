@@ -5,13 +5,179 @@
 
 # app/core/runner.py
 
-import sh
+import asyncio
+import hashlib
+import math
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple, Union
+from urllib.parse import quote
+
+from fastapi.responses import JSONResponse
 
 from app.utils.logger import logger
-from app.utils.file import compute_cache_key, get_cache_path
-from app.core.config import ZEO_EXECUTABLE, WORKSPACE_ROOT, ENABLE_CACHE
+from app.utils.file import (
+    compute_cache_key, compute_file_digest, inspect_structure, cache_lock, track_task_dir, StagedUpload
+)
+from app.core import metrics
+from app.core.cache import result_cache, LazyOutputs
+from app.core.cost import StructureSize, cost_model
+from app.core.engine import warm_engine
+from app.core.process import ProcessLimits, ProcessResult, run_process
+from app.core.scheduler import extract_commands, scheduler
+from app.core.config import ZEO_EXECUTABLE, ZEO_VERSION, WORKSPACE_ROOT, ENABLE_CACHE, ZEO_MAX_WORKERS
+
+
+# Zeo++ processes are awaited on the event loop (see run_process); the file work around
+# them (clearing stale outputs, storing results) runs in this bounded pool.
+_executor = ThreadPoolExecutor(max_workers=ZEO_MAX_WORKERS, thread_name_prefix="zeo")
+
+# cache_key -> running computation, shared by identical concurrent requests
+_inflight: Dict[str, asyncio.Task] = {}
+# cache_key -> on_start callbacks of the requests sharing that computation; None once it got its slot
+_on_start: Dict[str, Optional[List[Callable[[], None]]]] = {}
+
+# (cache_key, output_files, extra_identifier) of one cache entry filled by a run
+CacheEntry = Tuple[str, List[str], Optional[str]]
+
+
+def _fire_on_start(key: str) -> None:
+    """
+    Tell every request sharing the computation of `key` that Zeo++ is starting.
+    """
+    callbacks = _on_start.get(key) or []
+    _on_start[key] = None
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception("[runner] on_start callback failed")
+
+
+def _endpoint_label(entries: List[CacheEntry]) -> str:
+    """
+    Metrics label of a run outside any request (e.g. a background job).
+    """
+    identifiers = {extra_identifier or "unknown" for _, _, extra_identifier in entries}
+    return identifiers.pop() if len(identifiers) == 1 else "combined"
+
+# Numeric parameters are compared at this many decimals when building cache keys
+PARAM_PRECISION = 6
+
+
+def _normalize_arg(arg: str) -> str:
+    try:
+        value = float(arg)
+    except ValueError:
+        return arg
+    return f"{value:.{PARAM_PRECISION}f}" if math.isfinite(value) else arg
+
+
+def semantic_args(zeo_args: List[str], input_name: str, output_files: List[str]) -> List[str]:
+    """
+    Describe a Zeo++ invocation independently of cosmetic choices: the input file name
+    becomes {input}, requested output names become {output<i>} and numeric parameters
+    are printed at fixed precision (1.2 == 1.20, 2000 == 2000.0).
+
+    Args:
+        zeo_args (List[str]): command args passed to `network`
+        input_name (str): name of the structure file in zeo_args
+        output_files (List[str]): requested output filenames
+
+    Returns:
+        List[str]: args the cache key is computed from
+    """
+    described = []
+    for arg in zeo_args:
+        if arg == input_name:
+            described.append("{input}")
+        elif arg in output_files:
+            described.append(f"{{output{output_files.index(arg)}}}")
+        else:
+            described.append(_normalize_arg(arg))
+    return described
+
+
+def artifact_urls(result: Dict) -> Dict[str, str]:
+    """
+    Download URLs (GET /api/artifacts/...) of the output files of a run_command result.
+    Empty when the outputs were not cached.
+    """
+    return {
+        name: f"/api/artifacts/{cache_key}/{stored}?filename={quote(name)}"
+        for name, (cache_key, stored) in result.get("artifacts", {}).items()
+    }
+
+
+def error_response(
+    message: str,
+    stderr: str = "",
+    error: Optional[str] = None,
+    resources: Optional[Dict] = None
+) -> JSONResponse:
+    """
+    Error response for a failed Zeo++ run. A run stopped by a resource limit answers 422
+    with its `error` code (timeout, cpu_limit, memory_limit), so callers can send the
+    structure to a bigger machine instead of retrying here; other failures answer 500.
+    """
+    content = {"success": False, "message": message, "stderr": stderr}
+    if error:
+        content["error"] = error
+        content["resources"] = resources
+    return JSONResponse(status_code=422 if error else 500, content=content)
+
+
+def failure_response(result: Dict) -> JSONResponse:
+    """
+    error_response for a failed run_command result.
+    """
+    return error_response(
+        result.get("message", "Zeo++ failed"), result["stderr"], result.get("error"), result.get("resources")
+    )
+
+
+@lru_cache(maxsize=None)
+def zeo_version(zeo_exec: str) -> str:
+    """
+    ZEO_VERSION if configured, otherwise a short digest of the `network` executable.
+    """
+    if ZEO_VERSION:
+        return ZEO_VERSION
+    path = shutil.which(zeo_exec)
+    if path is None:
+        return "unknown"
+    return f"sha256:{compute_file_digest(Path(path))[:12]}"
+
+
+def _stored_name(index: int) -> str:
+    # Outputs are cached by position, so entries do not depend on the requested names
+    return f"output{index}"
+
+
+@dataclass
+class ZeoCommand:
+    """
+    One Zeo++ command inside a combined invocation.
+
+    args: command flag and its parameters, without modifiers or the input file,
+          e.g. ["-sa", "1.2", "1.2", "2000", "result.sa"]
+    output_files: files this command writes
+    extra_identifier: the identifier the matching single endpoint uses
+    label: key of its result in run_combined (defaults to extra_identifier); needed when
+           the same command runs several times with different parameters
+    """
+    args: List[str]
+    output_files: List[str]
+    extra_identifier: str
+    label: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.label or self.extra_identifier
 
 
 class ZeoRunner:
@@ -19,18 +185,30 @@ class ZeoRunner:
         self.zeo_exec = zeo_exec_path
         self.workspace = workspace
 
-    def run_command(
+    async def run_command(
         self,
-        structure_file: Path,
+        structure_file: Union[Path, StagedUpload],
         zeo_args: List[str],
         output_files: List[str],
         extra_identifier: Optional[str] = None
     ) -> Dict:
         """
         Run Zeo++ with given args. Check cache first. If hit, return cached result.
+        The Zeo++ process is started once the scheduler grants a slot and awaited without
+        blocking the event loop.
+        Identical concurrent requests (same cache key) share a single execution, also
+        across worker processes on the same host. The key is built from semantic_args, so
+        requests that differ only in file names or number formatting share entries; the
+        cached outputs are returned under the names this caller asked for.
+
+        Output files named in zeo_args are written by Zeo++ under that name; the others
+        (-block, -grid*) are expected as <input stem><suffix>, the way Zeo++ names them.
+
+        A StagedUpload carries the digest computed from the request body, so the cache
+        lookup needs no further I/O; it is only written to TMP_DIR on a miss.
 
         Args:
-            structure_file (Path): uploaded input file path
+            structure_file (Path | StagedUpload): uploaded input file
             zeo_args (List[str]): command args passed to `network`
             output_files (List[str]): list of expected output filenames
             extra_identifier (str): optional string to distinguish different calls
@@ -42,59 +220,375 @@ class ZeoRunner:
                 stdout: str,
                 stderr: str,
                 cached: bool,
-                output_data: Dict[filename] = file content
+                output_data: Mapping[filename] = file content, read lazily on access,
+                artifacts: Dict[filename] = (cache_key, stored name), see artifact_urls,
+                resources: {wall_seconds, cpu_seconds, peak_rss_bytes} of a fresh run,
+                error / message: on failure, the limit that stopped Zeo++ (see failure_response)
             }
+
+        Raises:
+            SchedulerBusyError: if the scheduler wait queue is full
         """
         logger.info(f"[runner] Preparing Zeo++ command: {zeo_args}")
+        metrics.label(endpoint=extra_identifier)
 
-        # create cache directory and cache key
-        cache_key = compute_cache_key(structure_file, zeo_args, extra_identifier)
-        cache_dir = get_cache_path(cache_key)
+        # create cache key
+        digest, size = await self._inspect(structure_file)
+        cache_key = compute_cache_key(
+            None, semantic_args(zeo_args, structure_file.name, output_files), extra_identifier, file_digest=digest
+        )
+        entries = [(cache_key, output_files, extra_identifier)]
 
-        if ENABLE_CACHE and cache_dir.exists():
-            logger.info(f"[cache] Cache hit for key: {cache_key}")
-            return {
-                "success": True,
-                "exit_code": 0,
-                "stdout": "[cache] Used cached result.",
-                "stderr": "",
-                "cached": True,
-                "output_data": {f.name: f.read_text() for f in cache_dir.glob("*")}
-            }
+        if ENABLE_CACHE:
+            with metrics.timed("cache_lookup"):
+                cached = await self._cached_result(cache_key)
+            if cached is not None:
+                logger.info(f"[cache] Cache hit for key: {cache_key}")
+                metrics.label(cache="hit")
+                return self._present(cached, entries)
+            result_cache.record_miss()
 
-        logger.info(f"[cache] Cache miss. Running Zeo++...")
+        result = await self._coalesce(cache_key, structure_file, zeo_args, entries, size)
+        return self._present(result, entries)
 
-        try:
-            result = sh.Command(self.zeo_exec)(*zeo_args, _cwd=str(structure_file.parent), _err_to_out=True)
-            logger.info(f"[zeo++] Execution completed.")
+    async def run_combined(
+        self,
+        structure_file: Union[Path, StagedUpload],
+        commands: List[ZeoCommand],
+        flags: Optional[List[str]] = None,
+        on_start: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Dict]:
+        """
+        Run several Zeo++ commands against one structure with a single `network` call.
 
-            if ENABLE_CACHE:
-                cache_dir.mkdir(parents=True, exist_ok=True)
-                for out_file in output_files:
-                    out_path = structure_file.parent / out_file
-                    if out_path.exists():
-                        cached_path = cache_dir / out_file
-                        cached_path.write_text(out_path.read_text())
+        Each command is cached under the same key its single endpoint would use
+        (flags + command args + input name, extra_identifier), so later single-property
+        requests hit the cache. Commands already cached are not re-run.
 
-            return {
-                "success": True,
-                "exit_code": 0,
-                "stdout": str(result),
-                "stderr": "",
-                "cached": False,
-                "output_data": {
-                    f: (structure_file.parent / f).read_text()
-                    for f in output_files if (structure_file.parent / f).exists()
-                }
-            }
+        Args:
+            structure_file (Path | StagedUpload): uploaded input file
+            commands (List[ZeoCommand]): commands to combine
+            flags (List[str]): modifiers shared by all commands, e.g. ["-ha"]
+            on_start (Callable): optional, called once the Zeo++ run this request waits for
+                gets its scheduler slot (never if everything is cached)
+
+        Returns:
+            Dict[label or extra_identifier, result]: one run_command-style result per command
+
+        Raises:
+            SchedulerBusyError: if the scheduler wait queue is full
+        """
+        flags = flags or []
+        results: Dict[str, Dict] = {}
+        pending: List[Tuple[ZeoCommand, str]] = []
+
+        digest, size = await self._inspect(structure_file)
+
+        for cmd in commands:
+            single_args = flags + cmd.args + [structure_file.name]
+            cache_key = compute_cache_key(
+                None, semantic_args(single_args, structure_file.name, cmd.output_files),
+                cmd.extra_identifier, file_digest=digest
+            )
+            with metrics.timed("cache_lookup"):
+                cached = await self._cached_result(cache_key) if ENABLE_CACHE else None
+            if cached is not None:
+                logger.info(f"[cache] Cache hit for {cmd.key}: {cache_key}")
+                results[cmd.key] = self._present(
+                    cached, [(cache_key, cmd.output_files, cmd.extra_identifier)]
+                )
+            else:
+                result_cache.record_miss()
+                pending.append((cmd, cache_key))
+
+        if not pending:
+            metrics.label(cache="hit")
+            return results
+
+        zeo_args = flags + [a for cmd, _ in pending for a in cmd.args] + [structure_file.name]
+        logger.info(f"[runner] Preparing combined Zeo++ command: {zeo_args}")
+        combined_key = hashlib.sha256(" ".join(k for _, k in pending).encode()).hexdigest()
+        result = await self._coalesce(
+            combined_key, structure_file, zeo_args,
+            [(cache_key, cmd.output_files, cmd.extra_identifier) for cmd, cache_key in pending],
+            size,
+            on_start
+        )
+
+        for cmd, cache_key in pending:
+            results[cmd.key] = self._present(
+                result, [(cache_key, cmd.output_files, cmd.extra_identifier)]
+            )
+        return results
+
+    @staticmethod
+    async def _inspect(structure_file: Union[Path, StagedUpload]) -> Tuple[str, Optional[StructureSize]]:
+        """
+        Structure digest the cache keys are built from (canonical fingerprint when parseable),
+        and the structure size runtime estimates are based on.
+        """
+        if isinstance(structure_file, StagedUpload):
+            return structure_file.fingerprint, StructureSize.of(structure_file.structure)
+        digest, structure = await asyncio.to_thread(inspect_structure, structure_file)
+        return digest, StructureSize.of(structure)
 
-        except sh.ErrorReturnCode as e:
-            logger.error(f"[zeo++] Error: Exit code {e.exit_code}")
+    @staticmethod
+    async def _materialize(structure_file: Union[Path, StagedUpload]) -> Path:
+        """
+        Return a path Zeo++ can read, writing a StagedUpload to its task directory if needed.
+        """
+        if isinstance(structure_file, StagedUpload):
+            return await asyncio.to_thread(structure_file.materialize)
+        return structure_file
+
+    async def _coalesce(
+        self,
+        key: str,
+        structure_file: Union[Path, StagedUpload],
+        zeo_args: List[str],
+        entries: List[CacheEntry],
+        size: Optional[StructureSize] = None,
+        on_start: Optional[Callable[[], None]] = None
+    ) -> Dict:
+        """
+        Share one execution between identical concurrent requests.
+        `entries` lists the cache entries to fill and the outputs that go into each;
+        `size` feeds the runtime estimate that orders the scheduler queue; `on_start`
+        is called when the shared execution gets its scheduler slot.
+        """
+        shared = _inflight.get(key)
+        if shared is not None:
+            logger.info(f"[runner] Joining in-flight computation for key: {key}")
+            if on_start is not None:
+                if _on_start.get(key) is None:
+                    on_start()
+                else:
+                    _on_start[key].append(on_start)
+            metrics.label(cache="coalesced")
+            result = await asyncio.shield(shared)
+            if result["success"]:
+                result = {**result, "cached": True}
+            return result
+
+        metrics.label(cache="miss")
+        # Only the request that actually runs Zeo++ writes its upload to disk
+        structure_path = await self._materialize(structure_file)
+
+        # The task is shielded so a disconnecting client does not cancel it for the others
+        task = asyncio.create_task(self._run_single_flight(key, structure_path, zeo_args, entries, size))
+        _inflight[key] = task
+        _on_start[key] = [on_start] if on_start is not None else []
+        # A cancelled caller must not remove the task directory while the run works in it
+        track_task_dir(structure_path, task)
+
+        def done(_):
+            _inflight.pop(key, None)
+            _on_start.pop(key, None)
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    async def _run_single_flight(
+        self,
+        key: str,
+        structure_file: Path,
+        zeo_args: List[str],
+        entries: List[CacheEntry],
+        size: Optional[StructureSize] = None
+    ) -> Dict:
+        """
+        Run Zeo++ for a cache miss, holding the host-wide lock of the key.
+        If another worker produced the entries while we waited for the lock, they are used instead.
+        """
+        on_start = partial(_fire_on_start, key)
+        if not ENABLE_CACHE:
+            return await self._schedule(structure_file, zeo_args, entries, size, on_start)
+
+        async with cache_lock(key):
+            if all(result_cache.contains(cache_key) for cache_key, _, _ in entries):
+                cached = await self._cached_result(*(cache_key for cache_key, _, _ in entries))
+                if cached is not None:
+                    logger.info(f"[cache] Entry produced by another worker for key: {key}")
+                    return cached
+            return await self._schedule(structure_file, zeo_args, entries, size, on_start)
+
+    async def _schedule(
+        self,
+        structure_file: Path,
+        zeo_args: List[str],
+        entries: List[CacheEntry],
+        size: Optional[StructureSize] = None,
+        on_start: Optional[Callable[[], None]] = None
+    ) -> Dict:
+        estimate = cost_model.estimate(zeo_args, size)
+        logger.info(f"[cache] Cache miss. Running Zeo++ (estimated {estimate:.1f}s)...")
+        endpoint = _endpoint_label(entries)
+
+        waiting = time.perf_counter()
+        async with scheduler.slot(zeo_args, estimate):
+            metrics.record("queue_wait", time.perf_counter() - waiting, endpoint=endpoint, cache="miss")
+            if on_start is not None:
+                on_start()
+            result = await self._execute(structure_file, zeo_args, entries)
+        # Labelled by the run: it may be shared by several requests
+        for phase, seconds in result.pop("timings", {}).items():
+            metrics.record(phase, seconds, endpoint=endpoint, cache="miss")
+        if "resources" in result:
+            metrics.peak_rss(result["resources"]["peak_rss_bytes"], metrics.current_endpoint(endpoint))
+        if result["success"]:
+            cost_model.record(zeo_args, size, result["resources"]["wall_seconds"])
+        else:
+            metrics.failure(result.get("error") or "zeo_error", endpoint=metrics.current_endpoint(endpoint))
+        return result
+
+    async def _cached_result(self, *cache_keys: str) -> Optional[Dict]:
+        """
+        Build a result from cache entries, or return None if any of them is missing.
+        Outputs are keyed by cache key and stored name; see _present.
+        """
+        outputs: Dict[str, LazyOutputs] = {}
+        for cache_key in cache_keys:
+            stored = await asyncio.to_thread(result_cache.load, cache_key)
+            if stored is None:
+                return None
+            outputs[cache_key] = stored
+        return {
+            "success": True,
+            "exit_code": 0,
+            "stdout": "[cache] Used cached result.",
+            "stderr": "",
+            "cached": True,
+            "outputs": outputs
+        }
+
+    @staticmethod
+    def _present(result: Dict, entries: List[CacheEntry]) -> Dict:
+        """
+        Turn an internal result into the run_command format, naming each output file
+        the way the caller requested it.
+        """
+        loaders = {}
+        artifacts = {}
+        for cache_key, output_files, _ in entries:
+            stored = result["outputs"].get(cache_key, {})
+            for index, name in enumerate(output_files):
+                if _stored_name(index) in stored:
+                    loaders[name] = stored.loader(_stored_name(index))
+                    if stored.cache_key:
+                        artifacts[name] = (stored.cache_key, _stored_name(index))
+        presented = {k: v for k, v in result.items() if k != "outputs"}
+        presented["output_data"] = LazyOutputs(loaders)
+        presented["artifacts"] = artifacts
+        return presented
+
+    @staticmethod
+    def _produced_files(structure_file: Path, zeo_args: List[str], output_files: List[str]) -> Dict[str, Path]:
+        """
+        Map stored names to the files Zeo++ writes: outputs named on the command line keep
+        their name, the others are named after the input file (e.g. -block -> <stem>.block).
+        """
+        task_dir = structure_file.parent
+        return {
+            _stored_name(index): task_dir / (name if name in zeo_args else structure_file.stem + Path(name).suffix)
+            for index, name in enumerate(output_files)
+        }
+
+    def _clear_outputs(self, structure_file: Path, zeo_args: List[str], entries: List[CacheEntry]) -> None:
+        """
+        An earlier run in this task directory may have left these files behind, hardlinked
+        into its cache entry: Zeo++ must create new ones rather than write through them.
+        """
+        for _, output_files, _ in entries:
+            for path in self._produced_files(structure_file, zeo_args, output_files).values():
+                path.unlink(missing_ok=True)
+
+    async def _execute(
+        self,
+        structure_file: Path,
+        zeo_args: List[str],
+        entries: List[CacheEntry]
+    ) -> Dict:
+        """
+        Invoke `network` and store its outputs in the cache. The process is awaited on the
+        event loop; file I/O runs in the runner thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_executor, self._clear_outputs, structure_file, zeo_args, entries)
+
+        limits = ProcessLimits.for_commands(extract_commands(zeo_args))
+        metrics.INFLIGHT_PROCESSES.inc()
+        try:
+            # Fast queries are served by the warm engine when it is enabled and free
+            process = await warm_engine.run(zeo_args, str(structure_file.parent), limits)
+            if process is None:
+                process = await run_process([self.zeo_exec, *zeo_args], str(structure_file.parent), limits)
+        finally:
+            metrics.INFLIGHT_PROCESSES.dec()
+        timings = {"zeo_wall": process.wall_seconds, "zeo_cpu": process.cpu_seconds}
+
+        if process.exit_code != 0:
+            if process.error:
+                logger.error(f"[zeo++] Stopped: {limits.describe(process.error)}")
+            else:
+                logger.error(f"[zeo++] Error: Exit code {process.exit_code}")
             return {
                 "success": False,
-                "exit_code": e.exit_code,
-                "stdout": e.stdout.decode() if e.stdout else "",
-                "stderr": e.stderr.decode() if e.stderr else "",
+                "exit_code": process.exit_code,
+                "stdout": process.stdout,
+                "stderr": process.stderr,
                 "cached": False,
-                "output_data": {}
+                "outputs": {},
+                "error": process.error,
+                "message": limits.describe(process.error) if process.error else "Zeo++ failed",
+                "resources": process.resources,
+                "timings": timings
             }
+
+        peak_rss = "n/a" if process.peak_rss_bytes is None else f"{process.peak_rss_bytes / 2**20:.1f} MB"
+        logger.info(
+            f"[zeo++] Execution completed in {process.wall_seconds:.2f}s "
+            f"({process.cpu_seconds:.2f}s CPU, peak RSS {peak_rss})."
+        )
+        outputs = await loop.run_in_executor(_executor, self._store, structure_file, zeo_args, entries, process)
+        return {
+            "success": True,
+            "exit_code": 0,
+            "stdout": process.stdout,
+            "stderr": process.stderr,
+            "cached": False,
+            "outputs": outputs,
+            "resources": process.resources,
+            "timings": timings
+        }
+
+    def _store(
+        self,
+        structure_file: Path,
+        zeo_args: List[str],
+        entries: List[CacheEntry],
+        process: ProcessResult
+    ) -> Dict[str, LazyOutputs]:
+        """
+        Blocking part of a successful run: put the outputs into the cache (or read them,
+        with the cache disabled). Runs inside the runner thread pool, never on the event loop.
+        """
+        provenance = {
+            "zeo_version": process.zeo_version or zeo_version(self.zeo_exec),
+            "runtime_seconds": process.resources["wall_seconds"],
+            "cpu_seconds": process.resources["cpu_seconds"],
+            "peak_rss_bytes": process.peak_rss_bytes,
+        }
+        outputs: Dict[str, LazyOutputs] = {}
+        for cache_key, output_files, extra_identifier in entries:
+            produced = self._produced_files(structure_file, zeo_args, output_files)
+            stored = None
+            if ENABLE_CACHE:
+                result_cache.store(cache_key, produced, extra_identifier, provenance)
+                # Read back lazily from the entry, which outlives this task directory
+                stored = result_cache.outputs(cache_key)
+            if stored is None:
+                stored = LazyOutputs.from_texts({
+                    name: path.read_text(errors="replace") for name, path in produced.items() if path.exists()
+                })
+            outputs[cache_key] = stored
+        return outputs
@@ -0,0 +1,207 @@
+# Admission control and concurrency limits for Zeo++ processes
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/core/scheduler.py
+
+import asyncio
+import bisect
+import itertools
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.logger import logger
+from app.core import metrics
+from app.core.config import (
+    ZEO_MAX_WORKERS,
+    ZEO_HEAVY_COMMANDS,
+    ZEO_HEAVY_MAX_CONCURRENT,
+    ZEO_COMMAND_LIMITS,
+    ZEO_MAX_QUEUE,
+    ZEO_RETRY_AFTER,
+    ZEO_QUEUE_POLICY,
+)
+
+# Flags that modify a run but are not commands of their own
+_MODIFIER_FLAGS = {"-ha", "-r", "-nor", "-allowAdjustCoordsAndCell"}
+
+
+class SchedulerBusyError(Exception):
+    """
+    Raised when the wait queue is full. Mapped to HTTP 503 with Retry-After.
+    """
+
+    def __init__(self, retry_after: int = ZEO_RETRY_AFTER):
+        super().__init__("Zeo++ scheduler queue is full")
+        self.retry_after = retry_after
+
+
+def extract_commands(zeo_args: List[str]) -> Tuple[str, ...]:
+    """
+    Return the Zeo++ command flags (e.g. ('-sa', '-vol')) contained in an argument list.
+    """
+    return tuple(a for a in zeo_args if a.startswith("-") and a not in _MODIFIER_FLAGS and not _is_number(a))
+
+
+def command_arguments(zeo_args: List[str]) -> List[Tuple[str, List[float]]]:
+    """
+    (command, numeric arguments) pairs of an argument list, e.g. [('-sa', [1.2, 1.2, 2000.0])].
+    """
+    pairs: List[Tuple[str, List[float]]] = []
+    for token in zeo_args:
+        if _is_number(token):
+            if pairs:
+                pairs[-1][1].append(float(token))
+        elif token.startswith("-") and token not in _MODIFIER_FLAGS:
+            pairs.append((token, []))
+    return pairs
+
+
+def _is_number(token: str) -> bool:
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+class ZeoScheduler:
+    """
+    Bounded process pool in front of ZeoRunner.
+
+    - at most `max_concurrent` Zeo++ processes run at once
+    - each command flag has its own cap (heavy commands get a smaller one); a process counts
+      once per command it runs, however often the flag repeats (e.g. a chained sweep)
+    - at most `max_queue` requests wait; further requests get SchedulerBusyError
+
+    With the `shortest` policy waiters are served by arrival time plus estimated runtime,
+    so short runs overtake long ones, but a long run is only overtaken by runs that would
+    finish before it had it started right away (no starvation). With `fifo` they are served
+    in arrival order. Either way a waiter whose command is at its cap is skipped, so a queue
+    full of -psd jobs never blocks a -res job.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = ZEO_MAX_WORKERS,
+        heavy_commands: Optional[List[str]] = None,
+        heavy_limit: int = ZEO_HEAVY_MAX_CONCURRENT,
+        command_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = ZEO_MAX_QUEUE,
+        retry_after: int = ZEO_RETRY_AFTER,
+        policy: str = ZEO_QUEUE_POLICY,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.policy = policy
+        self.limits: Dict[str, int] = {c: heavy_limit for c in (heavy_commands or ZEO_HEAVY_COMMANDS)}
+        self.limits.update(ZEO_COMMAND_LIMITS if command_limits is None else command_limits)
+
+        self._running = 0
+        self._running_by_command: Dict[str, int] = defaultdict(int)
+        # (priority, arrival number, commands, future), kept sorted
+        self._waiters: List[Tuple[float, int, Tuple[str, ...], asyncio.Future]] = []
+        self._arrivals = itertools.count()
+
+    def _has_room(self, commands: Tuple[str, ...]) -> bool:
+        if self._running >= self.max_concurrent:
+            return False
+        return all(
+            self._running_by_command[c] < self.limits[c]
+            for c in commands if c in self.limits
+        )
+
+    def _acquire(self, commands: Tuple[str, ...]) -> None:
+        self._running += 1
+        for c in commands:
+            self._running_by_command[c] += 1
+
+    def _release(self, commands: Tuple[str, ...]) -> None:
+        self._running -= 1
+        for c in commands:
+            self._running_by_command[c] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """
+        Grant slots to queued waiters in priority order, skipping those whose command is capped.
+        """
+        for entry in list(self._waiters):
+            if self._running >= self.max_concurrent:
+                break
+            _, _, commands, future = entry
+            if future.done():
+                self._waiters.remove(entry)
+                continue
+            if self._has_room(commands):
+                self._waiters.remove(entry)
+                self._acquire(commands)
+                future.set_result(True)
+
+    @asynccontextmanager
+    async def slot(self, zeo_args: List[str], estimate: float = 0.0):
+        """
+        Hold one process slot for the duration of the `async with` block.
+
+        Args:
+            zeo_args (List[str]): command args passed to `network`
+            estimate (float): expected runtime in seconds, orders the queue (see class docstring)
+
+        Raises:
+            SchedulerBusyError: if the wait queue is already full
+        """
+        # Distinct commands: a sweep chaining three -sa points is still one -sa process
+        commands = tuple(dict.fromkeys(extract_commands(zeo_args)))
+
+        # Anything still queued is blocked by a cap, so a request that fits can go first
+        if self._has_room(commands):
+            self._acquire(commands)
+        else:
+            if len(self._waiters) >= self.max_queue:
+                logger.warning(f"[scheduler] Queue full ({len(self._waiters)} waiting), rejecting {commands}")
+                metrics.failure("busy")
+                raise SchedulerBusyError(self.retry_after)
+
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            priority = loop.time() + (estimate if self.policy == "shortest" else 0.0)
+            entry = (priority, next(self._arrivals), commands, future)
+            bisect.insort(self._waiters, entry, key=lambda waiter: waiter[:2])
+            logger.info(
+                f"[scheduler] Queued {commands}, estimated {estimate:.1f}s "
+                f"({len(self._waiters)} waiting, {self._running} running)"
+            )
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release(commands)
+                elif entry in self._waiters:
+                    self._waiters.remove(entry)
+                raise
+
+        try:
+            yield
+        finally:
+            self._release(commands)
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._running,
+            "waiting": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "policy": self.policy,
+            "running_by_command": {k: v for k, v in self._running_by_command.items() if v},
+        }
+
+
+scheduler = ZeoScheduler()
+
+metrics.registry.register(metrics.Gauge(
+    "zeopp_queue_waiting", "Zeo++ runs waiting for a scheduler slot in this worker",
+    callback=lambda: scheduler.stats()["waiting"]
+))
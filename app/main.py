@@ -3,8 +3,20 @@
 # Author: Shibo Li
 # Date: 2025-05-13
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from app.core.cache import CacheIntegrityError, result_cache
+from app.core.config import ENABLE_CACHE, JOBS_TTL_SECONDS, TMP_MAX_AGE, TMP_SWEEP_INTERVAL
+from app.core.engine import warm_engine
+from app.core.jobs import job_manager
+from app.core.metrics import MetricsMiddleware
+from app.core.scheduler import SchedulerBusyError
+from app.utils.file import sweep_orphan_task_dirs
+from app.utils.logger import logger
 
 # Import all route modules
 from app.api import (
@@ -18,13 +30,52 @@ from app.api import (
     ray_tracing,
     blocking_spheres,
     distance_grid,
-    voronoi_network
+    voronoi_network,
+    analyze,
+    batch,
+    jobs,
+    cache,
+    artifacts,
+    sweep,
+    metrics
 )
 
+
+async def tmp_janitor():
+    """
+    Remove task directories orphaned by crashed workers and expired jobs
+    """
+    while True:
+        try:
+            removed = await asyncio.to_thread(sweep_orphan_task_dirs, TMP_MAX_AGE)
+            if removed:
+                logger.info(f"[tmp] Removed {removed} orphaned task directories")
+            if JOBS_TTL_SECONDS:
+                await asyncio.to_thread(job_manager.sweep_expired, JOBS_TTL_SECONDS)
+        except Exception:
+            logger.exception("[tmp] Janitor failed")
+        await asyncio.sleep(TMP_SWEEP_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up jobs left unfinished by a previous worker
+    job_manager.resume()
+    background = [asyncio.create_task(tmp_janitor())]
+    if ENABLE_CACHE:
+        background.append(asyncio.create_task(result_cache.sweep_forever()))
+    yield
+    for task in background:
+        task.cancel()
+    await job_manager.shutdown()
+    await warm_engine.close()
+
+
 app = FastAPI(
     title="Zeo++ Analysis API",
     description="A containerized FastAPI service for Zeo++ structure analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Optional: CORS for frontend or external service usage
@@ -36,6 +87,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-phase timings of /api/ requests, served at /metrics
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(SchedulerBusyError)
+async def scheduler_busy_handler(request: Request, exc: SchedulerBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "message": "Zeo++ queue is full, retry later"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(CacheIntegrityError)
+async def cache_integrity_handler(request: Request, exc: CacheIntegrityError):
+    # Lookups only check sizes; checksums are verified when an output is read, and a
+    # mismatch lands here. The entry is already removed, so a retry recomputes it.
+    logger.warning(f"[cache] {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "message": "Cached result was corrupt, retry to recompute"},
+        headers={"Retry-After": "0"}
+    )
+
+
 # Register routers
 app.include_router(pore_diameter.router)
 app.include_router(surface_area.router)
@@ -48,3 +123,10 @@ app.include_router(ray_tracing.router)
 app.include_router(blocking_spheres.router)
 app.include_router(distance_grid.router)
 app.include_router(voronoi_network.router)
+app.include_router(analyze.router)
+app.include_router(batch.router)
+app.include_router(jobs.router)
+app.include_router(cache.router)
+app.include_router(artifacts.router)
+app.include_router(sweep.router)
+app.include_router(metrics.router)
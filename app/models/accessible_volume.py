@@ -6,6 +6,8 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from app.models.adaptive import AdaptiveSampling
+
 
 class AccessibleVolumeRequest(BaseModel):
     chan_radius: float = Field(..., description="Probe radius used to determine accessible volume")
@@ -13,6 +15,8 @@ class AccessibleVolumeRequest(BaseModel):
     samples: int = Field(..., description="Number of Monte Carlo samples per unit cell")
     output_filename: Optional[str] = Field("result.vol", description="Optional output file name")
     ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+    tolerance: Optional[float] = Field(None, description="Adaptive sampling: target relative error")
+    max_samples: Optional[int] = Field(None, description="Adaptive sampling: largest sample count to try")
 
 
 # Response Model
@@ -22,5 +26,6 @@ class AccessibleVolumeResponse(BaseModel):
     av: dict
     nav: dict
     cached: bool
+    adaptive: Optional[AdaptiveSampling] = Field(None, description="Sampling steps, when a tolerance was given")
 
 
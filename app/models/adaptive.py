@@ -0,0 +1,21 @@
+# Adaptive Sampling Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class SamplingStep(BaseModel):
+    samples: int = Field(..., description="Monte Carlo sample count of this step")
+    value: float = Field(..., description="Convergence metric at this step")
+    cached: bool = Field(..., description="Whether this step came from cache")
+
+
+class AdaptiveSampling(BaseModel):
+    samples: int = Field(..., description="Sample count of the returned result")
+    tolerance: float = Field(..., description="Requested relative tolerance")
+    estimated_error: Optional[float] = Field(None, description="Estimated relative error of the returned result")
+    converged: bool = Field(..., description="Whether the tolerance was met before max_samples")
+    history: List[SamplingStep] = Field(..., description="Steps run (or read from cache), in order")
@@ -0,0 +1,32 @@
+# Combined Analysis Request & Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+from app.models.accessible_volume import AccessibleVolumeResponse
+from app.models.channel_analysis import ChannelAnalysisResponse
+from app.models.pore_diameter import PoreDiameterResponse
+from app.models.probe_volume import ProbeVolumeResponse
+from app.models.surface_area import SurfaceAreaResponse
+
+
+class AnalyzeRequest(BaseModel):
+    analyses: List[str] = Field(
+        ["pore_diameter", "surface_area", "accessible_volume", "probe_volume", "channel_analysis"],
+        description="Analyses to run in one Zeo++ invocation"
+    )
+    chan_radius: Optional[float] = Field(None, description="Accessibility radius for -sa/-vol/-volpo/-chan")
+    probe_radius: Optional[float] = Field(None, description="Monte Carlo probe radius for -sa/-vol/-volpo")
+    samples: Optional[int] = Field(None, description="Monte Carlo samples for -sa/-vol/-volpo")
+    ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+
+
+class AnalyzeResponse(BaseModel):
+    pore_diameter: Optional[PoreDiameterResponse] = None
+    surface_area: Optional[SurfaceAreaResponse] = None
+    accessible_volume: Optional[AccessibleVolumeResponse] = None
+    probe_volume: Optional[ProbeVolumeResponse] = None
+    channel_analysis: Optional[ChannelAnalysisResponse] = None
@@ -0,0 +1,33 @@
+# Batch Screening Request & Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+from app.models.analyze import AnalyzeResponse
+
+
+class BatchRequest(BaseModel):
+    analyses: List[str] = Field(
+        ["pore_diameter", "surface_area", "accessible_volume", "probe_volume", "channel_analysis"],
+        description="Analyses to run for every structure"
+    )
+    chan_radius: Optional[float] = Field(None, description="Accessibility radius for -sa/-vol/-volpo/-chan")
+    probe_radius: Optional[float] = Field(None, description="Monte Carlo probe radius for -sa/-vol/-volpo")
+    samples: Optional[int] = Field(None, description="Monte Carlo samples for -sa/-vol/-volpo")
+    ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+
+
+class BatchItemResult(BaseModel):
+    """
+    One NDJSON line of the /api/batch response.
+    """
+    index: int = Field(..., description="Position of the structure in the request")
+    filename: str = Field(..., description="Structure file name")
+    success: bool
+    results: Optional[AnalyzeResponse] = Field(None, description="Per-analysis results, as in /api/analyze")
+    message: Optional[str] = Field(None, description="Error message if the structure failed")
+    stderr: Optional[str] = Field(None, description="Zeo++ stderr if it failed")
+    error: Optional[str] = Field(None, description="timeout, cpu_limit or memory_limit if a resource limit stopped Zeo++")
@@ -0,0 +1,28 @@
+# Cache Management Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from pydantic import BaseModel, Field
+from typing import Dict
+
+
+class CacheLimits(BaseModel):
+    max_bytes: int = Field(..., description="Maximum cache size in bytes (0 = unlimited)")
+    max_entries: int = Field(..., description="Maximum number of entries (0 = unlimited)")
+    ttl_seconds: int = Field(..., description="Entry lifetime in seconds (0 = unlimited)")
+
+
+class CacheStatsResponse(BaseModel):
+    backend: str = Field(..., description="Cache backend: local, sqlite or shared")
+    entries: int = Field(..., description="Number of cached results")
+    bytes: int = Field(..., description="Total size of cached outputs")
+    hits: int = Field(..., description="Cache hits since this worker started")
+    misses: int = Field(..., description="Cache misses since this worker started")
+    hit_ratio: float = Field(..., description="hits / (hits + misses)")
+    by_identifier: Dict[str, int] = Field(..., description="Entry count per endpoint")
+    limits: CacheLimits
+
+
+class CachePurgeResponse(BaseModel):
+    removed: int = Field(..., description="Number of removed entries")
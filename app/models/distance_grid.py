@@ -5,7 +5,7 @@
 
 from pydantic import BaseModel, Field
 from typing import Optional
-from typing import List
+from typing import Dict, List
 
 class DistanceGridRequest(BaseModel):
     mode: str = Field(..., description="Choose from 'gridG', 'gridGBohr', or 'gridBOV'")
@@ -16,4 +16,8 @@ class DistanceGridResponse(BaseModel):
     message: str
     output_files: List[str]
     cached: bool
+    cache_key: Optional[str] = Field(None, description="Cache entry holding the grid files")
+    download_urls: Dict[str, str] = Field(
+        default_factory=dict, description="Output file name -> GET URL streaming its content"
+    )
 
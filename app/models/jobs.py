@@ -0,0 +1,38 @@
+# Asynchronous Job Request & Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional, List
+
+
+class JobSubmitRequest(BaseModel):
+    analyses: List[str] = Field(..., description="One long-running analysis, or several combinable ones")
+    chan_radius: Optional[float] = Field(None, description="Accessibility radius")
+    probe_radius: Optional[float] = Field(None, description="Probe radius")
+    samples: Optional[int] = Field(None, description="Monte Carlo samples")
+    mode: Optional[str] = Field(None, description="Grid mode for distance_grid: gridG, gridGBohr or gridBOV")
+    ha: bool = Field(True, description="Whether to use high accuracy mode (-ha)")
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, done or failed")
+    analyses: List[str]
+    filename: str = Field(..., description="Structure file name")
+    submitted_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    runtime_seconds: Optional[float] = Field(None, description="Wall time from start to finish")
+    estimated_seconds: Optional[float] = Field(
+        None, description="Expected Zeo++ runtime at submission, from the structure size and recent runs"
+    )
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    error_code: Optional[str] = Field(None, description="timeout, cpu_limit or memory_limit if a resource limit stopped Zeo++")
+
+
+class JobResultResponse(BaseModel):
+    job_id: str
+    status: str
+    results: Dict[str, Any] = Field(..., description="Per-analysis results, as returned by the single endpoints")
@@ -4,7 +4,9 @@
 # Date: 2025-05-13
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional, Union
+
+from app.models.adaptive import AdaptiveSampling
 
 
 class PoreSizeDistRequest(BaseModel):
@@ -13,9 +15,29 @@ class PoreSizeDistRequest(BaseModel):
     samples: int = Field(..., description="Number of MC samples per unit cell")
     output_filename: Optional[str] = Field("result.psd_histo", description="Optional output file name")
     ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+    tolerance: Optional[float] = Field(None, description="Adaptive sampling: target relative error")
+    max_samples: Optional[int] = Field(None, description="Adaptive sampling: largest sample count to try")
+    histogram_format: Optional[str] = Field("json", description="json, base64 (float32), npy or arrow")
+    rebin: Optional[int] = Field(1, description="Merge every N bins")
+    max_bins: Optional[int] = Field(None, description="Downsample to at most this many bins")
+    include_raw: Optional[bool] = Field(True, description="Also return the raw output text")
+
+
+class Histogram(BaseModel):
+    format: str = Field(..., description="json, base64, npy or arrow")
+    bin_width: float = Field(..., description="Width of a bin after rebinning")
+    bin_count: int = Field(..., description="Number of bins")
+    metadata: Dict[str, float] = Field(default_factory=dict, description="Header values, e.g. total_samples")
+    columns: Optional[Dict[str, Union[List[int], List[float], str]]] = Field(
+        None,
+        description="bin_center, count, cumulative, derivative: arrays (json) or base64 little-endian float32 (base64)"
+    )
+    data: Optional[str] = Field(None, description="Whole table as a base64 .npy file (npy) or Arrow IPC stream (arrow)")
 
 
 class PoreSizeDistResponse(BaseModel):
-    content: str
+    content: Optional[str] = Field(None, description="Raw .psd_histo content (omitted when include_raw is false)")
+    histogram: Optional[Histogram] = Field(None, description="Parsed histogram")
     cached: bool
+    adaptive: Optional[AdaptiveSampling] = Field(None, description="Sampling steps, when a tolerance was given")
 
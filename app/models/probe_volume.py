@@ -6,6 +6,8 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from app.models.adaptive import AdaptiveSampling
+
 
 class ProbeVolumeRequest(BaseModel):
     chan_radius: float = Field(..., description="Probe radius used to determine POAV")
@@ -13,6 +15,8 @@ class ProbeVolumeRequest(BaseModel):
     samples: int = Field(..., description="Number of MC samples per unit cell")
     output_filename: Optional[str] = Field("result.volpo", description="Optional output file name")
     ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+    tolerance: Optional[float] = Field(None, description="Adaptive sampling: target relative error")
+    max_samples: Optional[int] = Field(None, description="Adaptive sampling: largest sample count to try")
 
 
 class ProbeVolumeResponse(BaseModel):
@@ -23,4 +27,5 @@ class ProbeVolumeResponse(BaseModel):
     ponav_fraction: float
     ponav_mass: float
     cached: bool
+    adaptive: Optional[AdaptiveSampling] = Field(None, description="Sampling steps, when a tolerance was given")
 
@@ -6,6 +6,9 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from app.models.adaptive import AdaptiveSampling
+from app.models.pore_size_dist import Histogram
+
 
 class RayTracingRequest(BaseModel):
     chan_radius: float = Field(..., description="Accessibility determination radius")
@@ -13,9 +16,17 @@ class RayTracingRequest(BaseModel):
     samples: int = Field(..., description="Number of rays")
     output_filename: Optional[str] = Field("result.ray", description="Optional output file name")
     ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+    tolerance: Optional[float] = Field(None, description="Adaptive sampling: target relative error")
+    max_samples: Optional[int] = Field(None, description="Adaptive sampling: largest sample count to try")
+    histogram_format: Optional[str] = Field("json", description="json, base64 (float32), npy or arrow")
+    rebin: Optional[int] = Field(1, description="Merge every N bins")
+    max_bins: Optional[int] = Field(None, description="Downsample to at most this many bins")
+    include_raw: Optional[bool] = Field(True, description="Also return the raw output text")
 
 
 class RayTracingResponse(BaseModel):
-    content: str
+    content: Optional[str] = Field(None, description="Raw .ray content (omitted when include_raw is false)")
+    histogram: Optional[Histogram] = Field(None, description="Parsed histogram")
     cached: bool
+    adaptive: Optional[AdaptiveSampling] = Field(None, description="Sampling steps, when a tolerance was given")
 
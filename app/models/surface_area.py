@@ -6,6 +6,8 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from app.models.adaptive import AdaptiveSampling
+
 
 class SurfaceAreaRequest(BaseModel):
     chan_radius: float = Field(..., description="Radius used to determine accessibility of void space")
@@ -13,6 +15,8 @@ class SurfaceAreaRequest(BaseModel):
     samples: int = Field(..., description="Number of Monte Carlo samples per atom")
     output_filename: Optional[str] = Field("result.sa", description="Optional output file name")
     ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+    tolerance: Optional[float] = Field(None, description="Adaptive sampling: target relative error")
+    max_samples: Optional[int] = Field(None, description="Adaptive sampling: largest sample count to try")
 
 
 class SurfaceAreaResponse(BaseModel):
@@ -23,4 +27,5 @@ class SurfaceAreaResponse(BaseModel):
     nasa_volume: float
     nasa_mass: float
     cached: bool
+    adaptive: Optional[AdaptiveSampling] = Field(None, description="Sampling steps, when a tolerance was given")
 
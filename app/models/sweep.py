@@ -0,0 +1,41 @@
+# Probe-Radius Sweep Request & Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+from app.models.accessible_volume import AccessibleVolumeResponse
+from app.models.channel_analysis import ChannelAnalysisResponse
+from app.models.probe_volume import ProbeVolumeResponse
+from app.models.surface_area import SurfaceAreaResponse
+
+
+class SweepRequest(BaseModel):
+    analyses: List[str] = Field(
+        ["surface_area", "accessible_volume", "channel_analysis"],
+        description="Probe-dependent analyses to run at every radius"
+    )
+    probe_radii: Optional[List[float]] = Field(None, description="Explicit list of probe radii")
+    radius_start: Optional[float] = Field(None, description="First radius of a ladder")
+    radius_stop: Optional[float] = Field(None, description="Last radius of a ladder (inclusive)")
+    radius_step: Optional[float] = Field(None, description="Ladder step")
+    samples: int = Field(..., description="Monte Carlo samples for -sa/-vol/-volpo")
+    chan_radius: Optional[float] = Field(None, description="Fixed accessibility radius (default: each probe radius)")
+    ha: Optional[bool] = Field(True, description="Whether to use high accuracy mode (-ha)")
+
+
+class SweepPoint(BaseModel):
+    probe_radius: float
+    chan_radius: float
+    surface_area: Optional[SurfaceAreaResponse] = None
+    accessible_volume: Optional[AccessibleVolumeResponse] = None
+    probe_volume: Optional[ProbeVolumeResponse] = None
+    channel_analysis: Optional[ChannelAnalysisResponse] = None
+
+
+class SweepResponse(BaseModel):
+    analyses: List[str] = Field(..., description="Analyses run at every radius")
+    points: List[SweepPoint] = Field(..., description="One row per probe radius, in request order")
+    cached_points: int = Field(..., description="Points answered entirely from the cache")
@@ -4,17 +4,43 @@
 # Date: 2025-05-13
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class VoronoiNetworkRequest(BaseModel):
     use_radii: Optional[bool] = Field(True, description="Use atomic radii (-r) or not (-nor)")
     output_filename: Optional[str] = Field("result.nt2", description="Optional output file name")
+    probe_radius: Optional[float] = Field(None, description="Report the network components accessible to this probe")
+    include_raw: Optional[bool] = Field(True, description="Also return the raw .nt2 content")
+
+
+class IncludedSphere(BaseModel):
+    radius: float = Field(..., description="Radius of the largest included sphere, Å")
+    node: int = Field(..., description="Index of the Voronoi node it is centred on")
+    position: List[float] = Field(..., description="Cartesian coordinates of that node, Å")
+
+
+class NetworkComponent(BaseModel):
+    nodes: int = Field(..., description="Number of accessible nodes in the component")
+    max_radius: float = Field(..., description="Largest node radius in the component, Å")
+    dimensionality: int = Field(..., description="0 for a pocket, 1-3 for a channel system")
+    percolates: Dict[str, bool] = Field(..., description="Whether the component crosses the cell along x / y / z")
 
 class VoronoiNetworkResponse(BaseModel):
     node_count: Optional[int] = Field(None, description="Number of Voronoi nodes")
     edge_count: Optional[int] = Field(None, description="Number of Voronoi edges")
-    raw: str = Field(..., description="Raw content of .nt2 file")
+    largest_included_sphere: Optional[IncludedSphere] = Field(None, description="Largest sphere in the network")
+    bottleneck_radius: Dict[str, Optional[float]] = Field(
+        default_factory=dict,
+        description="Per axis, the largest probe radius that percolates along it (null if none)"
+    )
+    probe_radius: Optional[float] = Field(None, description="Probe radius used for components")
+    components: Optional[List[NetworkComponent]] = Field(
+        None, description="Parts of the network accessible to probe_radius, channels first"
+    )
+    raw: Optional[str] = Field(None, description="Raw content of .nt2 file (omitted when include_raw is false)")
     cached: bool = Field(..., description="Whether the result came from cache")
+    cache_key: Optional[str] = Field(None, description="Cache entry holding the .nt2 file")
+    download_url: Optional[str] = Field(None, description="GET URL streaming the .nt2 file")
 
 
@@ -3,53 +3,406 @@
 # Author: Shibo Li
 # Date: 2025-05-13
 
+import asyncio
+import fcntl
 import hashlib
+import io
+import os
+import shutil
+import tarfile
+import time
 import uuid
+import zipfile
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Set, Tuple
 
-from app.core.config import TMP_DIR, CACHE_DIR
+from app.core import metrics
+from app.core.config import TMP_DIR, CACHE_DIR, RETAIN_TASK_DIRS, CANONICAL_STRUCTURE_KEYS
+from app.utils.structure import CanonicalStructure, parse_structure
 
+# Structure formats accepted inside batch archives
+STRUCTURE_EXTENSIONS = {".cif", ".cssr", ".v1", ".cuc", ".pdb"}
 
-def save_uploaded_file(uploaded_file, prefix: str = "task") -> Path:
+
+# Uploads are copied and hashed in chunks of this size, never held in memory whole
+CHUNK_SIZE = 1024 * 1024
+
+# task directory -> running computations working in it; they outlive a cancelled caller
+_running_in: Dict[Path, Set[asyncio.Task]] = {}
+
+
+class StagedUpload:
+    """
+    An uploaded structure file, hashed straight from the request's spooled upload.
+
+    Nothing is written to TMP_DIR until materialize() is called, so requests answered
+    from the cache never create a task directory.
+
+    digest is the sha256 of the raw bytes; fingerprint identifies the structure itself
+    and is what cache keys are derived from; structure is the parsed file (None if it
+    cannot be parsed), which runtime estimates are based on.
+    """
+
+    @classmethod
+    def saved(
+        cls, file_path: Path, digest: str, size: int, structure: Optional[CanonicalStructure]
+    ) -> "StagedUpload":
+        """
+        An upload already written to its task directory, hashed and parsed while it was written.
+        """
+        upload = cls.__new__(cls)
+        upload._source = None
+        upload.filename = file_path.name
+        upload.prefix = file_path.parent.name.rsplit("_", 1)[0]
+        upload.path = file_path
+        upload.digest, upload.size, upload.structure = digest, size, structure
+        upload.fingerprint = _fingerprint(structure) or digest
+        return upload
+
+    def __init__(self, source: BinaryIO, filename: str, prefix: str = "task"):
+        self._source = source
+        self.filename = Path(filename).name
+        self.prefix = prefix
+        self.path: Optional[Path] = None
+        with metrics.timed("hash"):
+            self.digest, self.size = _hash_stream(source)
+            self.structure = _parse_source(source, self.filename)
+            self.fingerprint = _fingerprint(self.structure) or self.digest
+
+    @property
+    def name(self) -> str:
+        return self.filename
+
+    def materialize(self) -> Path:
+        """
+        Write the upload into its own task directory (once) and return the file path.
+        """
+        if self.path is None:
+            file_path = _new_task_file(self.filename, self.prefix)
+            self._source.seek(0)
+            with open(file_path, "wb") as f:
+                shutil.copyfileobj(self._source, f, CHUNK_SIZE)
+            self.path = file_path
+        return self.path
+
+    def discard(self) -> None:
+        """
+        Remove the task directory, if one was created (kept when retained for debugging),
+        once no computation works in it any more.
+        """
+        if self.path is not None:
+            cleanup_when_idle(self.path)
+
+
+def _new_task_file(filename: str, prefix: str) -> Path:
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    task_dir = TMP_DIR / f"{prefix}_{uuid.uuid4().hex}"
+    task_dir.mkdir(parents=True)
+    # Drop any directory components a client may have put in the file name
+    return task_dir / Path(filename).name
+
+
+class _CopyingReader(io.RawIOBase):
+    """
+    Reads `source`, writing every byte read to `sink` and into `digest`.
+    """
+
+    def __init__(self, source: BinaryIO, sink: BinaryIO, digest):
+        self.source = source
+        self.sink = sink
+        self.digest = digest
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.source.read(len(buffer))
+        self.sink.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _save_source(source: BinaryIO, file_path: Path) -> StagedUpload:
     """
-    Upload Files to temporary directory and return the file path
+    Write `source` to `file_path`, hashing and parsing it from the same read.
+    """
+    m = hashlib.sha256()
+    with metrics.timed("hash"), open(file_path, "wb") as sink:
+        reader = _CopyingReader(source, sink, m)
+        stream = io.BufferedReader(reader, CHUNK_SIZE)
+        structure = parse_structure((line.decode("utf-8", "replace") for line in stream), file_path.name)
+        # The parser may stop early (or not read at all): copy the rest
+        while stream.read(CHUNK_SIZE):
+            pass
+    return StagedUpload.saved(file_path, m.hexdigest(), reader.size, structure)
+
+
+def _hash_stream(source: BinaryIO) -> Tuple[str, int]:
+    """
+    Hash a seekable stream chunk by chunk and rewind it, returning (sha256 hex digest, size).
+    """
+    m = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    while chunk := source.read(CHUNK_SIZE):
+        m.update(chunk)
+        size += len(chunk)
+    source.seek(0)
+    return m.hexdigest(), size
+
+
+def _parse_source(source: BinaryIO, filename: str) -> Optional[CanonicalStructure]:
+    """
+    Canonical structure of a seekable stream, or None if it cannot be parsed.
+    """
+    source.seek(0)
+    try:
+        return parse_structure((line.decode("utf-8", "replace") for line in source), filename)
+    finally:
+        source.seek(0)
+
+
+def _fingerprint(structure: Optional[CanonicalStructure]) -> Optional[str]:
+    if not CANONICAL_STRUCTURE_KEYS or structure is None:
+        return None
+    return structure.fingerprint()
+
+
+def stage_upload(uploaded_file, prefix: str = "task") -> StagedUpload:
+    """
+    Hash an upload without writing it anywhere
+
+    Args:
+        uploaded_file: UploadFile
+        prefix (str): optional, prefix for the task ID used if it is materialized
+
+    Returns:
+        StagedUpload: content digest and size; call materialize() for a file path
+    """
+    return StagedUpload(uploaded_file.file, uploaded_file.filename, prefix)
+
+
+def save_uploaded_file(uploaded_file, prefix: str = "task") -> StagedUpload:
+    """
+    Upload Files to temporary directory, hashing and parsing them on the way
 
     Args:
         uploaded_file: UploadFile 
         prefix (str): optional, prefix for the task ID
 
     Returns:
-        Path: path to the saved file
+        StagedUpload: the saved file (path set), with its digest and parsed structure
     """
-    TMP_DIR.mkdir(parents=True, exist_ok=True)
-    task_id = f"{prefix}_{uuid.uuid4().hex}"
-    task_dir = TMP_DIR / task_id
-    task_dir.mkdir(parents=True)
+    return _save_source(uploaded_file.file, _new_task_file(uploaded_file.filename, prefix))
+
+
+def cleanup_task_dir(file_path: Path) -> None:
+    """
+    Delete the task directory holding `file_path`, unless RETAIN_TASK_DIRS is set for debugging
+
+    Args:
+        file_path (Path): a file directly inside TMP_DIR/<task_id>/
+    """
+    task_dir = file_path.parent
+    if RETAIN_TASK_DIRS or task_dir.parent.resolve() != TMP_DIR.resolve():
+        return
+    shutil.rmtree(task_dir, ignore_errors=True)
+
+
+def track_task_dir(file_path: Path, task: asyncio.Task) -> None:
+    """
+    Keep the task directory of `file_path` until `task` is done (see cleanup_when_idle)
+
+    Args:
+        file_path (Path): a file directly inside TMP_DIR/<task_id>/
+        task (asyncio.Task): computation working in that directory
+    """
+    running = _running_in.setdefault(file_path.parent, set())
+    running.add(task)
+
+    def done(_):
+        running.discard(task)
+        if not running:
+            _running_in.pop(file_path.parent, None)
+
+    task.add_done_callback(done)
+
+
+def cleanup_when_idle(file_path: Path) -> None:
+    """
+    Remove the task directory of `file_path` once no computation works in it.
+
+    Computations are shielded from their callers, so a cancelled caller must not remove
+    its input while Zeo++ may still be reading it; the last computation removes it instead.
+
+    Args:
+        file_path (Path): a file directly inside TMP_DIR/<task_id>/
+    """
+    pending = set(_running_in.get(file_path.parent, ()))
+    if not pending:
+        cleanup_task_dir(file_path)
+        return
+
+    def done(task: asyncio.Task) -> None:
+        pending.discard(task)
+        if not pending:
+            cleanup_task_dir(file_path)
+
+    for task in pending:
+        task.add_done_callback(done)
+
+
+@asynccontextmanager
+async def staged_upload(uploaded_file, prefix: str = "task") -> AsyncIterator[StagedUpload]:
+    """
+    Hash an upload and remove its task directory (if it was ever written) on exit
+
+    Usage:
+        async with staged_upload(structure_file, prefix="sa") as upload:
+            ...
+
+    Args:
+        uploaded_file: UploadFile
+        prefix (str): optional, prefix for the task ID
+
+    Yields:
+        StagedUpload: the upload and its digest
+    """
+    upload = await asyncio.to_thread(stage_upload, uploaded_file, prefix)
+    try:
+        yield upload
+    finally:
+        upload.discard()
 
-    file_path = task_dir / uploaded_file.filename
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.file.read())
 
-    return file_path
+def sweep_orphan_task_dirs(max_age: float) -> int:
+    """
+    Remove task directories not modified for `max_age` seconds (left by crashed workers)
 
+    Args:
+        max_age (float): minimum age in seconds
 
-def compute_cache_key(file_path: Path, args: List[str], extra: Optional[str] = None) -> str:
+    Returns:
+        int: number of removed directories
+    """
+    if not TMP_DIR.exists():
+        return 0
+
+    cutoff = time.time() - max_age
+    removed = 0
+    for task_dir in TMP_DIR.iterdir():
+        try:
+            if task_dir.is_dir() and task_dir.stat().st_mtime < cutoff:
+                shutil.rmtree(task_dir, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def extract_structure_archive(archive_path: Path, prefix: str = "task") -> List[StagedUpload]:
+    """
+    Extract structure files from a .zip / .tar(.gz) archive, each into its own task directory
+
+    Only members with a known structure extension are kept; directory components of
+    member names are dropped so nothing is written outside TMP_DIR.
+
+    Args:
+        archive_path (Path): path to the saved archive
+        prefix (str): optional, prefix for the task IDs
+
+    Returns:
+        List[StagedUpload]: the extracted structure files (hashed and parsed while extracted), in archive order
+    """
+    uploads: List[StagedUpload] = []
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                name = Path(info.filename).name
+                if info.is_dir() or Path(name).suffix.lower() not in STRUCTURE_EXTENSIONS:
+                    continue
+                with zf.open(info) as member_file:
+                    uploads.append(_save_source(member_file, _new_task_file(name, prefix)))
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path) as tf:
+            for member in tf:
+                name = Path(member.name).name
+                if not member.isfile() or Path(name).suffix.lower() not in STRUCTURE_EXTENSIONS:
+                    continue
+                uploads.append(_save_source(tf.extractfile(member), _new_task_file(name, prefix)))
+    else:
+        raise ValueError(f"Unsupported archive format: {archive_path.name}")
+
+    return uploads
+
+
+def compute_file_digest(file_path: Path) -> str:
+    """
+    sha256 hex digest of a file's content, read in chunks
+
+    Args:
+        file_path (Path): path to the file
+
+    Returns:
+        str: sha256 hex digest
+    """
+    m = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+def compute_structure_digest(file_path: Path) -> str:
+    """
+    Digest used in cache keys: the canonical structure fingerprint when the file can be
+    parsed (and CANONICAL_STRUCTURE_KEYS is on), otherwise the sha256 of its bytes
+
+    Args:
+        file_path (Path): path to the structure file
+
+    Returns:
+        str: sha256 hex digest
+    """
+    return inspect_structure(file_path)[0]
+
+
+def inspect_structure(file_path: Path) -> Tuple[str, Optional[CanonicalStructure]]:
+    """
+    compute_structure_digest and the parsed structure (None if it cannot be parsed), from one read.
+    """
+    with open(file_path, "rb") as f:
+        structure = _parse_source(f, file_path.name)
+    return _fingerprint(structure) or compute_file_digest(file_path), structure
+
+
+def compute_cache_key(
+    file_path: Optional[Path],
+    args: List[str],
+    extra: Optional[str] = None,
+    file_digest: Optional[str] = None
+) -> str:
     """
     generate a cache key based on the file content and command arguments
     This key is used to check if the result is already cached.
 
     Args:
-        file_path (Path): path to the input file
+        file_path (Path): path to the input file; may be None when file_digest is given
         args (List[str]): parameters passed to the command of zeo++
         extra (str): optional, extra identifier to distinguish different calls
+        file_digest (str): optional, digest of the structure (see compute_structure_digest);
+            the raw file digest is computed when it is not given
 
     Returns:
-        str: sha256 hash of the file content and command arguments
+        str: sha256 hash of the file digest and command arguments
     """
-    file_bytes = file_path.read_bytes()
     m = hashlib.sha256()
-    m.update(file_bytes)
+    m.update((file_digest or compute_file_digest(file_path)).encode())
     m.update(" ".join(args).encode())
     if extra:
         m.update(extra.encode())
@@ -66,3 +419,43 @@ def get_cache_path(cache_key: str) -> Path:
         Path: workspace/cache/<hash> path
     """
     return CACHE_DIR / cache_key
+
+
+@asynccontextmanager
+async def cache_lock(cache_key: str, poll_interval: float = 0.1):
+    """
+    Hold an exclusive lock on workspace/cache/.locks/<hash>.lock.
+
+    The lock is shared by every worker process on the host, so only one of them
+    computes a given cache entry. Polls with a non-blocking flock instead of
+    blocking a thread while another worker holds it.
+
+    Args:
+        cache_key (str): cache key generated by compute_cache_key
+        poll_interval (float): seconds between attempts while the lock is held elsewhere
+    """
+    lock_dir = CACHE_DIR / ".locks"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    lock_path = lock_dir / f"{cache_key}.lock"
+
+    while True:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            await asyncio.sleep(poll_interval)
+            continue
+        # The previous holder unlinks the file on release; make sure we locked the live one
+        try:
+            if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+    try:
+        yield
+    finally:
+        lock_path.unlink(missing_ok=True)
+        os.close(fd)
@@ -0,0 +1,226 @@
+# The Code is to rebin and encode Zeo++ histograms (pore size distribution, ray tracing)
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/utils/histogram.py
+
+import base64
+import io
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from app.utils.logger import logger
+
+# Column order of every encoding
+COLUMNS = ("bin_center", "count", "cumulative", "derivative")
+
+# json: arrays of numbers; base64: one little-endian float32 buffer per column;
+# npy / arrow: the whole table as one base64 .npy file / Arrow IPC stream
+HISTOGRAM_FORMATS = ("json", "base64", "npy", "arrow")
+
+
+@dataclass(frozen=True)
+class Histogram:
+    """
+    Columnar histogram.
+
+    bin_start: lower edge of each bin
+    count: samples in the bin
+    cumulative: fraction of samples in this bin or above (1 at the first bin)
+    derivative: -d(cumulative)/d(bin), i.e. the normalized distribution
+    metadata: numeric `Key: value` header lines of the file (e.g. total_samples)
+    """
+    bin_width: float
+    bin_start: np.ndarray
+    count: np.ndarray
+    cumulative: np.ndarray
+    derivative: np.ndarray
+    metadata: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def bin_count(self) -> int:
+        return len(self.bin_start)
+
+    @property
+    def bin_center(self) -> np.ndarray:
+        return self.bin_start + self.bin_width / 2
+
+    @property
+    def mean(self) -> float:
+        """
+        Count-weighted mean bin center (0 for an empty histogram).
+        """
+        total = self.count.sum()
+        return float((self.bin_center * self.count).sum() / total) if total else 0.0
+
+    def rebin(self, factor: int) -> "Histogram":
+        """
+        Merge every `factor` consecutive bins (the last bin may merge fewer).
+        """
+        if factor <= 1 or self.bin_count == 0:
+            return self
+        starts = np.arange(0, self.bin_count, factor)
+        sizes = np.diff(np.append(starts, self.bin_count))
+        return Histogram(
+            bin_width=self.bin_width * factor,
+            bin_start=self.bin_start[starts],
+            count=np.add.reduceat(self.count, starts),
+            # Fraction at or above the first merged bin
+            cumulative=self.cumulative[starts],
+            # Densities of equal-width bins average
+            derivative=np.add.reduceat(self.derivative, starts) / sizes,
+            metadata=self.metadata
+        )
+
+    def downsample(self, max_bins: int) -> "Histogram":
+        """
+        Rebin by the smallest factor that leaves at most `max_bins` bins.
+        """
+        if max_bins <= 0 or self.bin_count <= max_bins:
+            return self
+        return self.rebin(math.ceil(self.bin_count / max_bins))
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+
+def histogram_from_columns(
+    bin_start: np.ndarray,
+    count: np.ndarray,
+    cumulative: Optional[np.ndarray] = None,
+    derivative: Optional[np.ndarray] = None,
+    bin_width: Optional[float] = None,
+    metadata: Optional[Dict[str, float]] = None
+) -> Histogram:
+    """
+    Build a Histogram, deriving the bin width, cumulative and derivative columns
+    from the counts when the file does not provide them.
+    """
+    count = np.asarray(count, dtype=np.float64)
+    if bin_width is None:
+        bin_width = round(float(np.median(np.diff(bin_start))), 12) if len(bin_start) > 1 else 0.0
+    total = count.sum()
+    if cumulative is None:
+        cumulative = np.cumsum(count[::-1])[::-1] / total if total else np.zeros_like(count)
+    if derivative is None:
+        derivative = count / (total * bin_width) if total and bin_width else np.zeros_like(count)
+    return Histogram(
+        bin_width=bin_width,
+        bin_start=np.asarray(bin_start, dtype=np.float64),
+        count=count,
+        cumulative=np.asarray(cumulative, dtype=np.float64),
+        derivative=np.asarray(derivative, dtype=np.float64),
+        metadata=metadata or {}
+    )
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _to_npy(histogram: Histogram) -> bytes:
+    table = np.empty(histogram.bin_count, dtype=[(name, "<f8") for name in COLUMNS])
+    for name in COLUMNS:
+        table[name] = histogram.column(name)
+    buffer = io.BytesIO()
+    np.save(buffer, table, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _to_arrow(histogram: Histogram) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ValueError("The arrow format requires the pyarrow package") from e
+    table = pa.table({name: histogram.column(name) for name in COLUMNS})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_histogram(histogram: Histogram, fmt: str = "json") -> Dict:
+    """
+    Serialize a histogram for an API response
+
+    Args:
+        histogram (Histogram): parsed (and possibly rebinned) histogram
+        fmt (str): one of HISTOGRAM_FORMATS
+
+    Returns:
+        dict: fields of the Histogram response model
+
+    Raises:
+        ValueError: unknown format, or arrow without pyarrow installed
+    """
+    payload = {
+        "format": fmt,
+        "bin_width": histogram.bin_width,
+        "bin_count": histogram.bin_count,
+        "metadata": histogram.metadata,
+        "columns": None,
+        "data": None,
+    }
+    if fmt == "json":
+        payload["columns"] = {name: histogram.column(name).tolist() for name in COLUMNS}
+        payload["columns"]["count"] = histogram.count.round().astype(np.int64).tolist()
+    elif fmt == "base64":
+        payload["columns"] = {name: _b64(histogram.column(name).astype("<f4").tobytes()) for name in COLUMNS}
+    elif fmt == "npy":
+        payload["data"] = _b64(_to_npy(histogram))
+    elif fmt == "arrow":
+        payload["data"] = _b64(_to_arrow(histogram))
+    else:
+        raise ValueError(f"Invalid histogram format: {fmt}. Use {', '.join(HISTOGRAM_FORMATS)}.")
+    return payload
+
+
+def validate_histogram_options(fmt: str, rebin: int = 1, max_bins: Optional[int] = None) -> Optional[str]:
+    """
+    Check histogram request parameters before running Zeo++.
+
+    Returns:
+        Optional[str]: error message for a 400 response, or None if they are valid
+    """
+    if fmt not in HISTOGRAM_FORMATS:
+        return f"Invalid histogram format: {fmt}. Use {', '.join(HISTOGRAM_FORMATS)}."
+    if fmt == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return "The arrow format requires the pyarrow package on the server."
+    if rebin < 1 or (max_bins is not None and max_bins < 1):
+        return "rebin and max_bins must be positive."
+    return None
+
+
+def histogram_payload(
+    parse: Callable[[str], Histogram],
+    text: str,
+    fmt: str = "json",
+    rebin: int = 1,
+    max_bins: Optional[int] = None
+) -> Optional[Dict]:
+    """
+    Parse, rebin and encode a histogram output file
+
+    Args:
+        parse (Callable): parse_psd_from_text or parse_ray_from_text
+        text (str): output file content
+        fmt (str): one of HISTOGRAM_FORMATS
+        rebin (int): merge every `rebin` bins
+        max_bins (int): optional, then downsample to at most this many bins
+
+    Returns:
+        dict: fields of the Histogram response model, or None if the file has no data rows
+    """
+    try:
+        histogram = parse(text)
+    except ValueError as e:
+        logger.info(f"[histogram] Could not parse histogram: {e}")
+        return None
+    return encode_histogram(histogram.rebin(rebin).downsample(max_bins or 0), fmt)
@@ -7,7 +7,14 @@ import re
 from pathlib import Path
 from typing import Dict, Any
 
+import numpy as np
 
+from app.core.metrics import timed_parser
+from app.utils.histogram import Histogram, histogram_from_columns
+from app.utils.voronoi import VoronoiNetwork
+
+
+@timed_parser
 def parse_vol_from_text(text: str) -> dict:
     """
     Parse content of Zeo++ .vol file from string for volume and density.
@@ -52,6 +59,7 @@ def parse_vol_from_text(text: str) -> dict:
     }
 
 
+@timed_parser
 def parse_chan_from_text(text: str) -> dict:
     """
     Parse content of Zeo++ .chan file from string for channel dimensionality.
@@ -97,6 +105,7 @@ def parse_chan_from_text(text: str) -> dict:
         }
 
 
+@timed_parser
 def parse_sa_from_text(text: str) -> dict:
     """
     Parse content of Zeo++ .sa file from string for surface area.
@@ -137,6 +146,7 @@ def parse_sa_from_text(text: str) -> dict:
     }
 
 
+@timed_parser
 def parse_volpo_from_text(text: str) -> dict:
     """
     Parse content of Zeo++ .volpo file string for probe occupiable volume.
@@ -168,6 +178,7 @@ def parse_volpo_from_text(text: str) -> dict:
     }
 
 
+@timed_parser
 def parse_res_from_text(text: str) -> dict:
     """
     Parse .res file text to extract pore diameters.
@@ -184,6 +195,7 @@ def parse_res_from_text(text: str) -> dict:
     }
 
 
+@timed_parser
 def parse_block_from_text(text: str) -> dict:
     """
     Parse .block output content from Zeo++ to extract summary info.
@@ -216,6 +228,7 @@ def parse_block_from_text(text: str) -> dict:
     return result
 
 
+@timed_parser
 def parse_strinfo_from_text(text: str) -> dict:
     """
     Parse .strinfo file content and extract framework count and dimensionality.
@@ -271,14 +284,70 @@ def parse_strinfo_from_text(text: str) -> dict:
     }
 
 
+def _float_table(rows: list, width: int) -> np.ndarray:
+    values = np.fromstring(" ".join(rows), dtype=np.float64, sep=" ") if rows else np.empty(0)
+    if values.size != len(rows) * width:
+        raise ValueError("NT2 output has malformed rows.")
+    return values.reshape(-1, width)
+
+
+@timed_parser
+def parse_nt2_network(text: str) -> VoronoiNetwork:
+    """
+    Parse Zeo++ .nt2 content into NumPy arrays.
+
+    Expected format:
+    Vertex table:
+    <id> <x> <y> <z> <radius> <neighbouring atom ids...>
+    Edge table:
+    <from> -> <to> <radius> <shift a> <shift b> <shift c> <length>
+
+    Returns:
+        VoronoiNetwork: node coordinates and radii, edge node pairs, unit cell shifts, radii and lengths
+    """
+    vertices = []
+    edges = []
+    section = None
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens or tokens[0].startswith("#"):
+            continue
+        lower = line.lower()
+        if lower.startswith("vertex table"):
+            section = vertices
+        elif lower.startswith("edge table"):
+            section = edges
+        elif section is vertices and len(tokens) >= 5:
+            vertices.append(" ".join(tokens[:5]))
+        elif section is edges and len(tokens) >= 8 and tokens[1] == "->":
+            edges.append(f"{tokens[0]} {' '.join(tokens[2:8])}")
+
+    # One C-level float conversion per table instead of one per token
+    node_table = _float_table(vertices, 5)
+    edge_table = _float_table(edges, 7)
+
+    # Map node ids to rows in case the file does not number them 0..n-1
+    ids = node_table[:, 0].astype(np.int64)
+    order = np.argsort(ids)
+    ends = edge_table[:, 0:2].astype(np.int64)
+    positions = np.searchsorted(ids[order], ends)
+    if ends.size and (positions.max() >= len(ids) or not np.array_equal(ids[order][positions], ends)):
+        raise ValueError("NT2 edge refers to an unknown vertex.")
+
+    return VoronoiNetwork(
+        node_xyz=node_table[:, 1:4],
+        node_radius=node_table[:, 4],
+        edge_index=order[positions].astype(np.int32).reshape(-1, 2),
+        edge_shift=edge_table[:, 3:6].astype(np.int32),
+        edge_radius=edge_table[:, 2],
+        edge_length=edge_table[:, 6]
+    )
+
+
 def parse_nt2_from_text(text: str) -> dict:
     """
     Parse Zeo++ .nt2 file to extract basic Voronoi network statistics.
 
-    Looks for:
-    - Node count: lines starting with 'node' (ignoring comments)
-    - Edge count: lines starting with 'edge'
-
     Returns:
         {
             "node_count": int,
@@ -286,21 +355,81 @@ def parse_nt2_from_text(text: str) -> dict:
             "raw": str
         }
     """
-    lines = text.strip().splitlines()
-    node_count = 0
-    edge_count = 0
-
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        if line.startswith("node"):
-            node_count += 1
-        elif line.startswith("edge"):
-            edge_count += 1
-
+    network = parse_nt2_network(text)
     return {
-        "node_count": node_count,
-        "edge_count": edge_count,
+        "node_count": network.node_count,
+        "edge_count": network.edge_count,
         "raw": text.strip()
     }
+
+
+def _parse_histogram(text: str) -> Histogram:
+    """
+    Split a Zeo++ histogram file into `Key: value` header lines and numeric rows.
+    Rows have the bin lower edge and count, optionally followed by cumulative and
+    derivative columns.
+    """
+    metadata: Dict[str, float] = {}
+    rows = []
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        try:
+            rows.append([float(x) for x in tokens[:4]])
+            continue
+        except ValueError:
+            pass
+        if ":" in line:
+            key, _, value = line.partition(":")
+            key = re.sub(r"\(.*?\)", "", key).strip().lower()
+            try:
+                metadata[re.sub(r"[^a-z0-9]+", "_", key).strip("_")] = float(value.split()[0])
+            except (ValueError, IndexError):
+                pass
+
+    rows = [row for row in rows if len(row) >= 2]
+    if not rows:
+        raise ValueError("Histogram output has no data rows.")
+    width = min(len(row) for row in rows)
+    table = np.array([row[:width] for row in rows], dtype=np.float64)
+    return histogram_from_columns(
+        bin_start=table[:, 0],
+        count=table[:, 1],
+        cumulative=table[:, 2] if width > 2 else None,
+        derivative=table[:, 3] if width > 3 else None,
+        bin_width=metadata.get("bin_size"),
+        metadata=metadata
+    )
+
+
+@timed_parser
+def parse_psd_from_text(text: str) -> Histogram:
+    """
+    Parse Zeo++ .psd_histo (pore size distribution) content into columns.
+
+    Expected format:
+    Bin size (A): 0.1
+    Total samples: <int>
+    ...
+    Bin Count Cumulative_dist Derivative_dist
+    <bin> <count> <cumulative> <derivative>
+
+    Returns:
+        Histogram: bin edges, counts, cumulative and derivative distributions,
+        header values in metadata (bin_size, total_samples, accessible_samples, ...)
+    """
+    return _parse_histogram(text)
+
+
+@timed_parser
+def parse_ray_from_text(text: str) -> Histogram:
+    """
+    Parse Zeo++ .ray (ray-tracing histogram) content into columns.
+
+    Rows are `<ray length> <count>`; cumulative and derivative are computed from the counts.
+
+    Returns:
+        Histogram: same columns as parse_psd_from_text
+    """
+    return _parse_histogram(text)
@@ -0,0 +1,332 @@
+# The Code is to parse structure files into a canonical, format-independent form
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/utils/structure.py
+
+import hashlib
+import json
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.utils.logger import logger
+
+# Rounding used to decide that two structures are the same
+CELL_DECIMALS = 4
+COORD_DECIMALS = 4
+
+# Bump when the canonical form changes so old fingerprints stop matching
+FINGERPRINT_VERSION = "structure-v2"
+
+Vector = Tuple[float, float, float]
+Cell = Tuple[float, float, float, float, float, float]
+
+_CIF_TOKEN = re.compile(r"'[^']*'|\"[^\"]*\"|#.*|\S+")
+_CIF_UNCERTAINTY = re.compile(r"\(\d+\)$")
+_ELEMENT = re.compile(r"[A-Za-z]+")
+
+
+@dataclass(frozen=True)
+class CanonicalStructure:
+    """
+    Cell parameters, symmetry operations and atoms of a structure, independent of
+    file format, atom ordering, comments and metadata.
+
+    cell: (a, b, c, alpha, beta, gamma), lengths in Å and angles in degrees
+    symmetry: sorted, whitespace-free symmetry operations (empty for P1)
+    atoms: sorted (element, x, y, z) with fractional coordinates wrapped into [0, 1)
+    """
+    cell: Cell
+    symmetry: Tuple[str, ...]
+    atoms: Tuple[Tuple[str, float, float, float], ...]
+
+    @property
+    def atom_count(self) -> int:
+        return len(self.atoms)
+
+    @property
+    def volume(self) -> float:
+        """
+        Unit cell volume in Å^3.
+        """
+        a, b, c, alpha, beta, gamma = self.cell
+        ca, cb, cg = (math.cos(math.radians(x)) for x in (alpha, beta, gamma))
+        return a * b * c * math.sqrt(max(0.0, 1 - ca * ca - cb * cb - cg * cg + 2 * ca * cb * cg))
+
+    def fingerprint(self) -> str:
+        """
+        sha256 hex digest of the canonical form.
+        """
+        payload = json.dumps(
+            [FINGERPRINT_VERSION, self.cell, self.symmetry, self.atoms], separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _number(token: str) -> float:
+    # CIF values may carry an uncertainty, e.g. 13.2350(3)
+    return float(_CIF_UNCERTAINTY.sub("", token))
+
+
+def _element(label: str) -> str:
+    match = _ELEMENT.match(label)
+    if not match:
+        raise ValueError(f"Invalid atom label: {label}")
+    return match.group(0)
+
+
+def _wrap(value: float) -> float:
+    value = round(value % 1.0, COORD_DECIMALS) % 1.0
+    return value + 0.0  # turns -0.0 into 0.0
+
+
+def _canonical(
+    cell: Cell,
+    atoms: Iterable[Tuple[str, float, float, float]],
+    symmetry: Iterable[str] = ()
+) -> CanonicalStructure:
+    ops = sorted({re.sub(r"\s+", "", op).lower() for op in symmetry})
+    if ops == ["x,y,z"]:
+        ops = []
+    return CanonicalStructure(
+        cell=tuple(round(float(x), CELL_DECIMALS) + 0.0 for x in cell),
+        symmetry=tuple(ops),
+        atoms=tuple(sorted((el, _wrap(x), _wrap(y), _wrap(z)) for el, x, y, z in atoms))
+    )
+
+
+def _cell_matrix(cell: Cell) -> List[Vector]:
+    """
+    Lattice vectors (rows) for cell parameters, a along x and b in the xy plane.
+    """
+    a, b, c, alpha, beta, gamma = cell
+    ca, cb, cg = (math.cos(math.radians(x)) for x in (alpha, beta, gamma))
+    sg = math.sin(math.radians(gamma))
+    cx = c * cb
+    cy = c * (ca - cb * cg) / sg
+    cz = math.sqrt(max(0.0, c * c - cx * cx - cy * cy))
+    return [(a, 0.0, 0.0), (b * cg, b * sg, 0.0), (cx, cy, cz)]
+
+
+def _cell_parameters(vectors: List[Vector]) -> Cell:
+    def dot(u: Vector, v: Vector) -> float:
+        return sum(p * q for p, q in zip(u, v))
+
+    def angle(u: Vector, v: Vector, nu: float, nv: float) -> float:
+        return math.degrees(math.acos(max(-1.0, min(1.0, dot(u, v) / (nu * nv)))))
+
+    a, b, c = (math.sqrt(dot(v, v)) for v in vectors)
+    va, vb, vc = vectors
+    return (a, b, c, angle(vb, vc, b, c), angle(va, vc, a, c), angle(va, vb, a, b))
+
+
+def _to_fractional(vectors: List[Vector]) -> Callable[[Vector], Vector]:
+    """
+    Return a function mapping Cartesian coordinates to fractional ones for the given lattice.
+    """
+    (a1, a2, a3), (b1, b2, b3), (c1, c2, c3) = vectors
+    det = a1 * (b2 * c3 - b3 * c2) - a2 * (b1 * c3 - b3 * c1) + a3 * (b1 * c2 - b2 * c1)
+    if abs(det) < 1e-12:
+        raise ValueError("Degenerate unit cell")
+    # Inverse of the matrix whose columns are the lattice vectors
+    inv = [
+        [(b2 * c3 - b3 * c2) / det, (b3 * c1 - b1 * c3) / det, (b1 * c2 - b2 * c1) / det],
+        [(a3 * c2 - a2 * c3) / det, (a1 * c3 - a3 * c1) / det, (a2 * c1 - a1 * c2) / det],
+        [(a2 * b3 - a3 * b2) / det, (a3 * b1 - a1 * b3) / det, (a1 * b2 - a2 * b1) / det],
+    ]
+    return lambda r: tuple(sum(inv[i][j] * r[j] for j in range(3)) for i in range(3))
+
+
+# Value token standing in for a text field (its content never matters for the structure)
+TEXT_FIELD = "?"
+# Tags naming the space group, and their values meaning P1
+_SPACE_GROUP_TAGS = (
+    "_symmetry_space_group_name_h-m", "_space_group_name_h-m_alt",
+    "_symmetry_space_group_name_hall", "_space_group_name_hall",
+    "_symmetry_int_tables_number", "_space_group_it_number",
+)
+_P1 = {"p1", "p 1", "1"}
+
+
+def _cif_tokens(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Split CIF content into tokens, dropping comments. A multi-line text field becomes a
+    single "?" token, so the tag it belongs to still gets exactly one value.
+    """
+    in_text = False
+    for line in lines:
+        if line.startswith(";"):
+            in_text = not in_text
+            if in_text:
+                yield TEXT_FIELD
+            continue
+        if in_text:
+            continue
+        for token in _CIF_TOKEN.findall(line):
+            if token[0] == "#":
+                break
+            if token[0] in "'\"" and len(token) >= 2:
+                token = token[1:-1]
+            yield token
+
+
+def parse_cif(lines: Iterable[str]) -> CanonicalStructure:
+    """
+    Parse the first data block of a CIF file (fractional coordinates only).
+    """
+    values: Dict[str, str] = {}
+    loops: List[Dict[str, List[str]]] = []
+    tokens = list(_cif_tokens(lines))
+
+    i = 0
+    seen_data = False
+    while i < len(tokens):
+        token = tokens[i]
+        lower = token.lower()
+        if lower.startswith("data_"):
+            if seen_data:
+                break
+            seen_data = True
+            i += 1
+        elif lower == "loop_":
+            i += 1
+            tags: List[str] = []
+            while i < len(tokens) and tokens[i].startswith("_"):
+                tags.append(tokens[i].lower())
+                i += 1
+            row: List[str] = []
+            while i < len(tokens) and not tokens[i].startswith("_") and tokens[i].lower() != "loop_" \
+                    and not tokens[i].lower().startswith("data_"):
+                row.append(tokens[i])
+                i += 1
+            if tags:
+                loops.append({tag: row[k::len(tags)] for k, tag in enumerate(tags)})
+        elif token.startswith("_") and i + 1 < len(tokens):
+            values[lower] = tokens[i + 1]
+            i += 2
+        else:
+            i += 1
+
+    cell = tuple(
+        _number(values[f"_cell_{name}"])
+        for name in ("length_a", "length_b", "length_c", "angle_alpha", "angle_beta", "angle_gamma")
+    )
+
+    symmetry: List[str] = []
+    atoms: List[Tuple[str, float, float, float]] = []
+    for loop in loops:
+        for tag in ("_symmetry_equiv_pos_as_xyz", "_space_group_symop_operation_xyz"):
+            if tag in loop:
+                symmetry.extend(loop[tag])
+        if "_atom_site_fract_x" in loop:
+            names = loop.get("_atom_site_type_symbol") or loop["_atom_site_label"]
+            xs, ys, zs = (loop[f"_atom_site_fract_{axis}"] for axis in "xyz")
+            atoms.extend(
+                (_element(name), _number(x), _number(y), _number(z))
+                for name, x, y, z in zip(names, xs, ys, zs)
+            )
+
+    if not atoms:
+        raise ValueError("No fractional atom sites found")
+    if not symmetry:
+        # Without explicit operations the space group name decides the expansion
+        group = re.sub(r"\s+", "", values.get("_symmetry_space_group_name_h-m", "")
+                       or values.get("_space_group_name_h-m_alt", ""))
+        if group in ("?", "."):
+            group = ""
+        if group and group.upper() != "P1":
+            symmetry = [f"hm:{group}"]
+        elif not group and any(
+            values[tag].lower() not in _P1 for tag in _SPACE_GROUP_TAGS if tag in values
+        ):
+            # A space group we cannot expand must not be keyed like the bare asymmetric unit
+            raise ValueError("Space group given without usable symmetry operations or H-M name")
+    return _canonical(cell, atoms, symmetry)
+
+
+def parse_cssr(lines: Iterable[str]) -> CanonicalStructure:
+    lines = [line for line in lines if line.strip()]
+    a, b, c = (float(x) for x in lines[0].split()[:3])
+    alpha, beta, gamma = (float(x) for x in lines[1].split()[:3])
+    header = lines[2].split()
+    count = int(header[0])
+    cartesian = len(header) > 1 and header[1] == "1"
+    cell = (a, b, c, alpha, beta, gamma)
+    to_frac = _to_fractional(_cell_matrix(cell)) if cartesian else None
+
+    atoms = []
+    for line in lines[4:4 + count]:
+        fields = line.split()
+        r = (float(fields[2]), float(fields[3]), float(fields[4]))
+        x, y, z = to_frac(r) if to_frac else r
+        atoms.append((_element(fields[1]), x, y, z))
+    if len(atoms) != count:
+        raise ValueError("Truncated CSSR file")
+    return _canonical(cell, atoms)
+
+
+def parse_v1(lines: Iterable[str]) -> CanonicalStructure:
+    lines = [line for line in lines if line.strip()]
+    if not lines[0].lower().startswith("unit_cell"):
+        raise ValueError("Missing Unit_cell header")
+    vectors = [tuple(float(x) for x in line.split()[:3]) for line in lines[1:4]]
+    count = int(lines[4].split()[0])
+    to_frac = _to_fractional(vectors)
+
+    atoms = []
+    for line in lines[5:5 + count]:
+        fields = line.split()
+        x, y, z = to_frac((float(fields[1]), float(fields[2]), float(fields[3])))
+        atoms.append((_element(fields[0]), x, y, z))
+    if len(atoms) != count:
+        raise ValueError("Truncated V1 file")
+    return _canonical(_cell_parameters(vectors), atoms)
+
+
+def parse_cuc(lines: Iterable[str]) -> CanonicalStructure:
+    cell: Optional[Cell] = None
+    atoms = []
+    for line in lines:
+        fields = line.split()
+        if not fields or fields[0].lower().startswith("processing"):
+            continue
+        if fields[0].lower().startswith("unit_cell"):
+            cell = tuple(float(x) for x in fields[1:7])
+            continue
+        atoms.append((_element(fields[0]), float(fields[1]), float(fields[2]), float(fields[3])))
+    if cell is None or not atoms:
+        raise ValueError("Missing unit cell or atoms")
+    return _canonical(cell, atoms)
+
+
+PARSERS: Dict[str, Callable[[Iterable[str]], CanonicalStructure]] = {
+    ".cif": parse_cif,
+    ".cssr": parse_cssr,
+    ".v1": parse_v1,
+    ".cuc": parse_cuc,
+}
+
+
+def parse_structure(lines: Iterable[str], filename: str) -> Optional[CanonicalStructure]:
+    """
+    Parse a structure file into its canonical form
+
+    Args:
+        lines (Iterable[str]): file content, line by line
+        filename (str): file name, its extension selects the format
+
+    Returns:
+        CanonicalStructure: or None if the format is unsupported or the file cannot be parsed
+    """
+    suffix = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    parser = PARSERS.get(suffix)
+    if parser is None:
+        return None
+    try:
+        return parser(lines)
+    except (ValueError, KeyError, IndexError, ZeroDivisionError) as e:
+        logger.info(f"[structure] Could not canonicalize {filename}: {e}")
+        return None
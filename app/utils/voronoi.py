@@ -0,0 +1,191 @@
+# The Code is to query Voronoi networks (.nt2) held in NumPy arrays
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# app/utils/voronoi.py
+
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+AXES = ("x", "y", "z")
+
+Shift = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class VoronoiNetwork:
+    """
+    Voronoi network of a periodic structure.
+
+    node_xyz: (n, 3) Cartesian node coordinates, Å
+    node_radius: (n,) radius of the largest sphere centred on each node, Å
+    edge_index: (m, 2) node indices (rows of node_xyz) joined by each edge
+    edge_shift: (m, 3) unit cell of the second node relative to the first
+    edge_radius: (m,) radius of the largest sphere that can pass along each edge, Å
+    edge_length: (m,) edge lengths, Å
+    """
+    node_xyz: np.ndarray
+    node_radius: np.ndarray
+    edge_index: np.ndarray
+    edge_shift: np.ndarray
+    edge_radius: np.ndarray
+    edge_length: np.ndarray
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_radius)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_radius)
+
+    def largest_included_sphere(self) -> Optional[Dict]:
+        """
+        Largest sphere that fits anywhere in the network (centred on a node).
+        """
+        if not self.node_count:
+            return None
+        node = int(np.argmax(self.node_radius))
+        return {
+            "radius": float(self.node_radius[node]),
+            "node": node,
+            "position": self.node_xyz[node].tolist(),
+        }
+
+    def bottleneck_radius(self) -> Dict[str, Optional[float]]:
+        """
+        Per axis, the largest probe radius that can travel through the network across
+        unit cells along that axis (None if no path percolates along it).
+
+        Edges are added from the widest down; an axis percolates as soon as a cycle
+        in the periodic graph spans a lattice translation with a component along it.
+        """
+        graph = _PeriodicGraph(self.node_count)
+        bottleneck: Dict[str, Optional[float]] = {axis: None for axis in AXES}
+        for e, u, v, shift in self._edges(np.argsort(-self.edge_radius, kind="stable")):
+            root = graph.add_edge(u, v, shift)
+            for i, axis in enumerate(AXES):
+                if bottleneck[axis] is None and graph.percolates(root)[i]:
+                    bottleneck[axis] = float(self.edge_radius[e])
+            if all(value is not None for value in bottleneck.values()):
+                break
+        return bottleneck
+
+    def components(self, probe_radius: float) -> List[Dict]:
+        """
+        Connected parts of the network a probe of `probe_radius` can move through.
+
+        Returns:
+            List[dict]: nodes, max_radius, dimensionality (0 = pocket, 1-3 = channel)
+            and percolates per axis, largest first
+        """
+        graph = _PeriodicGraph(self.node_count)
+        for _, u, v, shift in self._edges(np.flatnonzero(self.edge_radius >= probe_radius)):
+            graph.add_edge(u, v, shift)
+
+        members: Dict[int, List[int]] = {}
+        for node in np.flatnonzero(self.node_radius >= probe_radius).tolist():
+            members.setdefault(graph.find(node)[0], []).append(node)
+
+        components = []
+        for root, nodes in members.items():
+            percolates = graph.percolates(root)
+            components.append({
+                "nodes": len(nodes),
+                "max_radius": float(self.node_radius[nodes].max()),
+                "dimensionality": graph.dimensionality(root),
+                "percolates": {axis: percolates[i] for i, axis in enumerate(AXES)},
+            })
+        components.sort(key=lambda c: (-c["dimensionality"], -c["nodes"]))
+        return components
+
+    def _edges(self, selection: np.ndarray) -> Iterator[Tuple[int, int, int, Shift]]:
+        """
+        (edge, u, v, shift) for the selected edges, as Python ints.
+        """
+        pairs = self.edge_index[selection].tolist()
+        shifts = self.edge_shift[selection].tolist()
+        for e, (u, v), shift in zip(selection.tolist(), pairs, shifts):
+            yield e, u, v, tuple(shift)
+
+
+class _PeriodicGraph:
+    """
+    Union-find over network nodes that also tracks where each node sits (in unit
+    cells) relative to the root of its component, so closing a loop reveals the
+    lattice translations the component spans.
+
+    Plain integer tuples: per-edge work on tiny NumPy arrays is far slower.
+    """
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.offset: List[Shift] = [(0, 0, 0)] * size
+        # Linearly independent lattice translations spanned by each root's component
+        self.spans: Dict[int, List[Shift]] = {}
+
+    def find(self, node: int) -> Tuple[int, Shift]:
+        path = []
+        while self.parent[node] != node:
+            path.append(node)
+            node = self.parent[node]
+        root = node
+        # Compress: offsets accumulate from the root downwards
+        for child in reversed(path):
+            parent = self.parent[child]
+            if parent != root:
+                self.offset[child] = _add(self.offset[child], self.offset[parent])
+            self.parent[child] = root
+        return root, (self.offset[path[0]] if path else (0, 0, 0))
+
+    def add_edge(self, u: int, v: int, shift: Shift) -> int:
+        """
+        Join u to v in unit cell `shift`; returns the root of the merged component.
+        """
+        root_u, off_u = self.find(u)
+        root_v, off_v = self.find(v)
+        # Where this edge puts v relative to root_u, minus where v already is
+        relative = _sub(_add(off_u, shift), off_v)
+        if root_u == root_v:
+            self._add_span(root_u, relative)
+            return root_u
+        self.parent[root_v] = root_u
+        self.offset[root_v] = relative
+        for span in self.spans.pop(root_v, []):
+            self._add_span(root_u, span)
+        return root_u
+
+    def _add_span(self, root: int, vector: Shift) -> None:
+        if vector == (0, 0, 0):
+            return
+        spans = self.spans.setdefault(root, [])
+        if len(spans) == 0 \
+                or len(spans) == 1 and _cross(spans[0], vector) != (0, 0, 0) \
+                or len(spans) == 2 and _dot(_cross(spans[0], spans[1]), vector) != 0:
+            spans.append(vector)
+
+    def dimensionality(self, root: int) -> int:
+        return len(self.spans.get(root, []))
+
+    def percolates(self, root: int) -> Tuple[bool, bool, bool]:
+        spans = self.spans.get(root, [])
+        return tuple(any(span[i] for span in spans) for i in range(3))
+
+
+def _add(a: Shift, b: Shift) -> Shift:
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2])
+
+
+def _sub(a: Shift, b: Shift) -> Shift:
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+
+def _cross(a: Shift, b: Shift) -> Shift:
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+def _dot(a: Shift, b: Shift) -> int:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
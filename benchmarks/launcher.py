@@ -0,0 +1,112 @@
+# Micro-benchmark of the per-invocation overhead of launching Zeo++
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+# benchmarks/launcher.py
+#
+# Usage (from the repository root):
+#   python -m benchmarks.launcher                                  # /bin/true, 200 runs
+#   python -m benchmarks.launcher --runs 500 --ballast-mb 500      # parent with a large heap
+#   python -m benchmarks.launcher -- ./network -ha -res out.res EDI.cif
+#
+# Compares, for the same command:
+#   run_process  the runner's launcher (vfork, pipes and exit awaited on the event loop)
+#   preexec      Popen with a preexec_fn (forces fork) and merged output, waited on in a thread
+#   sh           sh.Command(..., _err_to_out=True), the original launcher (only if `sh` is installed)
+
+import argparse
+import asyncio
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from app.core.process import ProcessLimits, run_process
+
+# Limits applied by every variant, so each pays for setting rlimits
+LIMITS = ProcessLimits(timeout=60, cpu_seconds=60, memory_bytes=8 * 1024 ** 3)
+
+
+def _set_limits() -> None:
+    resource.setrlimit(resource.RLIMIT_CPU, (int(LIMITS.cpu_seconds), int(LIMITS.cpu_seconds) + 5))
+    resource.setrlimit(resource.RLIMIT_AS, (LIMITS.memory_bytes, LIMITS.memory_bytes))
+
+
+def _preexec(args: List[str], cwd: str) -> None:
+    subprocess.run(
+        args, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        start_new_session=True, preexec_fn=_set_limits, timeout=LIMITS.timeout
+    )
+
+
+def _sh(args: List[str], cwd: str) -> None:
+    import sh
+    sh.Command(args[0])(*args[1:], _cwd=cwd, _err_to_out=True, _ok_code=list(range(256)))
+
+
+async def _measure_async(args: List[str], cwd: str, runs: int) -> List[float]:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await run_process(args, cwd, LIMITS)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+async def _measure_thread(launch: Callable[[List[str], str], None], args: List[str], cwd: str, runs: int) -> List[float]:
+    # The old runner called the launcher from a worker thread; so does this
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await asyncio.to_thread(launch, args, cwd)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def _summary(durations: List[float]) -> Dict[str, float]:
+    ordered = sorted(durations)
+    return {
+        "mean": statistics.fmean(ordered) * 1000,
+        "p50": ordered[len(ordered) // 2] * 1000,
+        "p95": ordered[int(len(ordered) * 0.95) - 1] * 1000,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-invocation overhead of the Zeo++ launchers")
+    parser.add_argument("--runs", type=int, default=200, help="invocations per launcher")
+    parser.add_argument("--ballast-mb", type=int, default=0, help="heap to allocate first, like a loaded API worker")
+    parser.add_argument("command", nargs="*", default=["/bin/true"], help="command to launch")
+    options = parser.parse_args()
+
+    ballast = bytearray(options.ballast_mb * 1024 * 1024)
+    ballast[::4096] = b"\1" * len(ballast[::4096])
+
+    launchers = {"run_process": None, "preexec": _preexec}
+    try:
+        import sh  # noqa: F401
+        launchers["sh"] = _sh
+    except ImportError:
+        print("sh is not installed, skipping it", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as cwd:
+        print(f"{options.command} x {options.runs}, parent heap +{options.ballast_mb} MB")
+        print(f"{'launcher':<12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, launch in launchers.items():
+            # One untimed round to warm up imports and page cache
+            if launch is None:
+                await _measure_async(options.command, cwd, 5)
+                durations = await _measure_async(options.command, cwd, options.runs)
+            else:
+                await _measure_thread(launch, options.command, cwd, 5)
+                durations = await _measure_thread(launch, options.command, cwd, options.runs)
+            stats = _summary(durations)
+            print(f"{name:<12} {stats['mean']:>9.3f} {stats['p50']:>9.3f} {stats['p95']:>9.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+# Shared fixtures: a throwaway workspace and a fake Zeo++ `network` executable
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# app.core.config reads the environment at import time, so this runs before any test imports app
+WORKSPACE = Path(tempfile.mkdtemp(prefix="zeopp-tests-"))
+FAKE_NETWORK = WORKSPACE / "network"
+CALLS_LOG = WORKSPACE / "calls.log"
+
+FAKE_NETWORK_SOURCE = f"""#!{sys.executable}
+# Writes canned Zeo++ outputs for the flags it is given and logs every call
+import os, sys, time
+
+args = sys.argv[1:]
+time.sleep(float(os.environ.get("FAKE_ZEO_DELAY", "0")))
+with open({str(CALLS_LOG)!r}, "a") as log:
+    log.write(" ".join(args) + "\\n")
+
+inp = args[-1]
+stem = inp.rsplit(".", 1)[0]
+for i, arg in enumerate(args[:-1]):
+    if arg == "-res":
+        open(args[i + 1], "w").write(inp + " 4.89082 3.03868 4.81969\\n")
+    elif arg == "-nt2":
+        open(args[i + 1], "w").write(
+            "Vertex table:\\n0 1.0 1.0 1.0 2.5 1 2\\n1 5.0 1.0 1.0 2.0 0 2\\n2 5.0 5.0 1.0 1.5 0 1\\n\\n"
+            "Edge table:\\n0 -> 1 1.8 0 0 0 4.0\\n1 -> 0 1.8 1 0 0 6.0\\n1 -> 2 1.2 0 0 0 4.0\\n2 -> 0 1.0 0 1 0 5.0\\n"
+        )
+    elif arg == "-gridBOV":
+        open(stem + ".bov", "w").write("DATA_FILE: " + os.path.basename(stem) + ".dat\\n")
+        open(stem + ".dat", "wb").write(bytes(range(256)) * 100)
+print("fake zeo done")
+"""
+
+FAKE_NETWORK.write_text(FAKE_NETWORK_SOURCE)
+FAKE_NETWORK.chmod(FAKE_NETWORK.stat().st_mode | stat.S_IEXEC)
+os.environ.pop("ZEO_TMP_DIR", None)
+os.environ.update(
+    ZEO_EXEC_PATH=str(FAKE_NETWORK),
+    ZEO_WORKSPACE=str(WORKSPACE / "workspace"),
+    ZEO_ENGINE="cli",
+    ENABLE_CACHE="true",
+    CACHE_BACKEND="local",
+    CACHE_COMPRESSION="none",
+)
+
+EDI_CIF = b"""data_EDI
+_cell_length_a 6.926
+_cell_length_b 6.926
+_cell_length_c 6.410
+_cell_angle_alpha 90
+_cell_angle_beta 90
+_cell_angle_gamma 90
+_symmetry_space_group_name_H-M 'P 1'
+loop_
+_atom_site_label
+_atom_site_type_symbol
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+Si1 Si 0.0000 0.0000 0.0000
+O1 O 0.1250 0.1250 0.2500
+O2 O 0.5000 0.2500 0.1000
+"""
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _remove_workspace():
+    yield
+    shutil.rmtree(WORKSPACE, ignore_errors=True)
+
+
+@pytest.fixture
+def zeo_calls():
+    """
+    Returns a function listing the fake `network` invocations made since the test started.
+    """
+    CALLS_LOG.unlink(missing_ok=True)
+
+    def calls():
+        return CALLS_LOG.read_text().splitlines() if CALLS_LOG.exists() else []
+
+    return calls
+
+
+@pytest.fixture
+def empty_cache():
+    """
+    The global result cache, emptied.
+    """
+    from app.core.cache import result_cache
+
+    result_cache.purge()
+    return result_cache
+
+
+@pytest.fixture
+def client(empty_cache):
+    """
+    TestClient on the app, starting from an empty result cache.
+    """
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def upload(content: bytes = EDI_CIF, filename: str = "EDI.cif") -> dict:
+    return {"structure_file": (filename, content)}
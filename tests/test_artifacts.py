@@ -0,0 +1,61 @@
+# Tests for artifact downloads from the result cache
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import pytest
+
+from conftest import upload
+
+GRID = bytes(range(256)) * 100
+
+
+@pytest.fixture
+def grid_url(client, zeo_calls):
+    response = client.post("/api/distance_grid", files=upload(), data={"mode": "gridBOV"})
+    assert response.status_code == 200
+    assert len(zeo_calls()) == 1
+    return response.json()["download_urls"]["result.dat"]
+
+
+def test_full_download(client, grid_url):
+    response = client.get(grid_url, headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.content == GRID
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "result.dat" in response.headers["content-disposition"]
+
+
+def test_range_requests(client, grid_url):
+    response = client.get(grid_url, headers={"Range": "bytes=10-19", "Accept-Encoding": "identity"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(GRID)}"
+    assert response.content == GRID[10:20]
+
+    response = client.get(grid_url, headers={"Range": "bytes=-5", "Accept-Encoding": "identity"})
+    assert response.status_code == 206
+    assert response.content == GRID[-5:]
+
+    response = client.get(grid_url, headers={"Range": f"bytes={len(GRID)}-", "Accept-Encoding": "identity"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(GRID)}"
+
+
+def test_conditional_requests(client, grid_url):
+    etag = client.get(grid_url, headers={"Accept-Encoding": "identity"}).headers["etag"]
+
+    response = client.get(grid_url, headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # A stale If-Range validator gets the whole file instead of the range
+    response = client.get(
+        grid_url, headers={"Range": "bytes=0-3", "If-Range": '"stale"', "Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 200
+    assert response.content == GRID
+
+
+def test_unknown_artifact_is_404(client):
+    assert client.get("/api/artifacts/" + "0" * 64 + "/result.dat").status_code == 404
@@ -0,0 +1,102 @@
+# Tests for the result cache on each storage backend
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import sqlite3
+
+import pytest
+
+from app.core.cache import CacheIntegrityError, ResultCache
+from app.core.cache_backends import LocalDirBackend, LocalObjectStore, ObjectStoreBackend, SQLiteBackend
+
+KEY = "ab" * 32
+CONTENT = b"EDI.cif 4.89082 3.03868 4.81969\n" * 100
+
+
+def _local(tmp_path):
+    root = tmp_path / "local"
+    return LocalDirBackend(root), lambda data: (root / KEY / "out.res").write_bytes(data)
+
+
+def _sqlite(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+
+    def rewrite(data):
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE files SET data = ? WHERE key = ?", (data, KEY))
+
+    return SQLiteBackend(path), rewrite
+
+
+def _shared(tmp_path):
+    root = tmp_path / "shared"
+    return ObjectStoreBackend(LocalObjectStore(root)), lambda data: (root / KEY / "out.res").write_bytes(data)
+
+
+@pytest.fixture(params=[_local, _sqlite, _shared], ids=["local", "sqlite", "shared"])
+def stored(request, tmp_path):
+    """
+    A ResultCache holding one entry, and a function that overwrites the entry's stored bytes.
+    """
+    backend, rewrite = request.param(tmp_path)
+    cache = ResultCache(backend=backend, compression="none", max_bytes=0, max_entries=0, ttl_seconds=0)
+    output = tmp_path / "out.res"
+    output.write_bytes(CONTENT)
+    assert cache.store(KEY, {"out.res": output}, "pore_diameter", {"zeo_version": "test"})
+    return cache, rewrite
+
+
+def _stored_size(cache: ResultCache) -> int:
+    return cache.backend.stored_sizes(KEY)["out.res"]
+
+
+def test_round_trip(stored):
+    cache, _ = stored
+
+    outputs = cache.load(KEY)
+
+    assert outputs is not None
+    assert outputs["out.res"] == CONTENT.decode()
+    assert cache.hits == 1
+    assert cache.stats()["entries"] == 1
+    assert cache.backend.read_manifest(KEY)["zeo_version"] == "test"
+
+
+def test_second_store_is_rejected(stored, tmp_path):
+    cache, _ = stored
+    other = tmp_path / "other.res"
+    other.write_bytes(b"other")
+
+    assert not cache.store(KEY, {"out.res": other}, "pore_diameter")
+    assert cache.load(KEY)["out.res"] == CONTENT.decode()
+
+
+def test_same_size_corruption_is_detected_on_read(stored):
+    cache, rewrite = stored
+    rewrite(b"\0" * _stored_size(cache))
+
+    # Lookups only compare sizes, so the entry is found ...
+    outputs = cache.load(KEY)
+    assert outputs is not None
+    # ... and reading it catches the corruption and drops the entry
+    with pytest.raises(CacheIntegrityError):
+        outputs["out.res"]
+    assert not cache.contains(KEY)
+    assert cache.load(KEY) is None
+
+
+def test_truncated_entry_is_a_miss(stored):
+    cache, rewrite = stored
+    rewrite(b"trunc")
+
+    assert cache.load(KEY) is None
+    assert not cache.contains(KEY)
+
+
+def test_purge_empties_the_backend(stored):
+    cache, _ = stored
+
+    assert cache.purge() == 1
+    assert cache.stats()["entries"] == 0
+    assert cache.load(KEY) is None
@@ -0,0 +1,100 @@
+# Tests for the Zeo++ process scheduler and request coalescing
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import upload
+from app.core.scheduler import SchedulerBusyError, ZeoScheduler, scheduler
+from app.main import app
+
+PSD = ["-psd", "1.2", "1.2", "100", "out.psd", "in.cif"]
+RES = ["-ha", "-res", "out.res", "in.cif"]
+
+
+def _scheduler(**overrides) -> ZeoScheduler:
+    options = dict(max_concurrent=2, heavy_commands=["-psd"], heavy_limit=1, command_limits={}, max_queue=2)
+    options.update(overrides)
+    return ZeoScheduler(**options)
+
+
+def test_heavy_cap_lets_light_commands_through():
+    async def scenario():
+        s = _scheduler()
+        started = []
+
+        async def run(args, name):
+            async with s.slot(args):
+                started.append(name)
+                await asyncio.sleep(0.05)
+
+        tasks = [asyncio.create_task(run(PSD, "psd1")), asyncio.create_task(run(PSD, "psd2"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(run(RES, "res")))
+        await asyncio.sleep(0.01)
+        stats = s.stats()
+        await asyncio.gather(*tasks)
+        return started, stats, s.stats()
+
+    started, during, after = asyncio.run(scenario())
+    # psd2 waits for the -psd cap while res takes the second process slot
+    assert started == ["psd1", "res", "psd2"]
+    assert during["running"] == 2 and during["waiting"] == 1
+    assert during["running_by_command"] == {"-psd": 1, "-res": 1}
+    assert after["running"] == 0 and after["waiting"] == 0
+
+
+def test_full_queue_raises_busy():
+    async def scenario():
+        s = _scheduler(max_concurrent=1, max_queue=1, retry_after=7)
+        release = asyncio.Event()
+
+        async def hold():
+            async with s.slot(RES):
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()), asyncio.create_task(hold())]
+        await asyncio.sleep(0.01)
+        with pytest.raises(SchedulerBusyError) as busy:
+            async with s.slot(RES):
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return busy.value.retry_after, s.stats()
+
+    retry_after, stats = asyncio.run(scenario())
+    assert retry_after == 7
+    assert stats["running"] == 0 and stats["waiting"] == 0
+
+
+def test_full_queue_answers_503(client, zeo_calls, monkeypatch):
+    monkeypatch.setattr(scheduler, "max_concurrent", 0)
+    monkeypatch.setattr(scheduler, "max_queue", 0)
+
+    response = client.post("/api/pore_diameter", files=upload())
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(scheduler.retry_after)
+    assert response.json()["success"] is False
+    assert zeo_calls() == []
+
+
+def test_identical_concurrent_requests_share_one_run(empty_cache, zeo_calls, monkeypatch):
+    monkeypatch.setenv("FAKE_ZEO_DELAY", "0.5")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/api/pore_diameter", files=upload(filename=f"EDI{i}.cif")) for i in range(3)
+            ))
+
+    responses = asyncio.run(scenario())
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len({r.json()["included_diameter"] for r in responses}) == 1
+    assert len(zeo_calls()) == 1
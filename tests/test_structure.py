@@ -0,0 +1,58 @@
+# Tests for structure canonicalization
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+from app.utils.structure import parse_structure
+
+ATOMS = """loop_
+_atom_site_label
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+Si1 0.10 0.20 0.30
+O1 0.40 0.50 0.60
+"""
+
+CELL = """_cell_length_a 10.0
+_cell_length_b 11.0
+_cell_length_c 12.0
+_cell_angle_alpha 90
+_cell_angle_beta 100
+_cell_angle_gamma 90
+"""
+
+TEXT_FIELD = """_audit_creation_method
+;
+Generated by some program
+over two lines
+;
+"""
+
+
+def _cif(*parts: str) -> str:
+    return "data_test\n" + "".join(parts)
+
+
+def _parse(content: str):
+    return parse_structure(content.splitlines(), "test.cif")
+
+
+def test_text_field_before_cell_keeps_cell():
+    structure = _parse(_cif(TEXT_FIELD, CELL, ATOMS))
+    assert structure is not None
+    assert structure.cell == _parse(_cif(CELL, ATOMS)).cell
+
+
+def test_text_field_before_space_group_keeps_symmetry():
+    p21c = _parse(_cif(CELL, TEXT_FIELD, "_symmetry_space_group_name_H-M 'P 1 21/c 1'\n", ATOMS))
+    p1 = _parse(_cif(CELL, "_symmetry_space_group_name_H-M 'P 1'\n", ATOMS))
+    assert p21c is not None and p1 is not None
+    assert p21c.symmetry == ("hm:p121/c1",)
+    assert p21c.fingerprint() != p1.fingerprint()
+
+
+def test_space_group_without_usable_symmetry_is_not_canonicalized():
+    assert _parse(_cif(CELL, "_space_group_IT_number 14\n", ATOMS)) is None
+    assert _parse(_cif(CELL, "_symmetry_space_group_name_H-M ?\n_space_group_IT_number 14\n", ATOMS)) is None
+    assert _parse(_cif(CELL, "_space_group_IT_number 1\n", ATOMS)) is not None
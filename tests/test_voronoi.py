@@ -0,0 +1,86 @@
+# Tests for Voronoi network parsing and channel dimensionality
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2025-05-13
+
+import pytest
+
+from conftest import upload
+from app.utils.parser import parse_nt2_network
+
+
+def _nt2(nodes, edges) -> str:
+    """
+    .nt2 text for nodes [(radius)] and edges [(from, to, radius, shift)].
+    """
+    lines = ["Vertex table:"]
+    lines += [f"{i} {i}.0 0.0 0.0 {radius} 1 2 3" for i, radius in enumerate(nodes)]
+    lines += ["", "Edge table:"]
+    lines += [f"{u} -> {v} {radius} {a} {b} {c} 2.0" for u, v, radius, (a, b, c) in edges]
+    return "\n".join(lines) + "\n"
+
+
+# One node joined to its own images along a, b and c, through edges of decreasing width
+CUBIC = _nt2([2.0], [(0, 0, 1.5, (1, 0, 0)), (0, 0, 1.2, (0, 1, 0)), (0, 0, 0.9, (0, 0, 1))])
+
+
+@pytest.mark.parametrize("probe, dimensionality, percolates", [
+    (0.5, 3, {"x": True, "y": True, "z": True}),
+    (1.0, 2, {"x": True, "y": True, "z": False}),
+    (1.3, 1, {"x": True, "y": False, "z": False}),
+    (1.8, 0, {"x": False, "y": False, "z": False}),
+])
+def test_dimensionality_drops_as_the_probe_grows(probe, dimensionality, percolates):
+    components = parse_nt2_network(CUBIC).components(probe)
+
+    assert len(components) == 1
+    assert components[0]["dimensionality"] == dimensionality
+    assert components[0]["percolates"] == percolates
+
+
+def test_probe_larger_than_every_node_finds_nothing():
+    assert parse_nt2_network(CUBIC).components(2.5) == []
+
+
+def test_bottleneck_radius_per_axis():
+    assert parse_nt2_network(CUBIC).bottleneck_radius() == {"x": 1.5, "y": 1.2, "z": 0.9}
+
+
+def test_diagonal_loop_is_one_dimensional_channel():
+    # Two cells' worth of a zigzag: the loop spans (1, 1, 0), so it percolates along x and y
+    network = parse_nt2_network(_nt2([2.0, 2.0], [(0, 1, 1.5, (0, 0, 0)), (1, 0, 1.5, (1, 1, 0))]))
+
+    component, = network.components(1.0)
+    assert component["nodes"] == 2
+    assert component["dimensionality"] == 1
+    assert component["percolates"] == {"x": True, "y": True, "z": False}
+
+
+def test_separate_pocket_and_channel_are_sorted_channel_first():
+    network = parse_nt2_network(_nt2(
+        [2.0, 2.0, 3.0],
+        [(0, 1, 1.5, (0, 0, 0)), (1, 0, 1.5, (0, 0, 1))]
+    ))
+
+    channel, pocket = network.components(1.0)
+    assert (channel["dimensionality"], channel["nodes"]) == (1, 2)
+    assert (pocket["dimensionality"], pocket["nodes"], pocket["max_radius"]) == (0, 1, 3.0)
+
+
+def test_unknown_vertex_is_rejected():
+    with pytest.raises(ValueError):
+        parse_nt2_network(_nt2([2.0], [(0, 5, 1.0, (0, 0, 0))]))
+
+
+def test_endpoint_reports_components(client):
+    response = client.post("/api/voronoi_network", files=upload(), data={"probe_radius": "1.1"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["node_count"] == 3 and body["edge_count"] == 4
+    assert body["bottleneck_radius"] == {"x": 1.8, "y": 1.0, "z": None}
+    # Edges of 1.8 (within and across the a boundary) and 1.2 stay open to a 1.1 A probe
+    component, = body["components"]
+    assert component["nodes"] == 3
+    assert component["dimensionality"] == 1
+    assert component["percolates"] == {"x": True, "y": False, "z": False}